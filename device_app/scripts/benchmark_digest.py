@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Count the HTTP round trips behind a zone update and a snapshot, against a fake camera.
+
+Serves a stand-in for a camera's ISAPI web server on localhost -- real digest checking,
+nonces that go stale after ``--nonce-lifetime`` seconds, and an optional per-request
+delay to play the part of an embedded web server -- then drives a ``HikvisionClient``
+through the calls a zone update makes (read-modify-write of the intrusion rule, the
+region-entrance rule, its enable switch and the static-target re-alarm) and through
+snapshots, reporting requests, 401s and latency per operation:
+
+    uv run scripts/benchmark_digest.py --repeat 20 --delay-ms 40
+
+It runs both ways: a fresh ``DigestAuth`` per call, as the clients used to, and the
+client's one long-lived auth. Run it with ``--camera http://host`` to time a real
+camera instead (round trips are then counted client-side, from the responses).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from camera_app.clients import hikvision as hik  # noqa: E402
+from camera_app.clients.dahua import DigestAuth, parse_key_value_list  # noqa: E402
+
+REALM = "IP Camera(fake)"
+RULE_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<FieldDetection xmlns="http://www.hikvision.com/ver20/XMLSchema">'
+    "<id>1</id><enabled>true</enabled></FieldDetection>"
+)
+OK_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<ResponseStatus xmlns="http://www.hikvision.com/ver20/XMLSchema">'
+    "<statusCode>1</statusCode><statusString>OK</statusString></ResponseStatus>"
+)
+JPEG = b"\xff\xd8" + os.urandom(120_000) + b"\xff\xd9"
+
+# The calls behind HikvisionAcusense.set_detection_zones: each rule is read, rewritten
+# and put back.
+ZONE_UPDATE = [
+    ("GET", "/ISAPI/Smart/FieldDetection/1"),
+    ("PUT", "/ISAPI/Smart/FieldDetection/1"),
+    ("GET", "/ISAPI/Smart/regionEntrance/1"),
+    ("PUT", "/ISAPI/Smart/regionEntrance/1"),
+    ("GET", "/ISAPI/Smart/regionEntrance/1"),
+    ("PUT", "/ISAPI/Smart/regionEntrance/1"),
+    ("GET", "/ISAPI/Smart/FieldDetection/1"),
+    ("PUT", "/ISAPI/Smart/FieldDetection/1"),
+]
+SNAPSHOT = [("GET", "/ISAPI/Streaming/Channels/101/picture")]
+
+
+class FakeCamera:
+    """Digest-protected ISAPI endpoints that count what reaches them."""
+
+    def __init__(self, username, password, nonce_lifetime, delay):
+        self.username, self.password = username, password
+        self.nonce_lifetime = nonce_lifetime
+        self.delay = delay
+        self.nonces = {}  # nonce -> (issued at, highest nc seen)
+        self.requests = 0
+        self.challenges = 0
+
+    def _challenge(self, stale=False):
+        self.challenges += 1
+        nonce = os.urandom(16).hex()
+        self.nonces[nonce] = (time.monotonic(), 0)
+        header = f'Digest realm="{REALM}", nonce="{nonce}", qop="auth"'
+        if stale:
+            header += ", stale=true"
+        return web.Response(status=401, headers={"WWW-Authenticate": header})
+
+    def _check(self, request) -> str:
+        """'ok', 'stale' or 'bad' for the request's Authorization header."""
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Digest "):
+            return "bad"
+        auth = parse_key_value_list(header[len("Digest "):])
+        nonce = auth.get("nonce")
+        if nonce not in self.nonces:
+            return "stale"
+        issued, last_nc = self.nonces[nonce]
+        nc = int(auth.get("nc", "0"), 16)
+        if time.monotonic() - issued > self.nonce_lifetime or nc <= last_nc:
+            return "stale"
+
+        def h(value):
+            return hashlib.md5(value.encode()).hexdigest()
+
+        ha1 = h(f"{self.username}:{REALM}:{self.password}")
+        ha2 = h(f"{request.method}:{auth['uri']}")
+        expected = h(f"{ha1}:{nonce}:{auth['nc']}:{auth['cnonce']}:auth:{ha2}")
+        if auth.get("response") != expected:
+            return "bad"
+        self.nonces[nonce] = (issued, nc)
+        return "ok"
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        verdict = self._check(request)
+        if verdict != "ok":
+            return self._challenge(stale=verdict == "stale")
+        await request.read()
+        if request.path.endswith("/picture"):
+            return web.Response(body=JPEG, content_type="image/jpeg")
+        if request.method == "PUT":
+            return web.Response(text=OK_XML, content_type="application/xml")
+        return web.Response(text=RULE_XML, content_type="application/xml")
+
+
+async def _operation(client, calls):
+    for method, path in calls:
+        if method == "PUT":
+            await client.put(path, body=RULE_XML)
+        elif path.endswith("/picture"):
+            await client.get_bytes(path)
+        else:
+            await client.get(path)
+
+
+async def _measure(client, camera, calls, repeat):
+    """Per-operation (requests, 401s, ms) over ``repeat`` runs of ``calls``."""
+    requests, challenges, times = [], [], []
+    for _ in range(repeat):
+        before = (camera.requests, camera.challenges)
+        started = time.perf_counter()
+        await _operation(client, calls)
+        times.append((time.perf_counter() - started) * 1000)
+        requests.append(camera.requests - before[0])
+        challenges.append(camera.challenges - before[1])
+    return requests, challenges, times
+
+
+class ClientCounts:
+    """Counts requests and 401s client-side, for a real camera that can't count them."""
+
+    def __init__(self):
+        self.requests = 0
+        self.challenges = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_end(_session, _context, params):
+            self.requests += 1
+            self.challenges += params.response.status == 401
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+
+async def main(args):
+    runner = None
+    if args.camera:
+        camera = ClientCounts()
+        session = aiohttp.ClientSession(trace_configs=[camera.trace_config()])
+        address = args.camera
+    else:
+        camera = FakeCamera(
+            args.username, args.password, args.nonce_lifetime, args.delay_ms / 1000
+        )
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", camera.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        address = f"http://127.0.0.1:{port}"
+        session = aiohttp.ClientSession()
+
+    host, _, port = address.removeprefix("http://").partition(":")
+    client = hik.HikvisionClient(
+        args.username, args.password, host, int(port or 80), 554, session
+    )
+    try:
+        print(f"{'operation':<14}{'auth':<12}{'requests':>9}{'401s':>6}{'mean ms':>10}")
+        for name, calls in (("zone update", ZONE_UPDATE), ("snapshot", SNAPSHOT)):
+            for label, fresh in (("per call", True), ("persistent", False)):
+                # "per call" is how the clients used to work: a new DigestAuth, and so
+                # a new challenge, for every request.
+                hik.DigestAuth = _FreshPerCall if fresh else DigestAuth
+                client._digest_auth = None
+                requests, challenges, times = await _measure(
+                    client, camera, calls, args.repeat
+                )
+                hik.DigestAuth = DigestAuth
+                print(
+                    f"{name:<14}{label:<12}{statistics.mean(requests):>9.1f}"
+                    f"{statistics.mean(challenges):>6.1f}{statistics.mean(times):>10.1f}"
+                )
+    finally:
+        await session.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+class _FreshPerCall(DigestAuth):
+    """A DigestAuth that forgets its challenge after every request."""
+
+    async def request(self, *args, **kwargs):
+        try:
+            return await super().request(*args, **kwargs)
+        finally:
+            self.challenge = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=40.0,
+                        help="server-side delay per request, fake camera only")
+    parser.add_argument("--nonce-lifetime", type=float, default=300.0,
+                        help="seconds before a nonce goes stale, fake camera only")
+    parser.add_argument("--camera", help="time a real camera, e.g. http://192.168.1.64")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="password")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""A bounded queue between a camera's event stream and the engine that acts on it.
+
+The stream readers used to await the engine's callback for each alert before reading
+any further. That callback is where a detection becomes a snapshot, an upload and a
+notification, which can take many seconds, and for all of it nobody read the stream.
+The camera's heartbeats piled up unread in the socket. A long enough callback hit the
+stream's ``sock_read`` timeout, and the reconnect lost whatever the camera sent in the
+meantime. Hikvision's reader awaited the callback inline. Dahua's did the same through
+``await create_task(...)``.
+
+Now the reader only ``put``s, which never blocks, and one consumer task per engine
+works through the queue in order. What it does when the engine falls behind:
+
+* **Starts are never dropped.** A new detection is delivered however far behind things
+  are; the queue goes over its bound rather than lose one.
+* **State reports are coalesced.** A "still there" continuation, an ``inactive`` or a
+  heartbeat only says how things stand now, so one still waiting in the queue is
+  replaced by a newer one of the same kind instead of queueing both. They merge only
+  with one queued *since the last start*, so a report is never moved ahead of a start it
+  came after.
+* When the queue is full, the oldest waiting state report makes room. If there is none
+  to drop, a new state report is dropped instead.
+
+Depth, peak depth and how many were coalesced or dropped are kept for the app to publish.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Waiting alerts before state reports start being dropped. An engine keeping up holds
+# none; this is hours of heartbeats, or a few minutes of a busy scene behind one slow
+# upload.
+ALERT_QUEUE_SIZE = 64
+
+
+class AlertQueue:
+    """Delivers ``put(*args)`` to ``handler(*args)`` in order, from a task of its own.
+
+    ``coalesce_key(*args)`` says what an alert may be merged with: None for a start,
+    which is always delivered, or a key shared by the state reports that supersede one
+    another.
+    """
+
+    def __init__(self, handler, coalesce_key=None, maxsize: int = ALERT_QUEUE_SIZE):
+        self.handler = handler
+        self.coalesce_key = coalesce_key
+        self.maxsize = maxsize
+
+        # Entries are [key, args], mutable so a coalesced report replaces its args.
+        self._items: deque = deque()
+        # key -> the entry queued for it since the last start.
+        self._mergeable: dict = {}
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task = None
+
+        self.peak_depth = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def put(self, *args) -> None:
+        """Queue an alert for the handler. Never blocks; see the module docstring."""
+        key = self.coalesce_key(*args) if self.coalesce_key else None
+
+        if key is not None and key in self._mergeable:
+            self._mergeable[key][1] = args
+            self.coalesced += 1
+            return
+
+        if len(self._items) >= self.maxsize and not self._drop_oldest_report():
+            if key is not None:
+                self.dropped += 1
+                return
+            log.warning(
+                f"Alert queue over its bound ({len(self._items)} waiting); the engine "
+                f"isn't keeping up. Queueing the detection anyway."
+            )
+
+        entry = [key, args]
+        self._items.append(entry)
+        if key is None:
+            self._mergeable.clear()
+        else:
+            self._mergeable[key] = entry
+        self.peak_depth = max(self.peak_depth, len(self._items))
+        self._ready.set()
+
+    def _drop_oldest_report(self) -> bool:
+        for entry in self._items:
+            if entry[0] is not None:
+                self._items.remove(entry)
+                if self._mergeable.get(entry[0]) is entry:
+                    del self._mergeable[entry[0]]
+                self.dropped += 1
+                return True
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            if not self._items:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            entry = self._items.popleft()
+            if self._mergeable.get(entry[0]) is entry:
+                del self._mergeable[entry[0]]
+            try:
+                result = self.handler(*entry[1])
+                if asyncio.iscoroutine(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Event callback failed: {e}", exc_info=e)
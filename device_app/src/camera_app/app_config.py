@@ -45,6 +45,15 @@ class CameraConnectionConfig(config.Object):
         default="live",
         advanced=True,
     )
+    rtsp_sub_channel = config.String(
+        "RTSP Sub-stream Channel",
+        description="Channel name of the camera's low-resolution sub-stream (e.g. "
+        "'Streaming/Channels/102' on Hikvision, 'cam/realmonitor?channel=1&subtype=1' on "
+        "Dahua). Used for thumbnails when 'Keep Stream Open' is on, so holding a stream "
+        "open for them decodes the small one. Leave blank to use the main channel.",
+        default=None,
+        advanced=True,
+    )
     control_port = config.Integer(
         "Control Port",
         description="Port of control page on camera",
@@ -157,6 +166,25 @@ class CameraSnapshotConfig(config.Object):
         advanced=True,
     )
 
+    keep_stream_open = config.Boolean(
+        "Keep Stream Open",
+        description="Hold the camera's RTSP stream open between ffmpeg snapshots and "
+        "thumbnails, and take them from the latest decoded frame instead of connecting "
+        "afresh for each one. Much faster on cameras without an HTTP snapshot (generic "
+        "and UniFi), at the cost of decoding a couple of frames a second while open. "
+        "Needs the 'full' image.",
+        default=False,
+        advanced=True,
+    )
+    stream_idle_secs = config.Integer(
+        "Stream Idle Timeout",
+        description="Close a stream held open by 'Keep Stream Open' after this many "
+        "seconds without a snapshot or thumbnail. It reopens on the next one.",
+        default=120,
+        minimum=10,
+        advanced=True,
+    )
+
     @property
     def mode_as_filetype(self) -> str:
         match Mode(self.mode.value):
@@ -343,6 +371,18 @@ class CameraAlarmConfig(config.Object):
         default=120,
         advanced=True,
     )
+    event_clip_pre_roll_secs = config.Integer(
+        "Event Video Pre-roll",
+        description="Seconds from before the detection to include in an event video "
+        "recorded with ffmpeg, i.e. on a camera without a microSD card (one with a card "
+        "keeps its own pre-roll). Keeps a rolling recording of the stream in memory for "
+        "as long as the app runs, and needs 'Native H264' since it copies the stream "
+        "rather than re-encoding it. 0 turns it off.",
+        default=0,
+        minimum=0,
+        maximum=30,
+        advanced=True,
+    )
 
 
 def value_or(element, fallback):
@@ -473,6 +513,16 @@ class CameraConfig(config.Schema):
             return f"rtsp://{self.connection.username.value}:{self.connection.password.value}@{self.connection.address.value}:{self.connection.rtsp_port.value}/{self.connection.rtsp_channel.value}"
         return f"rtsp://{self.connection.address.value}:{self.connection.rtsp_port.value}/{self.connection.rtsp_channel.value}"
 
+    @property
+    def rtsp_sub_uri(self) -> str | None:
+        """The sub-stream's RTSP URI, or None when no sub-stream channel is set."""
+        channel = value_or(self.connection.rtsp_sub_channel, None)
+        if not channel:
+            return None
+        if self.connection.username.value or self.connection.password.value:
+            return f"rtsp://{self.connection.username.value}:{self.connection.password.value}@{self.connection.address.value}:{self.connection.rtsp_port.value}/{channel}"
+        return f"rtsp://{self.connection.address.value}:{self.connection.rtsp_port.value}/{channel}"
+
     @property
     def thermal_rtsp_uri(self):
         if not self.thermal.enabled.value:
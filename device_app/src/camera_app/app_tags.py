@@ -14,5 +14,12 @@ class CameraTags(Tags):
 
     detection_zones = Tag("array[object]", [])
 
+    # How the camera's event stream is keeping up with the engine (see alert_queue):
+    # alerts waiting now, the most ever waiting, and state reports merged or dropped.
+    alert_queue_depth = Tag("number", 0)
+    alert_queue_peak = Tag("number", 0)
+    alerts_coalesced = Tag("number", 0)
+    alerts_dropped = Tag("number", 0)
+
     # async def setup(self):
     #     self.add_tag(f"camera_power_{self.config.power.pin.value}", Tag("number", 0))
@@ -17,6 +17,7 @@ from pydoover.models import (
 from .app_config import CameraConfig, CameraType
 from .app_tags import CameraTags
 from .app_ui import CameraUI
+from .clients.session import new_session
 from .engines import DahuaPTZCamera
 from .engines.base import Capture, THUMBNAIL_SUFFIX
 from .engines.dahua_base import DahuaCameraBase
@@ -103,6 +104,9 @@ class CameraApplication(Application):
 
     async def setup(self):
         self.engine = None
+        # Every HTTP call this app makes -- to the camera, through the engine's client,
+        # and to the rtsp_to_web server -- goes through this one pooled session.
+        self.http_session = new_session()
 
         self.power_management = CameraPowerManagement(self)
 
@@ -211,6 +215,7 @@ class CameraApplication(Application):
             case _:
                 raise ValueError(f"Unknown camera type: {self.config.type.value}")
 
+        self.engine.session = self.http_session
         self.rpc.register_handlers(self.engine)
 
         await self.engine.setup()
@@ -229,6 +234,8 @@ class CameraApplication(Application):
             self._alarm_pulse_task.cancel()
         if self.engine:
             await self.engine.close()
+        if getattr(self, "http_session", None) is not None:
+            await self.http_session.close()
 
     async def on_aggregate_update(self, event: AggregateUpdateEvent):
         if event.channel.name != "doover_ui_fastmode":
@@ -311,11 +318,21 @@ class CameraApplication(Application):
             await self.engine.sync_camera_clock()
 
         await self.update_alarm_schedule()
+        await self.publish_alert_queue_stats()
 
         if self.check_snapshot_can_run():
             log.info("Running snapshot from main loop.")
             await self.lock_snapshot_and_run()
 
+    async def publish_alert_queue_stats(self):
+        alerts = getattr(self.engine, "alerts", None)
+        if alerts is None:
+            return
+        await self.tags.alert_queue_depth.set(alerts.depth)
+        await self.tags.alert_queue_peak.set(alerts.peak_depth)
+        await self.tags.alerts_coalesced.set(alerts.coalesced)
+        await self.tags.alerts_dropped.set(alerts.dropped)
+
     async def update_alarm_schedule(self):
         """Keep the camera's arming schedule and night alarm in step with the config.
 
@@ -496,7 +513,7 @@ class CameraApplication(Application):
 
         base = self.config.rtsp_server.address.value
         auth = aiohttp.BasicAuth("demo", "demo")
-        async with aiohttp.request("GET", f"{base}/streams", auth=auth) as resp:
+        async with self.http_session.get(f"{base}/streams", auth=auth) as resp:
             data = await resp.json()
 
         await self.setup_rtsp_stream(self.app_key, self.config.rtsp_uri, data)
@@ -535,8 +552,7 @@ class CameraApplication(Application):
             },
         }
         log.info("Creating rtsp server stream...")
-        async with aiohttp.request(
-            "POST",
+        async with self.http_session.post(
             f"{base}/stream/{quote(stream_name)}/{method}",
             json=body,
             auth=auth,
@@ -557,8 +573,7 @@ class CameraApplication(Application):
             body["data"] = offer
 
         # get SDP, hand it back to the caller, and mirror it to the channel
-        async with aiohttp.request(
-            "POST",
+        async with self.http_session.post(
             f"{base}/stream/{quote(stream_name)}/channel/0/webrtc?uuid={quote(stream_name)}&channel=0",
             json=body,
             auth=auth,
@@ -28,11 +28,21 @@ MOTION_TOPICS = {
 
 
 class BoschClient:
-    def __init__(self, username: str, password: str, address: str, port: int):
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        address: str,
+        port: int,
+        session: aiohttp.ClientSession,
+    ):
         self.username = username
         self.password = password
         self.address = address
         self.port = port
+        self.session = session
+        # Digest state for snapshot fetches, kept between them (see DigestAuth).
+        self._snapshot_auth = None
 
         self.cam: ONVIFCamera = None
         self.ptz_service = None
@@ -218,16 +228,16 @@ class BoschClient:
         snapshot_uri = resp.Uri
 
         # Bosch AUTODOME requires HTTP digest auth; aiohttp has no native digest.
-        async with aiohttp.ClientSession() as session:
-            auth = DigestAuth(self.username, self.password, session)
-            response = await auth.request(
-                "GET", snapshot_uri, timeout=aiohttp.ClientTimeout(total=TIMEOUT_SECONDS)
-            )
-            try:
-                response.raise_for_status()
-                return await response.read()
-            finally:
-                response.close()
+        if self._snapshot_auth is None:
+            self._snapshot_auth = DigestAuth(self.username, self.password, self.session)
+        response = await self._snapshot_auth.request(
+            "GET", snapshot_uri, timeout=aiohttp.ClientTimeout(total=TIMEOUT_SECONDS)
+        )
+        try:
+            response.raise_for_status()
+            return await response.read()
+        finally:
+            response.close()
 
     # --- Status ---
 
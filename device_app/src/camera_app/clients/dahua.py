@@ -6,7 +6,9 @@ Original License: MIT License Copyright (c) 2020 Joakim Sørensen @ludeeus
 Modified by Josh Bramley, Doover.
 """
 
+import json
 import logging
+import random
 import re
 import socket
 import asyncio
@@ -25,10 +27,29 @@ from aiohttp.client_reqrep import ClientResponse
 from aiohttp.client_exceptions import ClientError
 from yarl import URL
 
+from .multipart import MultipartReader, Part, boundary_of
+
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 TIMEOUT_SECONDS = 20
+
+# The eventManager and snapManager streams are multipart with this boundary, when the
+# response doesn't name its own.
+STREAM_BOUNDARY = "myboundary"
+# Backoff between reconnects of a dropped stream: doubling from the first to the cap,
+# jittered, and back to the first once a connection delivers something. Reconnecting
+# instantly, as this used to, hammered a camera that was rebooting or refusing us.
+RECONNECT_MIN_SECS = 1
+RECONNECT_MAX_SECS = 60
+# As for the Hikvision alertStream: an endless response must not inherit the session's
+# `total` timeout, which would cut it every few minutes. Liveness is judged on reads
+# instead, against the heartbeat we ask for every few seconds.
+EVENT_STREAM_TIMEOUT = aiohttp.ClientTimeout(
+    total=None, connect=None, sock_connect=30, sock_read=60
+)
+# Held for one part before deciding the stream has lost its framing.
+MAX_STREAM_BUFFER = 8 * 1024 * 1024
 SECURITY_LIGHT_TYPE = 1
 SIREN_TYPE = 2
 
@@ -43,6 +64,19 @@ class DigestAuth:
     """HTTP digest authentication helper.
     The work here is based off of
     https://github.com/requests/requests/blob/v2.18.4/requests/auth.py.
+
+    Meant to live as long as the client that owns it. Once it has seen a challenge,
+    every later request carries credentials up front against the cached nonce, with
+    ``nc`` counting up, so a call is one round trip. A fresh instance per call threw
+    the challenge away each time, which made every call two: an unauthenticated
+    request to collect a 401, then the real one. On a camera's embedded web server
+    that doubled the latency of everything, from a snapshot to each of the half-dozen
+    ISAPI calls behind a zone update.
+
+    A 401 to a request that carried credentials means the camera has moved on from our
+    nonce (it may say ``stale=true``, or just issue a new one). The request is retried
+    exactly once against the new challenge; a second 401 is returned to the caller,
+    so wrong credentials fail instead of looping.
     """
 
     def __init__(
@@ -60,28 +94,41 @@ class DigestAuth:
         self.last_nonce = previous.get("last_nonce", "")
         self.nonce_count = previous.get("nonce_count", 0)
         self.challenge = previous.get("challenge")
-        self.args = {}
         self.session = session
 
     async def request(self, method, url, *, headers=None, **kwargs):
-        """Makes a request"""
-        if headers is None:
-            headers = {}
-
-        # Save the args so we can re-run the request
-        self.args = {"method": method, "url": url, "headers": headers, "kwargs": kwargs}
-
+        """Makes a request, answering (at most one) digest challenge."""
+        response = await self._send(method, url, headers, kwargs)
+        if response.status != 401 or not self._take_challenge(response):
+            return response
+
+        # The challenge is new to us, or replaced the nonce we were using; either way
+        # the request is worth one more try with it.
+        response.close()
+        return await self._send(method, url, headers, kwargs)
+
+    async def _send(self, method, url, headers, kwargs):
+        # Copied, so the caller's dict never carries our Authorization into a later
+        # request built from it.
+        headers = dict(headers or {})
         if self.challenge:
-            authorization = self._build_digest_header(method.upper(), url)
-            headers["AUTHORIZATION"] = authorization
-
-        response = await self.session.request(method, url, headers=headers, **kwargs)
+            headers["AUTHORIZATION"] = self._build_digest_header(method.upper(), url)
+        return await self.session.request(method, url, headers=headers, **kwargs)
 
-        # Only try performing digest authentication if the response status is from 401
-        if response.status == 401:
-            return await self._handle_401(response)
+    def _take_challenge(self, response: ClientResponse) -> bool:
+        """Adopt the digest challenge on a 401. False if there isn't one."""
+        auth_header = response.headers.get("www-authenticate", "")
+        parts = auth_header.split(" ", 1)
+        if parts[0].lower() != "digest" or len(parts) < 2:
+            return False
 
-        return response
+        if self.challenge is not None:
+            _LOGGER.debug(
+                "Digest nonce %s; re-authenticating.",
+                "stale" if "stale=true" in parts[1].lower() else "rejected",
+            )
+        self.challenge = parse_key_value_list(parts[1])
+        return True
 
     def _build_digest_header(self, method, url):
         """
@@ -166,28 +213,38 @@ class DigestAuth:
 
         return "Digest %s" % base
 
-    async def _handle_401(self, response: ClientResponse):
-        """
-        Takes the given response and tries digest-auth, if needed.
-        :rtype: ClientResponse
-        """
-        auth_header = response.headers.get("www-authenticate", "")
 
-        parts = auth_header.split(" ", 1)
-        if "digest" == parts[0].lower() and len(parts) > 1:
-            # Close the initial response since we are going making another request and return that response
-            response.close()
+def parse_event(body: bytes) -> dict | None:
+    """One eventManager part, ``Code=...;action=...;index=...[;data={...}]``, as a dict.
+
+    ``data`` is JSON and may itself contain ``;`` and ``=``, so it is split off first
+    and parsed whole. None for a heartbeat or anything else without a ``Code``.
+    """
+    text = body.decode(errors="ignore").strip()
+    if not text.startswith("Code="):
+        return None
+    text, sep, data = text.partition(";data=")
+    event = dict(
+        pair.split("=", 1) for pair in text.split(";") if "=" in pair
+    )
+    if sep:
+        try:
+            event["data"] = json.loads(data)
+        except ValueError:
+            event["data"] = data
+    return event
 
-            self.challenge = parse_key_value_list(parts[1])
 
-            return await self.request(
-                self.args["method"],
-                self.args["url"],
-                headers=self.args["headers"],
-                **self.args["kwargs"],
-            )
+def event_coalesce_key(event: dict, channel: int):
+    """What a queued eventManager event may be merged with; None if it must be delivered.
 
-        return response
+    Only a ``Start`` is acted on. The rest (``Stop``, ``Pulse``) only report how
+    things stand, so a newer one of the same code supersedes one still waiting. See
+    :mod:`..alert_queue`.
+    """
+    if event.get("action") == "Start":
+        return None
+    return event.get("Code"), event.get("action"), channel
 
 
 def parse_pair(pair):
@@ -237,10 +294,18 @@ class DahuaClient:
 
         protocol = "https" if int(port) == 443 else "http"
         self._base = f"{protocol}://{address}:{port}"
+        self._digest_auth = None
         self.continuous_ptz_stop_task = None
         self.prev_ptz_action = None
         self.presets = None
 
+    @property
+    def _auth(self) -> DigestAuth:
+        """This client's digest state, shared by every request it makes. See DigestAuth."""
+        if getattr(self, "_digest_auth", None) is None:
+            self._digest_auth = DigestAuth(self._username, self._password, self._session)
+        return self._digest_auth
+
     def get_rtsp_stream_url(self, channel: int, subtype: int) -> str:
         """
         Returns the RTSP url for the supplied subtype (subtype is 0=Main stream, 1=Sub stream)
@@ -1052,13 +1117,18 @@ class DahuaClient:
 
     async def invoke(self, callback, *args, **kwargs):
         if asyncio.iscoroutinefunction(callback):
-            await asyncio.create_task(callback(*args, **kwargs))
+            await callback(*args, **kwargs)
         else:
-            callback(*args, **kwargs)  # fixme: should this be in a different loop?
+            callback(*args, **kwargs)
 
     async def stream_snapshots(
         self, callback, events: list, channel: int, heartbeat: int = 5
     ):
+        """Subscribe to the snapshots the camera takes on ``events``.
+
+        ``callback(part, channel)`` gets every part of the stream as a
+        :class:`.multipart.Part`: the text describing the event, then its JPEG.
+        """
         # http://192.168.1.108/cgi-bin/snapManager.cgi?action=attachFileProc&channel=1&heartbeat=5&Flags[0]
         # =Event&Events=[VideoMotion%2CVideoLoss]
 
@@ -1068,36 +1138,10 @@ class DahuaClient:
         if not (self._username or self._password):
             return
 
-        response = None
-        try:
-            auth = DigestAuth(self._username, self._password, self._session)
-            response = await auth.request("GET", url)
-            response.raise_for_status()
-            # https://docs.aiohttp.org/en/stable/streams.html
-            buffer = b""
-            async for data, _ in response.content.iter_chunks():
-                if b"--myboundary" in data:
-                    split = data.split(b"--myboundary")
-                    buffer += split[0].strip()
-                    await self.invoke(callback, buffer, channel)
-
-                    if len(split) > 2:
-                        for elem in split[1:-1]:
-                            await self.invoke(callback, elem, channel)
-
-                    buffer = split[-1]
-
-                else:
-                    buffer += data
+        async def on_part(part: Part):
+            await self.invoke(callback, part, channel)
 
-        except Exception:
-            pass
-        finally:
-            if response is not None:
-                response.close()
-
-        # fixme: add some conditional restarting...
-        return await self.stream_events(callback, events, channel, heartbeat)
+        await self._stream_forever(url, on_part)
 
     async def stream_events(
         self, callback, events: list, channel: int = 1, heartbeat: int = 5
@@ -1158,31 +1202,65 @@ class DahuaClient:
         if not (self._username or self._password):
             return
 
+        async def on_part(part: Part):
+            event = parse_event(part.body)
+            if event is not None:
+                await self.invoke(callback, event, channel)
+
+        await self._stream_forever(url, on_part)
+
+    async def _stream_forever(self, url: str, on_part) -> None:
+        """Read a multipart stream, reconnecting with backoff whenever it drops.
+
+        A loop, not recursion: reconnecting by calling itself grew the stack by a frame
+        per disconnect and never unwound it.
+        """
+        delay = RECONNECT_MIN_SECS
+        while True:
+            try:
+                delivered = await self._read_stream(url, on_part)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delivered = False
+                _LOGGER.info(
+                    f"Event stream dropped ({type(e).__name__}: {e}); reconnecting."
+                )
+            else:
+                _LOGGER.info("Event stream ended; reconnecting.")
+
+            if delivered:
+                delay = RECONNECT_MIN_SECS
+            # Jittered, so cameras that dropped together don't all come back together.
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, RECONNECT_MAX_SECS)
+
+    async def _read_stream(self, url: str, on_part) -> bool:
+        """One connection's worth of parts. Returns whether any arrived."""
         response = None
+        delivered = False
         try:
-            auth = DigestAuth(self._username, self._password, self._session)
-            response = await auth.request("GET", url)
+            response = await self._auth.request("GET", url, timeout=EVENT_STREAM_TIMEOUT)
             response.raise_for_status()
+            reader = MultipartReader(
+                boundary_of(response.headers.get("Content-Type"), STREAM_BOUNDARY)
+            )
 
             # https://docs.aiohttp.org/en/stable/streams.html
             async for data, _ in response.content.iter_chunks():
-                if asyncio.iscoroutinefunction(callback):
-                    await asyncio.create_task(callback(data, channel))
-                else:
-                    callback(
-                        data, channel
-                    )  # fixme: should this be in a different loop?
-
-        except asyncio.CancelledError:
-            if response is not None:
-                response.close()
-        except Exception:
+                reader.feed(data)
+                for part in reader.parts():
+                    delivered = True
+                    await on_part(part)
+                if len(reader) > MAX_STREAM_BUFFER:
+                    _LOGGER.warning(
+                        f"Discarding {len(reader)} bytes of unparsed event stream."
+                    )
+                    reader.clear()
+        finally:
             if response is not None:
                 response.close()
-
-            return await self.stream_events(callback, events, channel, heartbeat)
-
-        # fixme: add some conditional restarting...
+        return delivered
 
     @staticmethod
     async def parse_dahua_api_response(data: str) -> dict:
@@ -1210,8 +1288,7 @@ class DahuaClient:
         async with async_timeout.timeout(TIMEOUT_SECONDS):
             response = None
             try:
-                auth = DigestAuth(self._username, self._password, self._session)
-                response = await auth.request("GET", self._base + url)
+                response = await self._auth.request("GET", self._base + url)
                 response.raise_for_status()
 
                 return await response.read()
@@ -1226,8 +1303,7 @@ class DahuaClient:
             async with async_timeout.timeout(TIMEOUT_SECONDS):
                 response = None
                 try:
-                    auth = DigestAuth(self._username, self._password, self._session)
-                    response = await auth.request("GET", url)
+                    response = await self._auth.request("GET", url)
                     response.raise_for_status()
                     data = await response.text()
                     if verify_ok:
@@ -19,6 +19,7 @@ import aiohttp
 import async_timeout
 
 from .dahua import DigestAuth
+from .multipart import MultipartReader, boundary_of
 from ..events import EVENT_IMAGE_KEY, TARGET_REGIONS_KEY, TRIGGERED_REGIONS_KEY
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
@@ -31,6 +32,8 @@ NS = {"hik": ISAPI_NS}
 
 ALERT_END = b"</EventNotificationAlert>"
 ALERT_START = b"<EventNotificationAlert"
+# The alertStream's multipart boundary, when the response doesn't name its own.
+ALERT_BOUNDARY = "boundary"
 
 # The alertStream is multipart, and the parts that aren't XML are the camera's own JPEG of
 # the event. Bounds on collecting one: how long to keep an alert waiting for its picture
@@ -113,6 +116,89 @@ def _xml_to_dict(element: ET.Element) -> dict:
     return result
 
 
+# The alerts that only report a state are most of the stream: the ``videoloss``
+# heartbeat every ~10s from every camera, and a ``duration`` "still there" every few
+# seconds for as long as a target stays. They are small and flat, so they're recognised
+# from the raw bytes and their fields read with one regex, rather than each being parsed
+# into a tree and walked. One that holds anything the regex can't read exactly goes to
+# the parser after all: an entity reference, CDATA or a comment, or the boxes and region
+# ids only the tree walk reads.
+_STATE_REPORT = re.compile(rb"<eventType>(?:duration|videoloss)</eventType>")
+_NEEDS_PARSER = (b"&", b"<!", b"regionID", b"Rect", b"boundingBox")
+_ALERT_ROOT = "<EventNotificationAlert"
+# One token below the root: a leaf and its text, an empty element, an open tag or a
+# close tag. Attributes are only skipped on an empty element; anywhere else the open
+# tag matches nothing, its close tag comes out unbalanced and the parser takes over.
+_TOKEN = re.compile(
+    r"<([\w.:-]+)>([^<]*)</\1>"
+    r"|<([\w.:-]+)(?:\s[^>]*)?/>"
+    r"|<([\w.:-]+)>"
+    r"|</([\w.:-]+)>"
+)
+
+
+def _scan_state_report(data: bytes) -> dict | None:
+    """A heartbeat or ``duration`` alert's fields, read without parsing it.
+
+    Keyed exactly as :func:`_xml_to_dict` keys the parsed alert, nested fields by their
+    dotted path (``DurationList.Duration.relationEvent``). Open and close tags are
+    matched up as they go by; anything that doesn't balance is left to the parser.
+    None for any other alert.
+    """
+    if not _STATE_REPORT.search(data):
+        return None
+    if any(marker in data for marker in _NEEDS_PARSER):
+        return None
+    text = data.decode(errors="ignore")
+    start = text.find(_ALERT_ROOT)
+    if start == -1:
+        return None
+
+    result = {}
+    # The open elements' tags, and the dotted prefix their children are keyed under.
+    stack, prefix = [], ""
+    body = text.find(">", start)
+    for leaf, value, empty, opened, closed in _TOKEN.findall(text, body):
+        if leaf:
+            result[prefix + _strip_prefix(leaf)] = value
+        elif empty:
+            result[prefix + _strip_prefix(empty)] = ""
+        elif opened:
+            stack.append((opened, prefix))
+            prefix = f"{prefix}{_strip_prefix(opened)}."
+        elif not stack:
+            # The root closing: the alert is complete.
+            return result if _strip_prefix(closed) == "EventNotificationAlert" else None
+        else:
+            tag, prefix = stack.pop()
+            if tag != closed:
+                return None
+    # Ran out before the root closed.
+    return None
+
+
+def _strip_prefix(tag: str) -> str:
+    """A tag without its namespace prefix, as ElementTree reports it."""
+    return tag.rsplit(":", 1)[-1] if ":" in tag else tag
+
+
+def alert_coalesce_key(alert: dict):
+    """What a queued alert may be merged with; None for one that must be delivered.
+
+    An ``active`` event is a start. Everything else reports a state: ``duration``
+    ("still there") and the ``inactive`` alerts, heartbeats among them. A newer report
+    of the same kind supersedes an older one still waiting. See :mod:`..alert_queue`.
+    """
+    event_type = alert.get("eventType", "")
+    state = alert.get("eventState", "")
+    if state == "active" and event_type != "duration":
+        return None
+    relation = next(
+        (v for k, v in alert.items() if k.lower().endswith("relationevent") and v), ""
+    )
+    return event_type, state, alert.get("channelID"), relation
+
+
 class HikvisionClient:
     """
     HikvisionClient is the client for accessing Hikvision IP cameras via ISAPI.
@@ -138,6 +224,14 @@ class HikvisionClient:
 
         protocol = "https" if int(port) == 443 else "http"
         self._base = f"{protocol}://{address}:{port}"
+        self._digest_auth = None
+
+    @property
+    def _auth(self) -> DigestAuth:
+        """This client's digest state, shared by every request it makes. See DigestAuth."""
+        if getattr(self, "_digest_auth", None) is None:
+            self._digest_auth = DigestAuth(self._username, self._password, self._session)
+        return self._digest_auth
 
     def get_rtsp_stream_url(self, channel: int = 1, subtype: int = 0) -> str:
         """
@@ -1637,11 +1731,10 @@ class HikvisionClient:
         response = None
         read: asyncio.Task | None = None
         try:
-            auth = DigestAuth(self._username, self._password, self._session)
-            response = await auth.request("GET", url, timeout=EVENT_STREAM_TIMEOUT)
+            response = await self._auth.request("GET", url, timeout=EVENT_STREAM_TIMEOUT)
             response.raise_for_status()
 
-            buffer = b""
+            reader = self._alert_reader(response.headers.get("Content-Type"))
             # An alert that says a picture is coming, held until it arrives so the event
             # and its frame reach the app together.
             pending: dict | None = None
@@ -1691,17 +1784,17 @@ class HikvisionClient:
                     continue
                 empty_reads = 0
 
-                buffer += data
-                buffer, pending = await self._drain(callback, buffer, pending)
+                reader.feed(data)
+                pending = await self._drain(callback, reader, pending)
 
-                if len(buffer) > MAX_STREAM_BUFFER:
-                    # Lost sync (a part we can't parse, or a picture bigger than we'll
-                    # hold). Start clean rather than grow forever; the next alert is a
-                    # fresh start because each is self-delimiting.
+                if len(reader) > MAX_STREAM_BUFFER:
+                    # A part bigger than we'll hold, or one whose end we can't find.
+                    # Start clean rather than grow forever; the next boundary is a
+                    # fresh start.
                     _LOGGER.warning(
-                        f"Discarding {len(buffer)} bytes of unparsed event stream."
+                        f"Discarding {len(reader)} bytes of unparsed event stream."
                     )
-                    buffer = b""
+                    reader.clear()
                     if pending is not None:
                         await self._dispatch(callback, pending)
                         pending = None
@@ -1711,66 +1804,45 @@ class HikvisionClient:
             if response is not None:
                 response.close()
 
-    async def _drain(self, callback, buffer: bytes, pending: dict | None):
-        """Consume every complete part in ``buffer``, dispatching what's finished.
+    @staticmethod
+    def _alert_reader(content_type: str = None) -> MultipartReader:
+        """A reader for the alertStream's parts; see :mod:`.multipart`.
 
-        Returns the leftover buffer and the alert (if any) still waiting for its picture.
+        An alert part without a Content-Length ends at its closing tag, so it is
+        dispatched as soon as it has arrived rather than when the next part starts.
         """
-        while True:
-            if pending is not None:
-                # The picture belongs to `pending` only if it arrives before the next
-                # alert does — otherwise the camera has moved on and we'd be stapling
-                # one event's frame onto another's.
-                next_alert = buffer.find(ALERT_START)
-                marker = buffer.lower().find(b"content-type: image/")
-
-                if marker != -1 and (next_alert == -1 or marker < next_alert):
-                    image, rest = self._read_image_part(buffer, marker)
-                    if image is None:
-                        return buffer, pending  # still arriving
-                    await self._dispatch(callback, pending, image)
-                    buffer, pending = rest, None
-                    continue
-
-                if next_alert != -1:
-                    # The next event beat the picture, so it isn't coming.
-                    await self._dispatch(callback, pending)
-                    pending = None
-                    continue
+        return MultipartReader(
+            boundary_of(content_type, ALERT_BOUNDARY), ends=(ALERT_END,)
+        )
 
-                return buffer, pending
+    async def _drain(self, callback, reader: MultipartReader, pending: dict | None):
+        """Consume every complete part ``reader`` holds, dispatching what's finished.
 
-            end = buffer.find(ALERT_END)
-            if end == -1:
-                return buffer, pending
-            end += len(ALERT_END)
-            block, buffer = buffer[:end], buffer[end:]
+        Returns the alert (if any) still waiting for its picture. The picture belongs to
+        it only if it is the very next part: if another alert comes first the camera has
+        moved on, and pairing them would staple one event's frame onto another's.
+        """
+        for part in reader.parts():
+            if part.content_type.startswith("image/"):
+                if pending is not None:
+                    await self._dispatch(callback, pending, part.body)
+                    pending = None
+                continue
 
-            alert = self._parse_alert(block)
+            if "xml" not in part.content_type and ALERT_START not in part.body:
+                continue
+            alert = self._parse_alert(part.body)
             if alert is None:
                 continue
+            if pending is not None:
+                # The next event beat the picture, so it isn't coming.
+                await self._dispatch(callback, pending)
+                pending = None
             if self._alert_has_picture(alert):
                 pending = alert
                 continue
             await self._dispatch(callback, alert)
-
-    @staticmethod
-    def _read_image_part(buffer: bytes, marker: int):
-        """The JPEG starting at ``marker``, and what's left. ``(None, None)`` if partial."""
-        header_end = buffer.find(b"\r\n\r\n", marker)
-        if header_end == -1:
-            return None, None
-        match = re.search(
-            rb"Content-Length:\s*(\d+)", buffer[marker:header_end], re.IGNORECASE
-        )
-        if match is None:
-            return None, None
-
-        body = header_end + 4
-        end = body + int(match.group(1))
-        if len(buffer) < end:
-            return None, None
-        return buffer[body:end], buffer[end:]
+        return pending
 
     @staticmethod
     def _alert_has_picture(alert: dict) -> bool:
@@ -1792,6 +1864,11 @@ class HikvisionClient:
 
     def _parse_alert(self, data: bytes) -> dict | None:
         """Parse one <EventNotificationAlert> block into a flattened dict."""
+        # Heartbeats and "still there" reports, most of the stream, skip the parser.
+        event = _scan_state_report(data)
+        if event is not None:
+            return event
+
         try:
             text = data.decode(errors="ignore")
             start = text.find("<EventNotificationAlert")
@@ -1804,21 +1881,61 @@ class HikvisionClient:
             _LOGGER.debug(f"Failed to parse event: {e}")
             return None
 
-        event = _xml_to_dict(root)
+        event, regions, triggered = self._read_alert(root)
 
         # Bounding boxes come off the tree, not the flattened dict, so several
         # targets in one alert all survive (see :meth:`_target_regions`).
-        regions = self._target_regions(root)
         if regions:
             event[TARGET_REGIONS_KEY] = regions
 
         # Likewise the ids of the regions that fired, which is how the app tells which
         # zone the user drew was entered.
-        triggered = self._triggered_regions(root)
         if triggered:
             event[TRIGGERED_REGIONS_KEY] = triggered
         return event
 
+    @classmethod
+    def _read_alert(cls, root: ET.Element) -> tuple[dict, list, list]:
+        """:func:`_xml_to_dict`, :meth:`_target_regions` and :meth:`_triggered_regions`
+        of one alert, in a single walk of its tree.
+
+        Same results as calling the three, without walking the tree three times or
+        mapping every node to its parent for the sake of a rect or two: the walk carries
+        the path down to where it is, which is all :meth:`_rect_target` needs.
+        """
+        event, regions, triggered = {}, [], []
+        path = [root]
+
+        def visit(element, prefix):
+            for child in element:
+                tag = _strip_ns(child.tag)
+                if tag in cls._RECT_TAGS:
+                    box = cls._parse_rect(child)
+                    if box is not None:
+                        region = {"box": box}
+                        parents = dict(zip(path[1:] + [child], path))
+                        target = cls._rect_target(child, parents)
+                        if target:
+                            region["target"] = target
+                        regions.append(region)
+                elif tag == "regionID":
+                    try:
+                        region_id = int((child.text or "").strip())
+                    except ValueError:
+                        region_id = None
+                    if region_id is not None and region_id not in triggered:
+                        triggered.append(region_id)
+
+                if len(child):
+                    path.append(child)
+                    visit(child, f"{prefix}{tag}.")
+                    path.pop()
+                else:
+                    event[prefix + tag] = child.text or ""
+
+        visit(root, "")
+        return event, regions, triggered
+
     @staticmethod
     async def _dispatch(callback, alert: dict, image: bytes = None) -> None:
         """Hand an alert (and the camera's own frame of it, if any) to the engine."""
@@ -1843,8 +1960,7 @@ class HikvisionClient:
         async with async_timeout.timeout(TIMEOUT_SECONDS):
             response = None
             try:
-                auth = DigestAuth(self._username, self._password, self._session)
-                response = await auth.request("GET", self._base + url)
+                response = await self._auth.request("GET", self._base + url)
                 response.raise_for_status()
                 return await response.read()
             finally:
@@ -1860,12 +1976,11 @@ class HikvisionClient:
         async with async_timeout.timeout(TIMEOUT_SECONDS):
             response = None
             try:
-                auth = DigestAuth(self._username, self._password, self._session)
                 kwargs = {}
                 if body:
                     kwargs["data"] = body
                     kwargs["headers"] = {"Content-Type": "application/xml"}
-                response = await auth.request("POST", self._base + url, **kwargs)
+                response = await self._auth.request("POST", self._base + url, **kwargs)
                 response.raise_for_status()
                 return await response.read()
             finally:
@@ -1879,8 +1994,7 @@ class HikvisionClient:
             async with async_timeout.timeout(TIMEOUT_SECONDS):
                 response = None
                 try:
-                    auth = DigestAuth(self._username, self._password, self._session)
-                    response = await auth.request("GET", url)
+                    response = await self._auth.request("GET", url)
                     response.raise_for_status()
                     data = await response.text()
                     return self._parse_xml_response(data)
@@ -1907,12 +2021,11 @@ class HikvisionClient:
             async with async_timeout.timeout(TIMEOUT_SECONDS):
                 response = None
                 try:
-                    auth = DigestAuth(self._username, self._password, self._session)
                     kwargs = {}
                     if body:
                         kwargs["data"] = body
                         kwargs["headers"] = {"Content-Type": "application/xml"}
-                    response = await auth.request("PUT", url, **kwargs)
+                    response = await self._auth.request("PUT", url, **kwargs)
                     response.raise_for_status()
                     data = await response.text()
                     return self._parse_xml_response(data)
@@ -0,0 +1,154 @@
+"""Framing the parts of a camera's long-lived ``multipart`` HTTP stream as it arrives.
+
+Both event streams we read are endless multipart responses: Hikvision's alertStream
+interleaves ``<EventNotificationAlert>`` XML with the camera's JPEG of each event, and
+Dahua's eventManager sends ``Code=...;action=...`` text parts. They arrive in whatever
+TCP chunks the network produces, so a part can be split anywhere, and several can land
+in one chunk.
+
+:class:`MultipartReader` holds what has arrived in one ``bytearray`` that is appended to
+in place and consumed from the front by an offset, compacted only once the consumed
+part is at least half of it. Each byte is copied into the buffer once and out of it
+once, as part of the part it belongs to. Building the buffer with ``bytes +=``, and
+searching all of it for a header on every chunk, had made a 400KB event picture
+arriving in 4KB chunks cost around a hundred copies and scans of a buffer growing to
+its full size: quadratic in the size of the picture.
+
+A part is framed by its boundary and read by its ``Content-Length`` when it has one.
+Cameras don't always send one. Nor do they always send headers: some Hikvision
+firmware puts the XML straight after the boundary line. A part without a length ends
+at the next boundary, or at the first of the reader's ``ends`` markers (inclusive), so
+a self-delimiting XML part needn't wait for the part after it. Bytes that aren't inside
+a part, like a preamble or the rest of a stream we lost sync with, are dropped as they
+are scanned rather than held.
+"""
+
+import re
+from typing import NamedTuple
+
+CRLF = b"\r\n"
+HEADER_END = b"\r\n\r\n"
+
+# The start of a header line: a field name and its colon.
+_HEADER_LINE = re.compile(rb"[!-9;-~]+:")
+
+
+class Part(NamedTuple):
+    """One part of the stream: its headers (names lower-cased) and its body."""
+
+    headers: dict
+    body: bytes
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "").lower()
+
+
+def parse_headers(block) -> dict:
+    """``Name: value`` lines into a dict keyed by the lower-cased name."""
+    headers = {}
+    for line in bytes(block).split(CRLF):
+        name, sep, value = line.partition(b":")
+        if sep:
+            headers[name.strip().lower().decode("latin-1")] = value.strip().decode(
+                "latin-1"
+            )
+    return headers
+
+
+def boundary_of(content_type: str, default: str) -> str:
+    """The ``boundary=`` parameter of a multipart Content-Type header."""
+    match = re.search(r'boundary="?([^";,\s]+)"?', content_type or "", re.IGNORECASE)
+    return match.group(1) if match else default
+
+
+class MultipartReader:
+    """Incrementally frames a multipart stream: ``feed`` it chunks, take ``next_part``s."""
+
+    def __init__(self, boundary: str, ends: tuple = ()):
+        # Cameras don't agree on whether the boundary carries its own leading dashes.
+        self.delimiter = b"--" + boundary.removeprefix("--").encode()
+        self.ends = tuple(ends)
+        self._buffer = bytearray()
+        self._start = 0
+
+    def __len__(self) -> int:
+        """Bytes held that haven't been consumed as part of a part."""
+        return len(self._buffer) - self._start
+
+    def feed(self, data: bytes) -> None:
+        if self._start and self._start * 2 >= len(self._buffer):
+            del self._buffer[: self._start]
+            self._start = 0
+        self._buffer += data
+
+    def clear(self) -> None:
+        self._buffer.clear()
+        self._start = 0
+
+    def next_part(self) -> Part | None:
+        """The next complete part, consuming it; None until one has fully arrived."""
+        buffer = self._buffer
+        while True:
+            at = buffer.find(self.delimiter, self._start)
+            if at == -1:
+                # Nothing framed. Hold on only to what could be the start of a delimiter.
+                self._start = max(self._start, len(buffer) - len(self.delimiter) + 1)
+                return None
+            self._start = at
+
+            line_end = buffer.find(CRLF, at)
+            if line_end == -1:
+                return None
+            head = line_end + 2
+            if buffer.startswith(b"--", at + len(self.delimiter)):
+                # The closing delimiter; whatever follows would be a new stream.
+                self._start = head
+                continue
+            break
+
+        if len(buffer) - head < 2:
+            return None
+        if buffer.startswith(CRLF, head):
+            headers, body = {}, head + 2
+        elif buffer.startswith(b"<", head):
+            headers, body = {}, head  # XML straight after the boundary line
+        elif _HEADER_LINE.match(buffer, head):
+            end = buffer.find(HEADER_END, line_end)
+            if end == -1:
+                return None
+            headers, body = parse_headers(buffer[head:end]), end + 4
+        elif buffer.find(CRLF, head) == -1:
+            return None  # too little to tell a header line from a body yet
+        else:
+            headers, body = {}, head
+
+        length = headers.get("content-length", "")
+        if length.isdigit():
+            end = next_start = body + int(length)
+            if end > len(buffer):
+                return None
+        else:
+            end = next_start = delimiter = buffer.find(self.delimiter, body)
+            if delimiter - 2 >= body and buffer.startswith(CRLF, delimiter - 2):
+                end = delimiter - 2  # the CRLF before a delimiter belongs to it
+            limit = len(buffer) if delimiter == -1 else delimiter
+            found = [
+                hit + len(marker)
+                for marker in self.ends
+                if (hit := buffer.find(marker, body, limit)) != -1
+            ]
+            if found:
+                end = next_start = min(found)
+            if end == -1:
+                return None
+
+        with memoryview(buffer) as view:
+            part = Part(headers, bytes(view[body:end]))
+        self._start = next_start
+        return part
+
+    def parts(self):
+        """Every complete part held, in order."""
+        while (part := self.next_part()) is not None:
+            yield part
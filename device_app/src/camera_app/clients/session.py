@@ -0,0 +1,46 @@
+"""The one HTTP session a camera app talks to everything through.
+
+Every camera call used to make its own connection: Bosch opened a ``ClientSession`` per
+snapshot, the rtsp_to_web calls used one-shot ``aiohttp.request``, and each engine had a
+session of its own (Dahua's and the thermal engine's were never closed). So every call
+paid a TCP handshake -- and a TLS one on an https camera -- before the camera's slow
+embedded web server even started on it. One session per app, with a pooled connector,
+lets consecutive calls to the same camera reuse a connection.
+
+The connector's limits are per app, i.e. per camera plus its rtsp_to_web server:
+
+* ``limit_per_host`` leaves room for the long-lived event streams (the Hikvision
+  alertStream, Dahua's eventManager and snapshot streams each hold a connection for as
+  long as they run) alongside the calls made while they do.
+* ``keepalive_timeout`` is kept *under* the idle timeout of the cameras' own web
+  servers. Reusing a connection the camera has already closed costs a failed request
+  rather than a saved handshake.
+* DNS answers are cached, for cameras and servers addressed by name.
+"""
+
+import aiohttp
+
+# Connections held open to one host, including the event streams that never finish.
+CONNECTIONS_PER_HOST = 6
+# Connections in total: the camera, the rtsp_to_web server, anything a snapshot reaches.
+MAX_CONNECTIONS = 16
+# Seconds an idle connection is kept for reuse.
+KEEPALIVE_SECS = 10
+# Seconds a DNS answer is reused for.
+DNS_CACHE_SECS = 300
+
+
+def new_session() -> aiohttp.ClientSession:
+    """A session for one camera app's HTTP calls; close it when the app closes.
+
+    Timeouts are left at the session default on purpose: calls that need their own (the
+    event streams, the digest helpers) already pass them per request.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONNECTIONS,
+        limit_per_host=CONNECTIONS_PER_HOST,
+        keepalive_timeout=KEEPALIVE_SECS,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_SECS,
+    )
+    return aiohttp.ClientSession(connector=connector)
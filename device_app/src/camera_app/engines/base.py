@@ -1,19 +1,33 @@
 import asyncio
 import base64
+import os
 import re
 import shutil
 import signal
 from datetime import datetime, timedelta
 import logging
-import uuid
-from pathlib import Path
 
+import aiohttp
 from pydoover.models import File
-from camera_app.app_config import CameraConfig, Mode
+from camera_app.alert_queue import AlertQueue
+from camera_app.app_config import CameraConfig, Mode, value_or
+from camera_app.clients.session import new_session
+from camera_app.frame_grabber import FrameGrabber
+from camera_app.pre_roll import PreRollRecorder
 
-OUTPUT_FILE_DIR = Path("/tmp/camera")
 MAX_MESSAGE_SIZE = 125_000
 
+# ffmpeg's output goes to pipes and is read straight into the File: nothing captured is
+# written to disk and read back. A still is a JPEG on stdout; a video is an mp4
+# fragmented so it can be written to a pipe, with its moov up front and nothing for
+# ffmpeg to seek back and patch once it's done.
+JPEG_OUT = ("-f", "image2pipe", "-c:v", "mjpeg")
+FRAGMENTED_MP4 = (
+    "-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"
+)
+# Stands in for the path of a command's second output. See run_pipes.
+SIDE_OUTPUT = "<side output>"
+
 # Preview image uploaded alongside each snapshot/video for gallery + timeline use.
 # A capture's thumbnail sits beside its media, e.g. Preset1.jpg / Preset1-thumbnail.jpg.
 THUMBNAIL_FILENAME = "thumbnail.jpg"
@@ -57,6 +71,63 @@ def ensure_ffmpeg() -> None:
         )
 
 
+def rtsp_input(rtsp_uri: str) -> list:
+    """ffmpeg's input options for a camera's stream, as every capture opens it."""
+    return [
+        "-rtsp_transport", "tcp", "-analyzeduration", "10M", "-probesize", "10M",
+        "-i", rtsp_uri,
+    ]
+
+
+def _read_fd(fd: int) -> bytes:
+    with open(fd, "rb") as f:
+        return f.read()
+
+
+async def run_pipes(command: list, data: bytes = None) -> tuple:
+    """Run ``command`` with ``data`` on its stdin; return what it wrote to stdout,
+    and to its side output.
+
+    The side output is a second pipe, for a command with two outputs (a still and its
+    thumbnail): ``SIDE_OUTPUT`` in ``command`` becomes ``pipe:<fd>`` of it, and None is
+    returned for it when there isn't one. Both are read as they're written, so neither
+    can fill up and stall ffmpeg while the other is being waited on.
+    """
+    side_r = side_w = None
+    if SIDE_OUTPUT in command:
+        side_r, side_w = os.pipe()
+        command = [f"pipe:{side_w}" if arg == SIDE_OUTPUT else arg for arg in command]
+    try:
+        stdin = asyncio.subprocess.DEVNULL if data is None else asyncio.subprocess.PIPE
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=stdin,
+            stdout=asyncio.subprocess.PIPE,
+            pass_fds=() if side_w is None else (side_w,),
+        )
+    except OSError:
+        if side_r is not None:
+            os.close(side_r)
+        raise
+    finally:
+        # The child has its own copy. Ours would keep the pipe from reaching EOF.
+        if side_w is not None:
+            os.close(side_w)
+
+    try:
+        if side_r is None:
+            out, _ = await proc.communicate(data)
+            return out, None
+        (out, _), side = await asyncio.gather(
+            proc.communicate(data), asyncio.to_thread(_read_fd, side_r)
+        )
+        return out, side
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
 class CameraBase:
     # What this camera can do with detection zones, so the frontend can constrain
     # drawing (point limits, how many zones) instead of guessing and being silently
@@ -75,11 +146,24 @@ class CameraBase:
         "supports_per_zone_targets": False,
         "supports_disable": False,
     }
+    # Whether a capture's thumbnail may be scaled down from its still. True unless
+    # get_thumbnail has something cheaper than an ffmpeg pass over bytes already in
+    # hand (Hikvision's sub-stream picture is one HTTP GET, and works on slim).
+    THUMBNAIL_FROM_STILL = True
 
     def __init__(self, config: "CameraConfig"):
         self.config = config
-
-        self.ensure_output_dir()
+        # The app's pooled HTTP session, handed over before setup() and closed by the
+        # app, not the engine. See clients/session.py.
+        self.session: aiohttp.ClientSession = None
+        self._owns_session = False
+        # Between the camera's event stream and on_cam_event, for engines that read one.
+        self.alerts: AlertQueue = None
+        # Streams held open for stills and thumbnails, by (uri, filter). See
+        # frame_grabber.py; only used when the snapshot config asks for it.
+        self._grabbers: dict = {}
+        # The rolling recording event videos take their pre-roll from, when one runs.
+        self.pre_roll: PreRollRecorder = None
 
     # -- Detection zones (device-agnostic; see events.DetectionZone) --
 
@@ -98,38 +182,96 @@ class CameraBase:
         pass
 
     async def close(self):
-        pass
+        if self.alerts is not None:
+            self.alerts.stop()
+        await self.stop_frame_grabbers()
+        if getattr(self, "pre_roll", None) is not None:
+            await self.pre_roll.stop()
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+
+    def client_session(self) -> aiohttp.ClientSession:
+        """The session for this engine's HTTP calls to the camera.
+
+        The app's shared one when it handed one over; otherwise (an engine driven on
+        its own) one the engine makes, and closes in close().
+        """
+        if self.session is None:
+            self.session = new_session()
+            self._owns_session = True
+        return self.session
+
+    def frame_grabber(self, rtsp_uri: str, vf: str) -> FrameGrabber | None:
+        """The stream held open for frames of ``rtsp_uri`` through ``vf``, or None when
+        streams aren't being kept open (the default) or there's no ffmpeg to do it."""
+        if not value_or(self.config.snapshot.keep_stream_open, False):
+            return None
+        if shutil.which("ffmpeg") is None:
+            return None
+        key = (rtsp_uri, vf)
+        if key not in self._grabbers:
+            idle_secs = value_or(self.config.snapshot.stream_idle_secs, 120)
+            self._grabbers[key] = FrameGrabber(rtsp_uri, vf, idle_secs)
+        return self._grabbers[key]
 
-    @staticmethod
-    def get_output_filepath(task_id, snapshot_type):
-        return OUTPUT_FILE_DIR / f"{task_id}.{snapshot_type}"
+    async def stop_frame_grabbers(self) -> None:
+        """Close any stream held open; the next frame wanted reopens it.
 
-    @staticmethod
-    def ensure_output_dir() -> None:
-        OUTPUT_FILE_DIR.mkdir(parents=True, exist_ok=True)
-        # Safety net: each snapshot deletes its own temp file, but a crash
-        # between writing and unlinking could leave orphans that accumulate
-        # forever (the filenames are random UUIDs). Sweep anything stale.
-        cutoff = datetime.now() - timedelta(hours=1)
-        for f in OUTPUT_FILE_DIR.iterdir():
-            try:
-                if f.is_file() and datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
-                    f.unlink(missing_ok=True)
-            except OSError:
-                pass
+        Called by CameraPowerManagement before it cuts the camera's power, so a stream
+        isn't left stalling against a camera that has gone.
+        """
+        for grabber in getattr(self, "_grabbers", {}).values():
+            await grabber.stop()
+
+    def start_pre_roll(self, rtsp_uri: str, secs: int) -> None:
+        """Keep the last ``secs`` of the stream for event videos. See pre_roll.py."""
+        if secs <= 0 or self.pre_roll is not None:
+            return
+        if not self.config.snapshot.native_h264.value:
+            log.warning(
+                "Event video pre-roll needs 'Native H264': it copies the camera's "
+                "stream, and re-encoding it all day isn't an option. Leaving it off."
+            )
+            return
+        self.pre_roll = PreRollRecorder(rtsp_uri, secs)
+        self.pre_roll.start()
+
+    async def pause_pre_roll(self) -> None:
+        """Stop recording the pre-roll until resume_pre_roll.
+
+        Called by CameraPowerManagement before it cuts the camera's power. Left running,
+        the recorder would keep restarting ffmpeg against a camera that is switched off.
+        """
+        if getattr(self, "pre_roll", None) is not None:
+            await self.pre_roll.stop()
+
+    def resume_pre_roll(self) -> None:
+        """Start recording the pre-roll again once the camera has its power back."""
+        if getattr(self, "pre_roll", None) is not None:
+            self.pre_roll.start()
+
+    async def _grab_frame(self, rtsp_uri: str, vf: str, filename: str) -> File | None:
+        """A frame from the stream held open, or None to take one the one-off way."""
+        grabber = self.frame_grabber(rtsp_uri, vf)
+        if grabber is None:
+            return None
+        try:
+            jpeg = await grabber.frame()
+        except Exception as e:
+            log.info(f"No frame from the open stream ({e}); running ffmpeg instead.")
+            return None
+        return File(
+            filename=filename, data=jpeg, size=len(jpeg), content_type="image/jpeg"
+        )
 
     @staticmethod
-    def _read_snapshot(fp: Path, filename: str, content_type: str) -> File:
-        if not fp.exists() or fp.stat().st_size == 0:
-            # ffmpeg can leave behind a 0-byte file when the camera is
-            # unreachable; treat that as a failed snapshot rather than
-            # returning an empty File.
-            raise RuntimeError(f"ffmpeg produced no output at {fp}")
+    def _to_file(data: bytes, filename: str, content_type: str) -> File:
+        if not data:
+            # ffmpeg writes nothing when the camera is unreachable; treat that as a
+            # failed snapshot rather than returning an empty File.
+            raise RuntimeError("ffmpeg produced no output")
         return File(
-            filename=filename,
-            data=fp.read_bytes(),
-            size=fp.stat().st_size,
-            content_type=content_type,
+            filename=filename, data=data, size=len(data), content_type=content_type
         )
 
     async def on_control_message(self, message_id, data):
@@ -152,7 +294,7 @@ class CameraBase:
         thumbnail = None
         if with_thumbnail:
             try:
-                thumbnail = await self.get_thumbnail()
+                thumbnail = await self._thumbnail_for(media)
             except Exception as e:
                 log.info(f"Couldn't build a thumbnail for {safe_name}: {e}")
             if thumbnail is not None:
@@ -160,6 +302,58 @@ class CameraBase:
 
         return Capture(safe_name, media, thumbnail)
 
+    async def _thumbnail_for(self, media: File) -> File:
+        """The thumbnail of the view ``media`` shows, opening as few streams as we can.
+
+        In order: the one ffmpeg wrote alongside ``media`` in the same run; ``media``
+        itself scaled down, when it's a still; a fresh one from get_thumbnail.
+        """
+        paired = getattr(media, "paired_thumbnail", None)
+        if paired is not None:
+            return paired
+        if self.THUMBNAIL_FROM_STILL and media.content_type == "image/jpeg":
+            thumbnail = await self.scale_to_thumbnail(media.data)
+            if thumbnail is not None:
+                return thumbnail
+        return await self.get_thumbnail()
+
+    async def scale_to_thumbnail(self, jpeg: bytes) -> File | None:
+        """``jpeg`` scaled down to thumbnail width, or None if ffmpeg can't.
+
+        The image goes in on stdin and comes out on stdout: no camera, no stream, no
+        temp file, just a decode and an encode of a picture already in memory.
+        """
+        if shutil.which("ffmpeg") is None:
+            return None
+        try:
+            data, _ = await self.run_ffmpeg(
+                [
+                    "-f", "image2pipe", "-i", "pipe:0",
+                    # Never scaled up: a still narrower than a thumbnail stays as it is.
+                    "-vf", f"scale=w='min({THUMBNAIL_WIDTH},iw)':h=-1",
+                    "-frames:v", "1", *JPEG_OUT, "pipe:1",
+                ],
+                jpeg,
+            )
+        except OSError as e:
+            log.info(f"Couldn't scale the still to a thumbnail: {e}")
+            return None
+        if not data:
+            return None
+        return self._to_file(data, THUMBNAIL_FILENAME, "image/jpeg")
+
+    def _pair_thumbnail(self, media: File, jpeg: bytes) -> None:
+        """Attach the thumbnail ffmpeg wrote alongside ``media`` to ``media`` itself.
+
+        It travels with the media rather than waiting on the engine, because captures
+        can run at once (the thermal camera records both its streams together), and
+        each has to find its own thumbnail, not whichever run finished last.
+        """
+        if jpeg:
+            media.paired_thumbnail = self._to_file(
+                jpeg, THUMBNAIL_FILENAME, "image/jpeg"
+            )
+
     async def get_snapshot(self) -> list[Capture]:
         mode = self.config.snapshot.mode.value
 
@@ -196,20 +390,27 @@ class CameraBase:
             # full-size media.
             return None
 
-        fp = self.get_output_filepath(str(uuid.uuid4()), "jpg")
-        cmd = (
-            f"ffmpeg -y -rtsp_transport tcp -analyzeduration 10M -probesize 10M "
-            f"-i {self.config.rtsp_uri} -frames:v 1 "
-            f"-vf 'scale={THUMBNAIL_WIDTH}:-1' {fp}"
+        # The sub-stream, where there is one: a thumbnail needs none of the main
+        # stream's resolution, and a stream held open for it costs less to decode.
+        rtsp_uri = self.config.rtsp_sub_uri or self.config.rtsp_uri
+        thumbnail = await self._grab_frame(
+            rtsp_uri, f"scale={THUMBNAIL_WIDTH}:-1", THUMBNAIL_FILENAME
         )
+        if thumbnail is not None:
+            return thumbnail
+
         try:
-            await self.run_ffmpeg_cmd(cmd)
-            return self._read_snapshot(fp, THUMBNAIL_FILENAME, "image/jpeg")
+            data, _ = await self.run_ffmpeg(
+                [
+                    *rtsp_input(self.config.rtsp_uri),
+                    "-frames:v", "1", "-vf", f"scale={THUMBNAIL_WIDTH}:-1",
+                    *JPEG_OUT, "pipe:1",
+                ]
+            )
+            return self._to_file(data, THUMBNAIL_FILENAME, "image/jpeg")
         except Exception as e:
             log.info(f"Couldn't build a thumbnail: {e}")
             return None
-        finally:
-            fp.unlink(missing_ok=True)
 
     async def detect_night(self) -> bool:
         """Whether the camera is currently producing a night (IR) image.
@@ -222,40 +423,85 @@ class CameraBase:
         """
         return None
 
-    async def get_still_snapshot(self, rtsp_uri: str) -> File:
-        fp = self.get_output_filepath(str(uuid.uuid4()), "jpg")
-        cmd = f"ffmpeg -y -rtsp_transport tcp -analyzeduration 10M -probesize 10M -i {rtsp_uri} -vf 'scale={self.config.snapshot.scale.value.value}' -frames:v 1 {fp}"
-        try:
-            await self.run_ffmpeg_cmd(cmd)
-            return self._read_snapshot(fp, "snapshot.jpg", "image/jpeg")
-        finally:
-            fp.unlink(missing_ok=True)
+    async def get_still_snapshot(
+        self, rtsp_uri: str, with_thumbnail: bool = True
+    ) -> File:
+        """A still off ``rtsp_uri``, paired with its thumbnail unless told not to.
+
+        Pass ``with_thumbnail=False`` when the capture won't use one (see
+        build_capture), so ffmpeg isn't asked to encode a JPEG nobody reads.
+        """
+        scale = f"scale={self.config.snapshot.scale.value.value}"
+        snapshot = await self._grab_frame(rtsp_uri, scale, "snapshot.jpg")
+        if snapshot is not None:
+            return snapshot
+
+        if not with_thumbnail:
+            data, _ = await self.run_ffmpeg(
+                [
+                    *rtsp_input(rtsp_uri),
+                    "-vf", scale, "-frames:v", "1", *JPEG_OUT, "pipe:1",
+                ]
+            )
+            return self._to_file(data, "snapshot.jpg", "image/jpeg")
+
+        # One connect, one probe, one decoded frame, split into the still and its
+        # thumbnail, rather than a second session for the thumbnail straight after.
+        data, thumb = await self.run_ffmpeg(
+            [
+                *rtsp_input(rtsp_uri),
+                "-filter_complex",
+                f"[0:v]split=2[a][b];"
+                f"[a]{scale}[still];"
+                f"[b]scale={THUMBNAIL_WIDTH}:-1[thumb]",
+                "-map", "[still]", "-frames:v", "1", *JPEG_OUT, "pipe:1",
+                "-map", "[thumb]", "-frames:v", "1", *JPEG_OUT, SIDE_OUTPUT,
+            ]
+        )
+        snapshot = self._to_file(data, "snapshot.jpg", "image/jpeg")
+        self._pair_thumbnail(snapshot, thumb)
+        return snapshot
 
-    async def get_video_snapshot(self, rtsp_uri: str, secs: int = None) -> File:
+    async def get_video_snapshot(
+        self, rtsp_uri: str, secs: int = None, with_thumbnail: bool = True
+    ) -> File:
         # `secs` lets callers ask for a video of a specific length; snapshots use the
-        # configured duration.
+        # configured duration. `with_thumbnail=False` skips the paired thumbnail for a
+        # clip whose capture won't use one.
         secs = secs or self.config.snapshot.secs.value
-        fp = self.get_output_filepath(str(uuid.uuid4()), "mp4")
 
         # possible alternative, allegedly h265 is the "new" best high-compression format.
         # ffmpeg -y -rtsp_transport tcp -i rtsp://10.144.239.221:554/s0 -vf
         # scale=420:-1 -r 10 -t 6 -vcodec libx265 -tag:v hvc1 -c:a aac output.mp4
         if self.config.snapshot.native_h264.value:
             # Stream-copy avoids decode/re-encode CPU cost; filters can't be applied to a copied stream.
-            cmd = (
-                f"ffmpeg -y -rtsp_transport tcp -analyzeduration 10M -probesize 10M -i {rtsp_uri} "
-                f"-t {secs} -c:v copy -c:a aac {fp}"
-            )
+            args = [
+                *rtsp_input(rtsp_uri),
+                "-t", str(secs), "-c:v", "copy", "-c:a", "aac",
+                *FRAGMENTED_MP4, "pipe:1",
+            ]
         else:
-            cmd = (
-                f"ffmpeg -y -rtsp_transport tcp -analyzeduration 10M -probesize 10M -i {rtsp_uri} -vf 'fps={self.config.snapshot.fps.value},scale={self.config.snapshot.scale.value.value},"
-                f"format=yuv420p,pad=ceil(iw/2)*2:ceil(ih/2)*2' -t {secs} -c:v libx264 -c:a aac {fp}"
-            )
-        try:
-            await self.run_ffmpeg_cmd(cmd)
-            return self._read_snapshot(fp, "snapshot.mp4", "video/mp4")
-        finally:
-            fp.unlink(missing_ok=True)
+            # The stream is decoded for the re-encode anyway, so its first frame is
+            # written out as the thumbnail too. (Not when copying: decoding a whole
+            # clip for one frame costs more than a second session does.)
+            args = [
+                *rtsp_input(rtsp_uri),
+                "-vf",
+                f"fps={self.config.snapshot.fps.value},"
+                f"scale={self.config.snapshot.scale.value.value},format=yuv420p,"
+                f"pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-t", str(secs), "-c:v", "libx264", "-c:a", "aac",
+                *FRAGMENTED_MP4, "pipe:1",
+            ]
+            if with_thumbnail:
+                args += [
+                    "-map", "0:v", "-vf", f"scale={THUMBNAIL_WIDTH}:-1",
+                    "-frames:v", "1", *JPEG_OUT, SIDE_OUTPUT,
+                ]
+        data, thumb = await self.run_ffmpeg(args)
+        video = self._to_file(data, "snapshot.mp4", "video/mp4")
+        self._pair_thumbnail(video, thumb)
+        return video
 
     async def record_video_until(
         self, rtsp_uri: str, stop: asyncio.Event, max_secs: int
@@ -266,28 +512,44 @@ class CameraBase:
         recording runs for as long as the intruder keeps triggering detections. The
         ``-t`` cap is a backstop in case we never get told to stop.
 
-        ffmpeg is interrupted rather than killed: an mp4 only gets its trailer (and
-        so becomes playable) when ffmpeg shuts down cleanly, and SIGKILL would leave
-        an unplayable file.
+        ffmpeg is interrupted rather than killed, so it flushes the fragment it's in
+        the middle of and the video keeps its last seconds; SIGKILL would drop them.
+
+        With a pre-roll recorder running, the video is spliced from its segments
+        instead, so it starts before the event did.
         """
         ensure_ffmpeg()
-        self.ensure_output_dir()
-        fp = self.get_output_filepath(str(uuid.uuid4()), "mp4")
+        if self.pre_roll is not None:
+            try:
+                first = self.pre_roll.begin_event()
+            except RuntimeError as e:
+                log.info(f"No pre-roll for this event ({e}); recording it live.")
+            else:
+                return await self._record_with_pre_roll(first, stop, max_secs)
 
         if self.config.snapshot.native_h264.value:
-            encode = "-c:v copy -c:a aac"
+            encode = ["-c:v", "copy", "-c:a", "aac"]
         else:
-            encode = (
-                f"-vf 'fps={self.config.snapshot.fps.value},"
+            encode = [
+                "-vf",
+                f"fps={self.config.snapshot.fps.value},"
                 f"scale={self.config.snapshot.scale.value.value},format=yuv420p,"
-                f"pad=ceil(iw/2)*2:ceil(ih/2)*2' -c:v libx264 -c:a aac"
-            )
-        cmd = (
-            f"ffmpeg -y -rtsp_transport tcp -analyzeduration 10M -probesize 10M "
-            f"-i {rtsp_uri} -t {max_secs} {encode} {fp}"
+                f"pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v", "libx264", "-c:a", "aac",
+            ]
+        args = [
+            "-nostdin", *rtsp_input(rtsp_uri), "-t", str(max_secs), *encode,
+            *FRAGMENTED_MP4, "pipe:1",
+        ]
+        log.info(f"running cmd: ffmpeg {' '.join(args)}")
+        # exec, not a shell, so the interrupt reaches ffmpeg itself.
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
         )
-        log.info(f"running cmd: {cmd}")
-        proc = await asyncio.create_subprocess_shell(cmd)
+        # Drained as it's written, or ffmpeg stalls on a full pipe mid-event.
+        reading = asyncio.create_task(proc.stdout.read())
 
         try:
             try:
@@ -297,13 +559,28 @@ class CameraBase:
 
             if proc.returncode is None:
                 proc.send_signal(signal.SIGINT)
+            data = await reading
             await proc.wait()
-            return self._read_snapshot(fp, "event.mp4", "video/mp4")
+            return self._to_file(data, "event.mp4", "video/mp4")
         finally:
+            reading.cancel()
             if proc.returncode is None:
                 proc.kill()
                 await proc.wait()
-            fp.unlink(missing_ok=True)
+
+    async def _record_with_pre_roll(
+        self, first: int, stop: asyncio.Event, max_secs: int
+    ) -> File:
+        """The pre-roll recorder's segments from ``first`` until ``stop``, as one mp4."""
+        try:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max_secs)
+            except asyncio.TimeoutError:
+                log.info(f"Event video hit the {max_secs}s cap.")
+            data = await self.pre_roll.splice(first)
+            return self._to_file(data, "event.mp4", "video/mp4")
+        finally:
+            self.pre_roll.end_event()
 
     async def remux_to_mp4(self, data: bytes, name: str) -> File:
         """Repackage a camera's recorded bytes into an mp4 that will actually play.
@@ -316,29 +593,22 @@ class CameraBase:
         The audio is the one thing that has to be re-encoded: these cameras record
         G.711 (``pcm_mulaw``), which mp4 cannot carry — a plain ``-c copy`` fails
         outright with "Could not find tag for codec pcm_mulaw".
-        """
-        ensure_ffmpeg()
-        self.ensure_output_dir()
-        src = self.get_output_filepath(str(uuid.uuid4()), "ps")
-        dst = self.get_output_filepath(str(uuid.uuid4()), "mp4")
-        src.write_bytes(data)
 
-        cmd = (
-            f"ffmpeg -y -i {src} -c:v copy -c:a aac -movflags +faststart {dst}"
+        The download goes in on stdin and the mp4 comes out on stdout; a program
+        stream reads front to back, so neither end needs a file.
+        """
+        out, _ = await self.run_ffmpeg(
+            ["-i", "pipe:0", "-c:v", "copy", "-c:a", "aac", *FRAGMENTED_MP4, "pipe:1"],
+            data,
         )
-        try:
-            await self.run_ffmpeg_cmd(cmd)
-            return self._read_snapshot(dst, f"{name}.mp4", "video/mp4")
-        finally:
-            src.unlink(missing_ok=True)
-            dst.unlink(missing_ok=True)
+        return self._to_file(out, f"{name}.mp4", "video/mp4")
 
-    async def run_ffmpeg_cmd(self, cmd):
+    async def run_ffmpeg(self, args: list, data: bytes = None) -> tuple:
+        """ffmpeg with ``args``, fed ``data``; its (stdout, side output). See
+        :func:`run_pipes`."""
         ensure_ffmpeg()
-        self.ensure_output_dir()
-        log.info(f"running cmd: {cmd}")
-        proc = await asyncio.create_subprocess_shell(cmd)
-        await proc.communicate()
+        log.info(f"running cmd: ffmpeg {' '.join(args)}")
+        return await run_pipes(["ffmpeg", *args], data)
 
     async def ping(self, timeout: int):
         hostname = self.config.connection.address.value
@@ -30,6 +30,7 @@ class BoschCameraBase(CameraBase):
             self.config.connection.password.value,
             self.config.connection.address.value,
             self.config.connection.control_port.value,
+            self.client_session(),
         )
         try:
             await self.client.connect()
@@ -58,6 +59,7 @@ class BoschCameraBase(CameraBase):
     async def close(self):
         if self.event_subscription_task:
             self.event_subscription_task.cancel()
+        await super().close()
 
     async def get_still_snapshot(self, rtsp_uri: str) -> File:
         snap = await self.client.get_snapshot()
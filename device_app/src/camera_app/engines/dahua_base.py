@@ -1,17 +1,16 @@
 import asyncio
 import base64
 import io
-import json
 import logging
-import re
 
 from datetime import datetime, timedelta
 
-import aiohttp
 from pydoover.models import File
 
 from .base import CameraBase, MAX_MESSAGE_SIZE
+from ..alert_queue import AlertQueue
 from ..clients import DahuaClient
+from ..clients.dahua import event_coalesce_key
 from ..events import (
     DetectionTarget,
     DetectionZone,
@@ -31,15 +30,6 @@ TARGET_TO_DAHUA = {
 DAHUA_TO_TARGET = {v: k for k, v in TARGET_TO_DAHUA.items()}
 
 
-EVENT_MATCH = re.compile(
-    r"(?P<boundary>.*)\r\n"
-    r"Content-Type: (?P<content>.*)\r\n"
-    r"Content-Length: (?P<content_length>\d*)\r\n\r\n"
-    r"Code=(?P<code>.*);action=(?P<action>.*);index=(?P<index>.*);data=(?P<data>.*)",
-    re.DOTALL,
-)
-
-
 log = logging.getLogger(__name__)
 
 
@@ -81,7 +71,7 @@ class DahuaCameraBase(CameraBase):
             self.config.connection.address.value,
             self.config.connection.control_port.value,
             self.config.connection.rtsp_port.value,
-            aiohttp.ClientSession(),
+            self.client_session(),
         )
         try:
             status = await self.client.get_status()
@@ -100,15 +90,19 @@ class DahuaCameraBase(CameraBase):
                 vehicle=self.config.vehicle_detect_enabled,
             )
             events = ["SmartMotionHuman", "SmartMotionVehicle"]
+            # As for Hikvision: queued, so handling an event never stalls the stream.
+            self.alerts = AlertQueue(self.on_cam_event, event_coalesce_key)
+            self.alerts.start()
             self.stream_events_task = asyncio.create_task(
-                self.client.stream_events(self.on_cam_event, events)
+                self.client.stream_events(self.alerts.put, events)
             )
 
         return True
 
-    def close(self):
+    async def close(self):
         if self.stream_events_task:
             self.stream_events_task.cancel()
+        await super().close()
 
     # -- Detection zones --
 
@@ -205,14 +199,16 @@ class DahuaCameraBase(CameraBase):
         #     proj = base64.b64encode(buf.getbuffer())
         # return proj
 
-    async def on_cam_event(self, data: bytes, _):
-        match = EVENT_MATCH.search(data.decode())
-        if not (match and match.group("action") == "Start"):
-            return  # this will also ignore heartbeat events
+    async def on_cam_event(self, event: dict, _):
+        # One event per call, already framed and parsed by the client (heartbeats never
+        # get this far). Matching a regex over raw chunks assumed one event per chunk,
+        # which lost or garbled any that arrived split or together.
+        if event.get("action") != "Start":
+            return
 
-        data = json.loads(match.group("data"))
+        data = event.get("data") or {}
 
-        match match.group("code"):
+        match event.get("Code"):
             case "SmartMotionHuman":
                 event_type = MotionDetectEventType.person
             case "SmartMotionVehicle":
@@ -52,16 +52,18 @@ import logging
 import shutil
 from datetime import datetime, timedelta, timezone
 
-import aiohttp
 from pydoover.models import File
 
 from .base import CameraBase, THUMBNAIL_FILENAME
+from ..alert_queue import AlertQueue
+from ..app_config import value_or
 from ..clients import HikvisionClient
 from ..clients.hikvision import (
     ENTRANCE_EDGE_WARN,
     INTRUSION_DWELL_MAX_SECS,
     INTRUSION_DWELL_SECS,
     NORMALIZED_SCREEN,
+    alert_coalesce_key,
 )
 from ..events import (
     DETECTOR_REQUIRES_TARGET,
@@ -161,6 +163,9 @@ HIK_TO_TARGET = {v: k for k, v in TARGET_TO_HIK.items()}
 
 
 class HikvisionAcuSenseCamera(CameraBase):
+    # get_thumbnail's sub-stream picture is one HTTP GET, cheaper than scaling a still.
+    THUMBNAIL_FROM_STILL = False
+
     # Read off this camera's own /ISAPI/Smart/FieldDetection/1/capabilities:
     # 4 region slots, 3-10 points each, sensitivity 1-100.
     ZONE_CAPABILITIES = {
@@ -244,7 +249,6 @@ class HikvisionAcuSenseCamera(CameraBase):
         super().__init__(config)
 
         self.client: HikvisionClient = None
-        self._session: aiohttp.ClientSession = None
         self.stream_events_task = None
 
         self.on_motion_event_callback = motion_detect_callback
@@ -274,14 +278,13 @@ class HikvisionAcuSenseCamera(CameraBase):
         self.event_clip_mode: str = None
 
     async def setup(self):
-        self._session = aiohttp.ClientSession()
         self.client = HikvisionClient(
             self.config.connection.username.value,
             self.config.connection.password.value,
             self.config.connection.address.value,
             self.config.connection.control_port.value,
             self.config.connection.rtsp_port.value,
-            self._session,
+            self.client_session(),
         )
 
         try:
@@ -325,6 +328,13 @@ class HikvisionAcuSenseCamera(CameraBase):
         # Resolve this before arming: the deterrent only adds the `record` linkage
         # when we're actually going to read recordings back off the camera.
         self.event_clip_mode = await self._resolve_event_clip_mode()
+        if self.event_clip_mode == "ffmpeg":
+            # Recording only starts once we hear of the event, so without a card the
+            # moments before it come from a rolling recording, when that's turned on.
+            self.start_pre_roll(
+                self.config.rtsp_uri,
+                value_or(self.config.alarm.event_clip_pre_roll_secs, 0),
+            )
 
         # Before the deterrent: it branches on whether the camera can gate the linkage
         # itself, which is what this decides. Written even with the alarm disabled — the
@@ -339,16 +349,19 @@ class HikvisionAcuSenseCamera(CameraBase):
             # leaves the deterrent off, which is what's wanted here.
             await self.client.set_smart_alarm_linkage(False)
 
+        # The reader only queues; on_cam_event runs from the queue's own task, so a
+        # slow detection never stops the stream being read. See alert_queue.
+        self.alerts = AlertQueue(self.on_cam_event, alert_coalesce_key)
+        self.alerts.start()
         self.stream_events_task = asyncio.create_task(
-            self.client.stream_events(self.on_cam_event)
+            self.client.stream_events(self.alerts.put)
         )
         return True
 
     async def close(self):
         if self.stream_events_task:
             self.stream_events_task.cancel()
-        if self._session and not self._session.closed:
-            await self._session.close()
+        await super().close()
 
     @staticmethod
     def _extract_target(event: dict) -> str:
@@ -20,11 +20,12 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 
-import aiohttp
 from pydoover.models import File
 
 from .base import CameraBase, THUMBNAIL_FILENAME
+from ..alert_queue import AlertQueue
 from ..clients import HikvisionClient
+from ..clients.hikvision import alert_coalesce_key
 from ..events import ANPREvent, MotionDetectEvent, MotionDetectEventType
 
 
@@ -32,6 +33,9 @@ log = logging.getLogger(__name__)
 
 
 class HikvisionANPRCamera(CameraBase):
+    # get_thumbnail's sub-stream picture is one HTTP GET, cheaper than scaling a still.
+    THUMBNAIL_FROM_STILL = False
+
     def __init__(
         self,
         config,
@@ -43,7 +47,6 @@ class HikvisionANPRCamera(CameraBase):
         super().__init__(config)
 
         self.client: HikvisionClient = None
-        self._session: aiohttp.ClientSession = None
         self.stream_events_task = None
 
         self.on_motion_event_callback = motion_detect_callback
@@ -55,14 +58,13 @@ class HikvisionANPRCamera(CameraBase):
         self._night_armed: bool = None
 
     async def setup(self):
-        self._session = aiohttp.ClientSession()
         self.client = HikvisionClient(
             self.config.connection.username.value,
             self.config.connection.password.value,
             self.config.connection.address.value,
             self.config.connection.control_port.value,
             self.config.connection.rtsp_port.value,
-            self._session,
+            self.client_session(),
         )
 
         try:
@@ -92,16 +94,19 @@ class HikvisionANPRCamera(CameraBase):
             # Apply the correct arm state for the current time immediately.
             await self.arm_night_alarm(self.config.is_night())
 
+        # The reader only queues; on_cam_event runs from the queue's own task, so a
+        # slow detection never stops the stream being read. See alert_queue.
+        self.alerts = AlertQueue(self.on_cam_event, alert_coalesce_key)
+        self.alerts.start()
         self.stream_events_task = asyncio.create_task(
-            self.client.stream_events(self.on_cam_event)
+            self.client.stream_events(self.alerts.put)
         )
         return True
 
     async def close(self):
         if self.stream_events_task:
             self.stream_events_task.cancel()
-        if self._session and not self._session.closed:
-            await self._session.close()
+        await super().close()
 
     async def on_cam_event(self, event: dict):
         event_type = event.get("eventType", "")
@@ -2,7 +2,6 @@ import asyncio
 import logging
 from typing import TYPE_CHECKING
 
-import aiohttp
 from pydoover.models import File
 
 from .base import CameraBase
@@ -28,7 +27,7 @@ class HikVisionThermal(CameraBase):
             self.config.connection.address.value,
             self.config.connection.control_port.value,
             self.config.connection.rtsp_port.value,
-            aiohttp.ClientSession(),
+            self.client_session(),
         )
         try:
             status = await self.client.get_status()
@@ -58,7 +57,10 @@ class HikVisionThermal(CameraBase):
             if self.config.thermal_rtsp_uri:
                 visible, thermal = await asyncio.gather(
                     self.get_video_snapshot(self.config.rtsp_uri),
-                    self.get_video_snapshot(self.config.thermal_rtsp_uri),
+                    # Captured below without a thumbnail, so don't encode one.
+                    self.get_video_snapshot(
+                        self.config.thermal_rtsp_uri, with_thumbnail=False
+                    ),
                 )
             else:
                 visible = await self.get_video_snapshot(self.config.rtsp_uri)
@@ -0,0 +1,194 @@
+"""A camera's RTSP stream held open, with its latest frames kept in memory.
+
+Every still and thumbnail taken with ffmpeg used to be a fresh ffmpeg: connect, RTSP
+handshake, probe (``-analyzeduration 10M -probesize 10M``), wait for a keyframe, decode
+one frame, exit. On the generic and UniFi cameras that costs seconds a picture, nearly
+all of it before the first frame, and a capture paid it twice: once for the still, then
+again for its thumbnail.
+
+A :class:`FrameGrabber` runs one ffmpeg for as long as frames are wanted. It decodes the
+stream at a couple of frames a second into JPEGs on stdout and keeps the last few in a
+ring. A still is then the newest frame in the ring, straight from memory.
+
+It is lazy both ways. The first request for a frame starts it, and it stops once nobody
+has asked for one in ``idle_secs``. Nor does it reconnect by itself: when ffmpeg exits,
+because the camera rebooted or lost power, the grabber stays down until something wants
+a frame again. That is what keeps it out of CameraPowerManagement's way. A camera whose
+power has been released isn't hammered with reconnects, and the engine's grabbers are
+stopped outright when the power goes (see ``CameraBase.stop_frame_grabbers``).
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Frames decoded a second. Enough that the newest is never far behind the scene, few
+# enough that a Pi decoding a 1080p stream around the clock barely notices.
+GRABBER_FPS = 2
+# Recent frames held.
+RING_FRAMES = 4
+# How old the newest frame may be and still count as "now". Older, and the next one is
+# waited for, which is at most 1 / GRABBER_FPS away on a running stream.
+FRESH_SECS = 1.0
+# How long a request waits for a frame. A cold start has to connect, probe and reach a
+# keyframe first, so this is generous.
+FRAME_WAIT_SECS = 20
+# Seconds without a byte from ffmpeg before the stream counts as stalled.
+READ_TIMEOUT_SECS = 30
+# Unframed bytes held before giving up on finding the end of a frame.
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+JPEG_START = b"\xff\xd8"
+JPEG_END = b"\xff\xd9"
+
+
+def take_jpegs(buffer: bytearray) -> list:
+    """Cut every complete JPEG out of the front of ``buffer``, leaving the rest.
+
+    ffmpeg's mjpeg encoder writes no embedded thumbnails, and inside the entropy-coded
+    data a 0xFF byte is always stuffed, so the first end-of-image marker after a
+    start-of-image is the end of that frame.
+    """
+    frames, start = [], 0
+    while True:
+        soi = buffer.find(JPEG_START, start)
+        if soi == -1:
+            # Keep a trailing 0xFF, which could be the first half of the next marker.
+            start = max(start, len(buffer) - 1)
+            break
+        eoi = buffer.find(JPEG_END, soi + 2)
+        if eoi == -1:
+            start = soi
+            break
+        frames.append(bytes(buffer[soi : eoi + 2]))
+        start = eoi + 2
+    del buffer[:start]
+    return frames
+
+
+class FrameGrabber:
+    """One long-lived ffmpeg decoding ``rtsp_uri`` through the filter ``vf``."""
+
+    def __init__(
+        self,
+        rtsp_uri: str,
+        vf: str = None,
+        idle_secs: float = 120,
+        fps: int = GRABBER_FPS,
+        frames: int = RING_FRAMES,
+    ):
+        self.rtsp_uri = rtsp_uri
+        self.vf = vf
+        self.idle_secs = idle_secs
+        self.fps = fps
+        # (arrival time, jpeg) pairs, oldest first.
+        self.frames: deque = deque(maxlen=frames)
+
+        self._task: asyncio.Task = None
+        # From start() until the stream has ended; a task still cleaning up isn't live.
+        self._live = False
+        self._last_used = 0.0
+        # Set, and replaced, on every frame and when the stream ends.
+        self._changed = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._live
+
+    def command(self) -> list:
+        vf = f"fps={self.fps}" + (f",{self.vf}" if self.vf else "")
+        return [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-rtsp_transport", "tcp", "-analyzeduration", "10M", "-probesize", "10M",
+            "-i", self.rtsp_uri,
+            "-vf", vf, "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", "3", "pipe:1",
+        ]
+
+    def start(self) -> None:
+        if not self._live:
+            self._live = True
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        self._live = False
+        self._notify()
+
+    async def frame(
+        self, max_age: float = FRESH_SECS, timeout: float = FRAME_WAIT_SECS
+    ) -> bytes:
+        """The newest frame if it's under ``max_age`` seconds old, else the next one.
+
+        Starts the stream if it isn't running. Raises if no frame arrives in
+        ``timeout`` seconds, or the stream ends before one does.
+        """
+        self._last_used = time.monotonic()
+        self.start()
+
+        async def fresh() -> bytes:
+            while True:
+                if self.frames and time.monotonic() - self.frames[-1][0] <= max_age:
+                    return self.frames[-1][1]
+                if not self.running:
+                    raise RuntimeError("The stream ended before a frame arrived.")
+                await self._changed.wait()
+
+        return await asyncio.wait_for(fresh(), timeout)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _run(self) -> None:
+        proc, buffer = None, bytearray()
+        try:
+            # exec, not a shell: killing a shell would leave its ffmpeg running, holding
+            # the camera's stream open with nobody reading it.
+            proc = await asyncio.create_subprocess_exec(
+                *self.command(),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            log.info(f"Holding a stream open for frames (pid {proc.pid}).")
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        proc.stdout.read(256 * 1024), READ_TIMEOUT_SECS
+                    )
+                except asyncio.TimeoutError:
+                    log.info(f"Stream stalled for {READ_TIMEOUT_SECS}s; closing it.")
+                    break
+                if not chunk:
+                    log.info("Stream ended.")
+                    break
+
+                buffer += chunk
+                for jpeg in take_jpegs(buffer):
+                    self.frames.append((time.monotonic(), jpeg))
+                    self._notify()
+                if len(buffer) > MAX_FRAME_BYTES:
+                    buffer.clear()
+
+                if time.monotonic() - self._last_used > self.idle_secs:
+                    log.info(f"No frame wanted for {self.idle_secs}s; closing stream.")
+                    break
+        except OSError as e:
+            log.warning(f"Couldn't start ffmpeg for the stream: {e}")
+        finally:
+            if self._task is asyncio.current_task():
+                self._live = False
+            self._notify()
+            if proc is not None and proc.returncode is None:
+                proc.kill()
+                await proc.wait()
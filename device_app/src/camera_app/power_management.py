@@ -86,6 +86,7 @@ class CameraPowerManagement:
             self._is_pingable = False
             await self.publish_status()
             self._start_ping_check()
+            self._resume_streams()
 
         if acquired_until > acquire_until:
             log.info(
@@ -171,6 +172,7 @@ class CameraPowerManagement:
             self._suspended = True
 
         log.info("Releasing power...")
+        await self._stop_streams()
         await self.app.platform_iface.set_do(self.config.pin.value, False)
 
         was_on = self.power_is_on
@@ -215,6 +217,7 @@ class CameraPowerManagement:
             self._powered_on_at = datetime.now()
             self._is_pingable = False
             await self.publish_status()
+            self._resume_streams()
 
         if not (self._watchdog_task and not self._watchdog_task.done()):
             self._watchdog_task = asyncio.create_task(self._watchdog())
@@ -286,6 +289,7 @@ class CameraPowerManagement:
 
         log.warning(f"Power cycling the camera: off for {off_secs}s.")
         self._cycling = True
+        await self._stop_streams()
         try:
             await self.app.platform_iface.set_do(pin, False)
             self._powered_on_at = None
@@ -297,6 +301,7 @@ class CameraPowerManagement:
             await self.app.platform_iface.set_do(pin, True)
             self._powered_on_at = datetime.now()
             await self.publish_status()
+            self._resume_streams()
             log.info(f"Camera powered back up; giving it {wake_delay}s to boot.")
         except Exception as e:
             log.error(f"Power cycle failed: {e}", exc_info=e)
@@ -305,6 +310,37 @@ class CameraPowerManagement:
 
         await asyncio.sleep(wake_delay)
 
+    async def _stop_streams(self):
+        """Close any RTSP stream the engine is holding open, before the power goes.
+
+        A frame grabber (see frame_grabber.py) would only stall, and never reopens by
+        itself. The pre-roll recorder (see pre_roll.py) does restart by itself, so it is
+        paused until :meth:`_resume_streams`. Either way nothing is left trying to reach
+        a camera that is switched off.
+        """
+        for name in ("stop_frame_grabbers", "pause_pre_roll"):
+            stop = getattr(self.app.engine, name, None)
+            if stop is None:
+                continue
+            try:
+                await stop()
+            except Exception as e:
+                log.warning(f"Failed to close the camera's streams: {e}")
+
+    def _resume_streams(self):
+        """Restart what _stop_streams paused, now the camera has power again.
+
+        Frame grabbers reopen on the next frame wanted; only the pre-roll needs telling.
+        Its restart backoff covers the seconds the camera spends booting.
+        """
+        resume = getattr(self.app.engine, "resume_pre_roll", None)
+        if resume is None:
+            return
+        try:
+            resume()
+        except Exception as e:
+            log.warning(f"Failed to resume the camera's pre-roll: {e}")
+
     def _start_ping_check(self):
         if self._ping_task and not self._ping_task.done():
             return
@@ -0,0 +1,249 @@
+"""A rolling recording of the last few seconds, so an event video can start before its
+trigger.
+
+Recording the stream with ffmpeg only starts once the camera has told us about the
+event, so an ffmpeg event video opens on the intruder already in frame, or already
+leaving it. A camera with a microSD card doesn't have the problem, because it keeps its
+own pre-roll (see ``HikvisionAcuSenseCamera._fetch_sd_video``). Without a card there was
+no way to see how the event started.
+
+:class:`PreRollRecorder` stream-copies the camera's stream into short MPEG-TS segments
+for as long as it runs, in a directory on tmpfs so the SD card isn't written to. Between
+events, segments older than the pre-roll are deleted as they go out of range, under a
+cap on their total size. When an event starts, the segment holding its first pre-roll
+second is pinned, and nothing from there on is deleted until the event is over. The
+event video is then those segments concatenated into one mp4 with ``-c copy``: the
+seconds before the trigger, spliced onto the recording of the event, without decoding
+a frame.
+
+Segments are cut at keyframes, because a copied stream can only be cut there, so the
+pre-roll is rounded out to a whole GOP: a few seconds more at most, never less.
+
+If ffmpeg exits (the camera rebooted, or lost its power), it is restarted after a
+backoff. Until segments are arriving again, an event falls back to a live recording.
+When CameraPowerManagement takes the camera's power away, it stops the recorder
+outright and starts it again once the power is back, so nothing keeps retrying
+against a camera that is switched off.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# tmpfs where there is one: segments are rewritten every couple of seconds, all day.
+PRE_ROLL_DIR = (
+    Path("/dev/shm/camera-pre-roll")
+    if Path("/dev/shm").is_dir()
+    else Path("/tmp/camera/pre-roll")
+)
+# Target segment length. Cuts land on the next keyframe after it.
+SEGMENT_SECS = 2
+# Cap on the segments kept between events, whatever the pre-roll asked for. This is
+# memory on tmpfs; at a camera's usual 2-8 Mbit/s it is far more than a pre-roll needs.
+MAX_RING_BYTES = 32 * 1024 * 1024
+# Backoff between restarts of an ffmpeg that has exited.
+RESTART_MIN_SECS = 5
+RESTART_MAX_SECS = 60
+
+
+class PreRollRecorder:
+    """Keeps the last ``pre_roll_secs`` of ``rtsp_uri`` as segments in ``directory``."""
+
+    def __init__(
+        self,
+        rtsp_uri: str,
+        pre_roll_secs: int,
+        directory: Path = PRE_ROLL_DIR,
+        segment_secs: int = SEGMENT_SECS,
+        max_bytes: int = MAX_RING_BYTES,
+    ):
+        self.rtsp_uri = rtsp_uri
+        self.pre_roll_secs = pre_roll_secs
+        self.directory = Path(directory)
+        self.segment_secs = segment_secs
+        self.max_bytes = max_bytes
+
+        self._task: asyncio.Task = None
+        # The first segment of the event being recorded; it and all after it are kept.
+        self._pinned: int = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def segments(self) -> list:
+        """The segments on disk, oldest first (names are zero-padded numbers)."""
+        try:
+            return sorted(self.directory.glob("*.ts"))
+        except OSError:
+            return []
+
+    def command(self, start_number: int) -> list:
+        return [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-rtsp_transport", "tcp", "-analyzeduration", "10M", "-probesize", "10M",
+            "-i", self.rtsp_uri,
+            "-c:v", "copy", "-c:a", "aac",
+            "-f", "segment", "-segment_time", str(self.segment_secs),
+            "-segment_format", "mpegts", "-segment_start_number", str(start_number),
+            str(self.directory / "%09d.ts"),
+        ]
+
+    async def _run(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = self.segments()
+        if self._pinned is None:
+            # Whatever a previous run left is no use to this one...
+            for segment in segments:
+                segment.unlink(missing_ok=True)
+            segments = []
+        # ...unless an event paused by a power cycle is still waiting on it, in which
+        # case numbering carries on after it.
+        number = int(segments[-1].stem) + 1 if segments else 0
+
+        delay = RESTART_MIN_SECS
+        while True:
+            proc = None
+            started = time.monotonic()
+            try:
+                # exec, not a shell, so stopping kills ffmpeg rather than its shell.
+                proc = await asyncio.create_subprocess_exec(
+                    *self.command(number),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                log.info(
+                    f"Recording {self.pre_roll_secs}s of pre-roll (pid {proc.pid})."
+                )
+                while proc.returncode is None:
+                    try:
+                        await asyncio.wait_for(proc.wait(), self.segment_secs)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._prune()
+            except OSError as e:
+                log.warning(f"Couldn't start the pre-roll recorder: {e}")
+            finally:
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+
+            # Carry on numbering after what's there, so a restart can't overwrite a
+            # segment an event has pinned.
+            segments = self.segments()
+            number = int(segments[-1].stem) + 1 if segments else number
+            if time.monotonic() - started > RESTART_MAX_SECS:
+                delay = RESTART_MIN_SECS
+            log.info(f"Pre-roll recorder stopped; restarting in ~{delay}s.")
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, RESTART_MAX_SECS)
+
+    def _prune(self) -> None:
+        """Delete what the pre-roll no longer reaches, sparing what an event pinned."""
+        segments = self.segments()
+        cutoff = time.time() - self.pre_roll_secs
+        total = 0
+        sizes = {}
+        for segment in segments:
+            try:
+                stat = segment.stat()
+            except OSError:
+                continue
+            sizes[segment] = stat.st_size
+            total += stat.st_size
+            # A segment last written before the cutoff holds nothing the pre-roll needs.
+            # The newest is never one of them: it's the one ffmpeg is writing.
+            stale = stat.st_mtime < cutoff and segment != segments[-1]
+            if stale and self._prunable(segment):
+                segment.unlink(missing_ok=True)
+                total -= stat.st_size
+
+        for segment in segments[:-1]:
+            if total <= self.max_bytes:
+                break
+            if segment.exists() and self._prunable(segment):
+                segment.unlink(missing_ok=True)
+                total -= sizes.get(segment, 0)
+
+    def _prunable(self, segment: Path) -> bool:
+        return self._pinned is None or int(segment.stem) < self._pinned
+
+    def begin_event(self) -> int:
+        """Pin the segments from the start of the pre-roll on, and return the first.
+
+        Raises when there's nothing to start from, so the caller records live instead.
+        """
+        cutoff = time.time() - self.pre_roll_secs
+        for segment in self.segments():
+            try:
+                if segment.stat().st_mtime >= cutoff:
+                    self._pinned = int(segment.stem)
+                    return self._pinned
+            except OSError:
+                continue
+        raise RuntimeError("The pre-roll recorder has no recent segments.")
+
+    def end_event(self) -> None:
+        self._pinned = None
+
+    def event_segments(self, first: int) -> list:
+        return [s for s in self.segments() if int(s.stem) >= first]
+
+    async def splice(self, first: int) -> bytes:
+        """The event's segments, ``first`` on, concatenated into one mp4."""
+        segments = self.event_segments(first)
+        if not segments:
+            raise RuntimeError("The event's pre-roll segments are gone.")
+        listing = self.directory / f"event-{first}.txt"
+        listing.write_text(self.concat_list(segments))
+        log.info(f"Splicing {len(segments)} segments into the event video.")
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self.splice_command(listing),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+            )
+            data, _ = await proc.communicate()
+        finally:
+            listing.unlink(missing_ok=True)
+        if proc.returncode:
+            raise RuntimeError(
+                f"ffmpeg couldn't splice the event video (exit {proc.returncode})."
+            )
+        return data
+
+    @staticmethod
+    def concat_list(segments: list) -> str:
+        """An ffmpeg concat-demuxer list of ``segments``."""
+        return "".join(f"file '{segment}'\n" for segment in segments)
+
+    @staticmethod
+    def splice_command(concat_list: Path) -> list:
+        # The segments' ADTS audio needs repackaging for mp4; video goes straight in.
+        # Fragmented, so it can go to stdout: nothing to seek back and patch at the end.
+        return [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", str(concat_list),
+            "-c", "copy", "-bsf:a", "aac_adtstoasc",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4",
+            "pipe:1",
+        ]
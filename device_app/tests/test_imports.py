@@ -1001,6 +1001,72 @@ def test_duration_alert_keeps_the_alarm_alive():
     assert route(other) == []
 
 
+def test_alert_parse_fast_paths_read_what_the_tree_did():
+    """Heartbeats and duration alerts skip the parser; the rest are walked once. Either
+    way the engines must see what the full parse and three walks of the tree gave them."""
+    import xml.etree.ElementTree as ET
+
+    from camera_app.clients import hikvision as hik
+    from camera_app.engines.hikvision_acusense import HikvisionAcuSenseCamera
+    from camera_app.events import TARGET_REGIONS_KEY, TRIGGERED_REGIONS_KEY
+
+    heartbeat = (
+        b'<?xml version="1.0" encoding="UTF-8"?>\r\n'
+        b'<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">'
+        b"<channelID>1</channelID><dateTime>2026-08-04T14:06:51+10:00</dateTime>"
+        b"<activePostCount>0</activePostCount><eventType>videoloss</eventType>"
+        b"<eventState>inactive</eventState><eventDescription>videoloss alarm"
+        b"</eventDescription></EventNotificationAlert>"
+    )
+    duration = heartbeat.replace(b"videoloss", b"duration").replace(
+        b"inactive", b"active"
+    ).replace(
+        b"</eventDescription>",
+        b"</eventDescription><DurationList><Duration><relationEvent>fielddetection"
+        b"</relationEvent></Duration></DurationList>",
+    )
+    two_targets = hik.ALERT_START + (
+        b"><eventType>fielddetection</eventType><DetectionRegionList>"
+        b"<DetectionRegionEntry><regionID>2</regionID><detectionTarget>human"
+        b"</detectionTarget><TargetRect><X>0.1</X><Y>0.1</Y><width>0.1</width>"
+        b"<height>0.1</height></TargetRect></DetectionRegionEntry>"
+        b"<DetectionRegionEntry><regionID>4</regionID><Nested><TargetRect><X>500</X>"
+        b"<Y>250</Y><width>100</width><height>200</height></TargetRect></Nested>"
+        b"<detectionTarget>vehicle,human</detectionTarget></DetectionRegionEntry>"
+        b"</DetectionRegionList>"
+    ) + hik.ALERT_END
+
+    client = hik.HikvisionClient.__new__(hik.HikvisionClient)
+    parsed = {xml: client._parse_alert(xml) for xml in (heartbeat, duration, two_targets)}
+
+    # The state reports are read straight off the bytes, keyed as the full parse keys
+    # them, nested fields by their dotted path.
+    assert hik._scan_state_report(heartbeat) == parsed[heartbeat]
+    assert parsed[heartbeat] == hik._xml_to_dict(ET.fromstring(heartbeat))
+    assert hik._scan_state_report(duration) == parsed[duration]
+    assert parsed[duration] == hik._xml_to_dict(ET.fromstring(duration))
+    assert parsed[duration]["DurationList.Duration.relationEvent"] == "fielddetection"
+    assert HikvisionAcuSenseCamera._duration_relation(parsed[duration]) == "fielddetection"
+    assert hik.alert_coalesce_key(parsed[duration]) == (
+        "duration", "active", "1", "fielddetection"
+    )
+    # Anything carrying boxes or region ids is parsed, even if its type says heartbeat.
+    assert hik._scan_state_report(two_targets) is None
+    assert hik._scan_state_report(_alert_xml("videoloss", "inactive")) is None
+    assert hik._scan_state_report(heartbeat.replace(b"alarm", b"&amp; alarm")) is None
+    # Nor does one cut short, which the parser would reject too.
+    assert hik._scan_state_report(duration[:-30]) is None
+
+    # One walk gives what the three did, a rect nested a level deeper included.
+    root = ET.fromstring(two_targets)
+    expected = hik._xml_to_dict(root)
+    expected[TARGET_REGIONS_KEY] = hik.HikvisionClient._target_regions(root)
+    expected[TRIGGERED_REGIONS_KEY] = hik.HikvisionClient._triggered_regions(root)
+    assert parsed[two_targets] == expected
+    assert [r.get("target") for r in expected[TARGET_REGIONS_KEY]] == ["human", "vehicle"]
+    assert expected[TRIGGERED_REGIONS_KEY] == [2, 4]
+
+
 def test_continuation_extends_only_a_live_event():
     """A continuation extends an intruder event; it never starts or revives one."""
     import asyncio
@@ -1205,6 +1271,38 @@ def test_power_cycle_sequence():
     assert mgr.power_is_on is True
 
 
+def test_streams_stop_with_the_power_and_the_pre_roll_resumes_with_it():
+    """Nothing keeps reconnecting to a camera with no power, and the pre-roll, which
+    is the one stream that isn't reopened on demand, comes back with the power."""
+    import asyncio
+    from datetime import timedelta
+
+    mgr, _ = _power_mgr(always_on=False, cycle_secs=0)
+    calls = []
+
+    async def stop_frame_grabbers():
+        calls.append("grabbers stopped")
+
+    async def pause_pre_roll():
+        calls.append("pre-roll paused")
+
+    mgr.app.engine.stop_frame_grabbers = stop_frame_grabbers
+    mgr.app.engine.pause_pre_roll = pause_pre_roll
+    mgr.app.engine.resume_pre_roll = lambda: calls.append("pre-roll resumed")
+
+    async def scenario():
+        await mgr.acquire_for(timedelta(seconds=60))
+        await mgr.release()
+        await mgr.acquire_for(timedelta(seconds=60))
+        await mgr._power_cycle()
+        mgr._stop_ping_check()
+
+    asyncio.run(scenario())
+    stopped = ["grabbers stopped", "pre-roll paused"]
+    resumed = ["pre-roll resumed"]
+    assert calls == resumed + stopped + resumed + stopped + resumed
+
+
 def test_watchdog_only_cycles_on_consecutive_failures():
     import asyncio
 
@@ -1307,15 +1405,13 @@ def test_event_frame_is_paired_with_its_alert():
     jpeg = b"\xff\xd8\xff\xe0" + b"x" * 500 + b"\xff\xd9"
     client = HikvisionClient.__new__(HikvisionClient)
 
-    def drain(chunks, pending=None):
+    def drain(chunks, pending=None, reader=None):
         got = []
-        buffer = b""
+        reader = reader or client._alert_reader()
         for chunk in chunks:
-            buffer += chunk
-            buffer, pending = asyncio.run(
-                client._drain(got.append, buffer, pending)
-            )
-        return got, buffer, pending
+            reader.feed(chunk)
+            pending = asyncio.run(client._drain(got.append, reader, pending))
+        return got, reader, pending
 
     # The frame follows the XML, and arrives with it as one event.
     got, _, pending = drain([b"--boundary\r\n" + _alert_xml() + _image_part(jpeg)])
@@ -1329,9 +1425,9 @@ def test_event_frame_is_paired_with_its_alert():
     head = b"--boundary\r\n" + _alert_xml()
     whole = head + _image_part(jpeg)
     cut = len(head) + 200  # inside the image body
-    got, buffer, pending = drain([whole[:cut]])
+    got, reader, pending = drain([whole[:cut]])
     assert got == [] and pending is not None
-    got2, _, pending = drain([buffer + whole[cut:]], pending)
+    got2, _, pending = drain([whole[cut:]], pending, reader)
     assert len(got2) == 1 and got2[0][EVENT_IMAGE_KEY] == jpeg
     assert pending is None
 
@@ -1350,6 +1446,53 @@ def test_event_frame_is_paired_with_its_alert():
     assert EVENT_IMAGE_KEY not in got[0] and EVENT_IMAGE_KEY not in got[1]
 
 
+def test_alert_stream_framed_byte_by_byte():
+    """Parts split at every possible point still come out whole, and paired."""
+    import asyncio
+
+    from camera_app.clients.hikvision import HikvisionClient
+    from camera_app.events import EVENT_IMAGE_KEY
+
+    jpeg = b"\xff\xd8" + bytes(range(256)) * 4 + b"\xff\xd9"
+    xml = _alert_xml()
+    # As the cameras send it: headers and a Content-Length on the XML too, CRLFs
+    # between parts, and a heartbeat with no picture after.
+    stream = (
+        b"--boundary\r\nContent-Type: application/xml; charset=\"UTF-8\"\r\n"
+        b"Content-Length: " + str(len(xml)).encode() + b"\r\n\r\n" + xml + b"\r\n"
+        + _image_part(jpeg) + b"\r\n"
+        + b"--boundary\r\nContent-Type: application/xml\r\n\r\n"
+        + _alert_xml("videoloss", "inactive", pictures=0) + b"\r\n"
+    )
+    client = HikvisionClient.__new__(HikvisionClient)
+    reader = client._alert_reader('multipart/mixed; boundary="boundary"')
+    got, pending = [], None
+    for i in range(len(stream)):
+        reader.feed(stream[i : i + 1])
+        pending = asyncio.run(client._drain(got.append, reader, pending))
+
+    assert pending is None
+    assert [a["eventType"] for a in got] == ["fielddetection", "videoloss"]
+    assert got[0][EVENT_IMAGE_KEY] == jpeg
+    assert len(reader) < len(b"--boundary")
+
+
+def test_multipart_reader_drops_what_it_cannot_frame():
+    from camera_app.clients.multipart import MultipartReader
+
+    reader = MultipartReader("myboundary")
+    reader.feed(b"x" * 100_000)
+    assert reader.next_part() is None
+    # Noise isn't held while waiting for a boundary...
+    assert len(reader) < len(b"--myboundary")
+    # ...and a part after it is framed as usual, by its length.
+    reader.feed(b"--myboundary\r\nContent-Type: text/plain\r\nContent-Length: 5\r\n\r\n")
+    assert reader.next_part() is None
+    reader.feed(b"Code=--myboundary")
+    part = reader.next_part()
+    assert part.content_type == "text/plain" and part.body == b"Code="
+
+
 def test_alert_has_picture_gate():
     from camera_app.clients.hikvision import HikvisionClient
 
@@ -1609,6 +1752,7 @@ def test_stream_survives_a_missing_event_picture():
 
     class FakeResponse:
         content = types.SimpleNamespace(iter_chunks=chunks)
+        headers = {}
 
         def raise_for_status(self):
             pass
@@ -1659,6 +1803,7 @@ def test_empty_reads_reconnect_instead_of_spinning():
 
     class FakeResponse:
         content = types.SimpleNamespace(iter_chunks=chunks)
+        headers = {}
 
         def raise_for_status(self):
             pass
@@ -2266,5 +2411,606 @@ def test_a_detector_with_no_matching_target_is_warned_about(caplog):
     assert caplog.text == ""
 
 
+# --- digest auth ---
+
+
+class _DigestCamera:
+    """A session double that answers like a camera's digest-protected web server.
+
+    Accepts a request only if it carries the current nonce (and, when `password` is set,
+    that password). `expire()` moves the nonce on, as a camera does every few minutes.
+    """
+
+    def __init__(self, password="p"):
+        self.password = password
+        self.nonce = "n1"
+        self.sent = []
+
+    def expire(self, stale=True):
+        self.nonce = self.nonce[:-1] + str(int(self.nonce[-1]) + 1)
+        self.stale = stale
+
+    async def request(self, method, url, headers=None, **kwargs):
+        import types
+
+        from camera_app.clients.dahua import parse_key_value_list
+
+        header = (headers or {}).get("AUTHORIZATION", "")
+        self.sent.append(header)
+        auth = parse_key_value_list(header[len("Digest "):]) if header else {}
+        ok = auth.get("nonce") == self.nonce and self.password == "p"
+        challenge = f'Digest realm="cam", nonce="{self.nonce}", qop="auth"'
+        if auth and auth.get("nonce") != self.nonce and getattr(self, "stale", False):
+            challenge += ", stale=true"
+        return types.SimpleNamespace(
+            status=200 if ok else 401,
+            headers={} if ok else {"www-authenticate": challenge},
+            close=lambda: None,
+        )
+
+
+def _nc(header):
+    from camera_app.clients.dahua import parse_key_value_list
+
+    return parse_key_value_list(header[len("Digest "):])["nc"]
+
+
+def test_digest_auth_is_one_round_trip_once_challenged():
+    """A client's auth keeps the challenge, so only its very first call pays for a 401.
+
+    Each call used to build a new DigestAuth, which threw the challenge away: every
+    request went out bare, collected a 401 and was sent again -- two round trips to the
+    camera's web server for every snapshot and every ISAPI read or write.
+    """
+    import asyncio
+
+    from camera_app.clients.dahua import DigestAuth
+
+    camera = _DigestCamera()
+    auth = DigestAuth("u", "p", camera)
+
+    async def go():
+        return [(await auth.request("GET", f"http://cam/{i}")).status for i in range(3)]
+
+    assert asyncio.run(go()) == [200, 200, 200]
+    # The first call is challenged; the rest go straight through, nc counting up.
+    assert len(camera.sent) == 4
+    assert camera.sent[0] == ""
+    assert [_nc(h) for h in camera.sent[1:]] == ["00000001", "00000002", "00000003"]
+
+
+def test_digest_auth_follows_a_stale_nonce_with_one_retry():
+    import asyncio
+
+    from camera_app.clients.dahua import DigestAuth
+
+    camera = _DigestCamera()
+    auth = DigestAuth("u", "p", camera)
+    asyncio.run(auth.request("GET", "http://cam/a"))
+    camera.sent.clear()
+
+    camera.expire()
+    assert asyncio.run(auth.request("GET", "http://cam/b")).status == 200
+    assert len(camera.sent) == 2
+    # The new nonce starts its own count.
+    assert _nc(camera.sent[1]) == "00000001"
+    assert 'nonce="n2"' in camera.sent[1]
+
+
+def test_digest_auth_gives_up_on_wrong_credentials():
+    """A rejected password is a 401 for the caller after one retry, never a loop."""
+    import asyncio
+
+    from camera_app.clients.dahua import DigestAuth
+
+    camera = _DigestCamera(password="wrong")
+    auth = DigestAuth("u", "p", camera)
+    assert asyncio.run(auth.request("GET", "http://cam/a")).status == 401
+    assert len(camera.sent) == 2
+
+    # Nor does holding a challenge make a later call try more than twice.
+    camera.sent.clear()
+    assert asyncio.run(auth.request("GET", "http://cam/b")).status == 401
+    assert len(camera.sent) == 2
+
+
+def test_clients_share_one_digest_auth_across_calls():
+    from camera_app.clients.dahua import DahuaClient
+    from camera_app.clients.hikvision import HikvisionClient
+
+    for cls in (HikvisionClient, DahuaClient):
+        client = cls.__new__(cls)
+        client._username, client._password, client._session = "u", "p", object()
+        assert client._auth is client._auth
+        assert client._auth.session is client._session
+
+
+def test_engine_closes_only_a_session_it_made():
+    """The app's pooled session outlives the engine; an engine's own one doesn't."""
+    import asyncio
+
+    from camera_app.clients.session import CONNECTIONS_PER_HOST, new_session
+    from camera_app.engines.base import CameraBase
+
+    async def go():
+        shared = new_session()
+        handed = CameraBase.__new__(CameraBase)
+        handed.session, handed._owns_session = shared, False
+        handed.alerts = None
+        assert handed.client_session() is shared
+        await handed.close()
+        assert not shared.closed
+        assert shared.connector.limit_per_host == CONNECTIONS_PER_HOST
+        await shared.close()
+
+        alone = CameraBase.__new__(CameraBase)
+        alone.session, alone._owns_session = None, False
+        alone.alerts = None
+        own = alone.client_session()
+        assert alone.client_session() is own
+        await alone.close()
+        return own.closed
+
+    assert asyncio.run(go())
+
+
+def test_frame_grabber_holds_a_stream_until_idle():
+    """Frames come from one long-lived process; it starts on demand, stops when idle,
+    and doesn't come back until a frame is wanted again."""
+    import asyncio
+    import sys
+
+    from camera_app import frame_grabber as fg
+
+    # JPEGs split across writes mid-frame, then mid-marker, as a pipe delivers them.
+    buffer = bytearray(b"junk\xff\xd8one\xff")
+    assert fg.take_jpegs(buffer) == []
+    buffer += b"\xd9\xff\xd8tw"
+    assert fg.take_jpegs(buffer) == [b"\xff\xd8one\xff\xd9"]
+    buffer += b"o\xff\xd9\xff"
+    assert fg.take_jpegs(buffer) == [b"\xff\xd8two\xff\xd9"]
+    assert buffer == b"\xff"
+
+    # A stand-in for ffmpeg: numbered frames, 20 a second, for as long as it's let run.
+    script = (
+        "import sys, time\n"
+        "for n in range(10000):\n"
+        "    sys.stdout.buffer.write(b'\\xff\\xd8%d\\xff\\xd9' % n)\n"
+        "    sys.stdout.flush()\n"
+        "    time.sleep(0.05)\n"
+    )
+
+    async def go():
+        starts = []
+        grabber = fg.FrameGrabber("rtsp://camera/live", idle_secs=0.3)
+
+        def command():
+            starts.append(1)
+            return [sys.executable, "-c", script]
+
+        grabber.command = command
+        assert not grabber.running and starts == []
+
+        first = await grabber.frame(timeout=10)
+        assert first.startswith(fg.JPEG_START) and grabber.running
+        # Later requests are served from the same process, not a new one each.
+        await asyncio.sleep(0.2)
+        assert await grabber.frame(timeout=10) != first
+        assert len(starts) == 1 and len(grabber.frames) == fg.RING_FRAMES
+
+        # Nobody asks for a while: the stream closes, and stays closed.
+        await asyncio.sleep(0.6)
+        assert not grabber.running and len(starts) == 1
+        # The next request reopens it; stopping closes it now rather than when idle.
+        await grabber.frame(timeout=10)
+        assert len(starts) == 2
+        await grabber.stop()
+        assert not grabber.running
+
+    asyncio.run(go())
+
+
+def test_a_capture_takes_its_still_and_thumbnail_in_one_ffmpeg_run():
+    """The still and its thumbnail come out of one run, and the capture uses that
+    thumbnail rather than going back to the camera for another, even with two
+    captures running at once."""
+    import asyncio
+    import types
+
+    from camera_app.engines.base import SIDE_OUTPUT, CameraBase
+
+    cam = CameraBase.__new__(CameraBase)
+    cam.config = types.SimpleNamespace(
+        rtsp_uri="rtsp://camera/live",
+        snapshot=types.SimpleNamespace(
+            mode_as_filetype="jpg",
+            keep_stream_open=types.SimpleNamespace(value=False),
+            scale=types.SimpleNamespace(value=types.SimpleNamespace(value="1280:-1")),
+        ),
+    )
+    runs, asked = [], []
+
+    async def run_ffmpeg(args, data=None):
+        runs.append(args)
+        uri = args[args.index("-i") + 1]
+        # The first stream started finishes last.
+        await asyncio.sleep(0.05 if uri.endswith("visible") else 0)
+        thumb = f"{uri}-thumb".encode() if SIDE_OUTPUT in args else None
+        return uri.encode(), thumb
+
+    async def get_thumbnail():
+        asked.append(1)
+
+    cam.run_ffmpeg = run_ffmpeg
+    cam.get_thumbnail = get_thumbnail
+
+    async def go():
+        visible, thermal = await asyncio.gather(
+            cam.get_still_snapshot("rtsp://visible"),
+            cam.get_still_snapshot("rtsp://thermal"),
+        )
+        return (
+            await cam.build_capture("visible", visible),
+            await cam.build_capture("thermal", thermal),
+        )
+
+    visible, thermal = asyncio.run(go())
+    assert len(runs) == 2
+    assert all("split=2" in run[run.index("-filter_complex") + 1] for run in runs)
+    assert visible.media.data == b"rtsp://visible"
+    assert visible.thumbnail.data == b"rtsp://visible-thumb"
+    assert thermal.thumbnail.data == b"rtsp://thermal-thumb"
+    assert visible.thumbnail.filename == "visible-thumbnail.jpg"
+    assert asked == []
+
+
+def test_a_capture_without_a_thumbnail_encodes_none():
+    """The thermal clip is captured with_thumbnail=False, so ffmpeg mustn't be asked
+    to write a paired thumbnail for it."""
+    import asyncio
+    import types
+
+    from camera_app.engines.base import SIDE_OUTPUT, CameraBase
+
+    cam = CameraBase.__new__(CameraBase)
+    cam.config = types.SimpleNamespace(
+        snapshot=types.SimpleNamespace(
+            keep_stream_open=types.SimpleNamespace(value=False),
+            scale=types.SimpleNamespace(value=types.SimpleNamespace(value="1280:-1")),
+            secs=types.SimpleNamespace(value=6),
+            fps=types.SimpleNamespace(value=10),
+            native_h264=types.SimpleNamespace(value=False),
+        ),
+    )
+    runs = []
+
+    async def run_ffmpeg(args, data=None):
+        runs.append(args)
+        return b"media", b"thumb" if SIDE_OUTPUT in args else None
+
+    cam.run_ffmpeg = run_ffmpeg
+
+    async def go():
+        return await asyncio.gather(
+            cam.get_video_snapshot("rtsp://visible"),
+            cam.get_video_snapshot("rtsp://thermal", with_thumbnail=False),
+            cam.get_still_snapshot("rtsp://thermal", with_thumbnail=False),
+        )
+
+    visible, thermal_clip, thermal_still = asyncio.run(go())
+    assert SIDE_OUTPUT in runs[0] and visible.paired_thumbnail.data == b"thumb"
+    assert all(SIDE_OUTPUT not in run for run in runs[1:])
+    assert not hasattr(thermal_clip, "paired_thumbnail")
+    assert not hasattr(thermal_still, "paired_thumbnail")
+
+
+def test_ffmpeg_output_is_read_from_pipes_not_files():
+    """stdin in, stdout and a side pipe out, all at once: neither output can fill its
+    pipe and stall the process while the other is read."""
+    import asyncio
+    import sys
+
+    from camera_app.engines.base import SIDE_OUTPUT, run_pipes
+
+    # A stand-in for ffmpeg with two outputs, each well past a pipe's buffer.
+    script = (
+        "import os, sys\n"
+        "data = sys.stdin.buffer.read()\n"
+        "side = os.fdopen(int(sys.argv[1].split(':')[1]), 'wb')\n"
+        "side.write(data[::-1] * 100000)\n"
+        "side.close()\n"
+        "sys.stdout.buffer.write(data * 100000)\n"
+    )
+    out, side = asyncio.run(
+        run_pipes([sys.executable, "-c", script, SIDE_OUTPUT], b"abc")
+    )
+    assert out == b"abc" * 100000 and side == b"cba" * 100000
+
+    out, side = asyncio.run(
+        run_pipes([sys.executable, "-c", "print('frame', end='')"])
+    )
+    assert out == b"frame" and side is None
+
+
+def test_pre_roll_keeps_the_seconds_before_an_event_and_what_follows():
+    """Between events only the pre-roll's worth of segments is kept; once an event
+    starts, nothing from its first pre-roll second on is deleted until it's spliced."""
+    import os
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from camera_app.pre_roll import PreRollRecorder
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = PreRollRecorder("rtsp://camera/live", 5, Path(tmp), max_bytes=4000)
+        now = time.time()
+
+        def segment(n, age):
+            path = Path(tmp) / f"{n:09d}.ts"
+            path.write_bytes(b"\x47" * 1000)
+            os.utime(path, (now - age, now - age))
+
+        def numbers():
+            return [int(p.stem) for p in recorder.segments()]
+
+        for n in range(10):
+            segment(n, 20 - 2 * n)  # last written 20s ago .. 2s ago
+        recorder._prune()
+        assert numbers() == [8, 9]
+
+        # The event starts: its pre-roll begins in segment 8, which is pinned with
+        # everything after it, however old or however large they get.
+        assert recorder.begin_event() == 8
+        for n in range(10, 14):
+            segment(n, 0)
+        os.utime(Path(tmp) / f"{8:09d}.ts", (now - 100, now - 100))
+        recorder._prune()
+        assert numbers() == list(range(8, 14))
+        assert recorder.event_segments(8) == recorder.segments()
+        listing = recorder.concat_list(recorder.event_segments(8))
+        assert listing.splitlines()[0] == f"file '{Path(tmp) / '000000008.ts'}'"
+        command = recorder.splice_command(Path(tmp) / "list.txt")
+        assert command[command.index("-c") + 1] == "copy" and command[-1] == "pipe:1"
+
+        # Once it's over, the size cap applies again, oldest first.
+        recorder.end_event()
+        recorder._prune()
+        assert numbers() == [10, 11, 12, 13]
+
+    # Nothing recorded yet: the caller has to record the event live instead.
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            PreRollRecorder("rtsp://camera/live", 5, Path(tmp)).begin_event()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("began an event with no segments")
+
+
+# --- Dahua event stream ---
+
+
+# An eventManager stream as the Dahua HTTP API documents it: text parts with a
+# Content-Length, heartbeats between events, and a smart-motion event whose JSON `data`
+# spans lines and contains the `;` and `=` that the key=value pairs are split on.
+_DAHUA_HUMAN_DATA = (
+    b'{\n   "Object" : {\n      "Action" : "Appear",\n      "BoundingBox" : '
+    b'[ 2992, 1136, 4960, 5192 ],\n      "ObjectType" : "Human",\n      "Text" : '
+    b'"a=b;c"\n   }\n}\n'
+)
+
+
+def _dahua_part(body: bytes) -> bytes:
+    return (
+        b"--myboundary\r\nContent-Type: text/plain\r\nContent-Length: "
+        + str(len(body)).encode()
+        + b"\r\n\r\n"
+        + body
+        + b"\r\n"
+    )
+
+
+_DAHUA_STREAM = b"".join(
+    [
+        _dahua_part(b"Heartbeat"),
+        _dahua_part(
+            b"Code=SmartMotionHuman;action=Start;index=0;data=" + _DAHUA_HUMAN_DATA
+        ),
+        _dahua_part(b"Code=VideoMotion;action=Start;index=0"),
+        _dahua_part(b"Heartbeat"),
+        _dahua_part(b"Code=SmartMotionHuman;action=Stop;index=0;data=" + _DAHUA_HUMAN_DATA),
+    ]
+)
+
+
+def _read_dahua_stream(chunks):
+    import asyncio
+    import types
+
+    from camera_app.clients.dahua import DahuaClient, parse_event
+
+    async def iter_chunks():
+        for chunk in chunks:
+            yield chunk, False
+
+    response = types.SimpleNamespace(
+        headers={"Content-Type": "multipart/x-mixed-replace; boundary=myboundary"},
+        content=types.SimpleNamespace(iter_chunks=iter_chunks),
+        raise_for_status=lambda: None,
+        close=lambda: None,
+    )
+    client = DahuaClient.__new__(DahuaClient)
+    client._digest_auth = types.SimpleNamespace(
+        request=lambda *a, **k: _immediate(response)
+    )
+    got = []
+
+    async def on_part(part):
+        got.append(parse_event(part.body))
+
+    asyncio.run(client._read_stream("http://cam/eventManager.cgi", on_part))
+    return [e for e in got if e is not None]
+
+
+def test_dahua_events_are_framed_whatever_the_chunking():
+    """Two events in one read, or one split across several, are each one event."""
+    import random
+
+    whole = _read_dahua_stream([_DAHUA_STREAM])
+    assert [(e["Code"], e["action"]) for e in whole] == [
+        ("SmartMotionHuman", "Start"),
+        ("VideoMotion", "Start"),
+        ("SmartMotionHuman", "Stop"),
+    ]
+    assert whole[0]["data"]["Object"]["ObjectType"] == "Human"
+    assert whole[0]["data"]["Object"]["Text"] == "a=b;c"
+    assert "data" not in whole[1]
+
+    rng = random.Random(0)
+    for _ in range(20):
+        cuts = sorted(rng.sample(range(1, len(_DAHUA_STREAM)), 12))
+        chunks = [_DAHUA_STREAM[a:b] for a, b in zip([0, *cuts], [*cuts, None])]
+        assert _read_dahua_stream(chunks) == whole
+
+
+def test_dahua_engine_acts_on_starts_only():
+    import asyncio
+
+    from camera_app.clients.dahua import parse_event
+    from camera_app.engines.dahua_base import DahuaCameraBase
+    from camera_app.events import MotionDetectEventType
+
+    got = []
+
+    async def on_motion(event):
+        got.append(event)
+
+    cam = DahuaCameraBase.__new__(DahuaCameraBase)
+    cam.on_motion_event_callback = on_motion
+    for event in _read_dahua_stream([_DAHUA_STREAM]):
+        asyncio.run(cam.on_cam_event(event, 1))
+
+    assert [e.type for e in got] == [
+        MotionDetectEventType.person,
+        MotionDetectEventType.unknown,
+    ]
+    assert parse_event(b"Heartbeat") is None
+
+
+def test_dahua_stream_reconnects_in_a_loop_with_backoff():
+    """Every drop waits longer, up to the cap, and a connection that worked resets it."""
+    import asyncio
+
+    import pytest
+
+    from camera_app.clients import dahua as dahua_mod
+    from camera_app.clients.dahua import (
+        RECONNECT_MAX_SECS,
+        RECONNECT_MIN_SECS,
+        DahuaClient,
+    )
+
+    outcomes = iter([False] * 8 + [True] + [False] * 2)
+    waits = []
+
+    async def read_stream(url, on_part):
+        if not next(outcomes):
+            raise ConnectionError("refused")
+        return True
+
+    async def sleep(secs):
+        waits.append(secs)
+        if len(waits) == 11:
+            raise asyncio.CancelledError
+
+    client = DahuaClient.__new__(DahuaClient)
+    client._read_stream = read_stream
+    original_uniform, original_sleep = dahua_mod.random.uniform, dahua_mod.asyncio.sleep
+    dahua_mod.random.uniform = lambda low, high: high
+    dahua_mod.asyncio.sleep = sleep
+    try:
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(client._stream_forever("http://cam/eventManager.cgi", None))
+    finally:
+        dahua_mod.random.uniform = original_uniform
+        dahua_mod.asyncio.sleep = original_sleep
+
+    assert waits[:8] == [
+        min(RECONNECT_MIN_SECS * 2**i, RECONNECT_MAX_SECS) for i in range(8)
+    ]
+    assert waits[8:] == [RECONNECT_MIN_SECS, RECONNECT_MIN_SECS * 2, RECONNECT_MIN_SECS * 4]
+
+
+# --- alert queue ---
+
+
+def _queue_run(puts, maxsize=64):
+    """Put every alert while the handler is stuck on the first, then let it drain."""
+    import asyncio
+
+    from camera_app.alert_queue import AlertQueue
+    from camera_app.clients.hikvision import alert_coalesce_key
+
+    got = []
+
+    async def go():
+        release = asyncio.Event()
+
+        async def handler(alert):
+            got.append(alert)
+            await release.wait()
+
+        queue = AlertQueue(handler, alert_coalesce_key, maxsize=maxsize)
+        queue.start()
+        for alert in puts:
+            queue.put(alert)
+            await asyncio.sleep(0)
+        release.set()
+        while queue.depth:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        queue.stop()
+        return queue
+
+    return got, asyncio.run(go())
+
+
+def _alert(event_type, state="active", n=0):
+    return {"eventType": event_type, "eventState": state, "channelID": "1", "n": n}
+
+
+def test_alert_queue_keeps_starts_and_coalesces_continuations():
+    """A slow handler mustn't stall the reader, lose a detection, or replay every
+    "still there" it missed."""
+    alerts = [
+        _alert("fielddetection", n=1),
+        _alert("duration", n=2),
+        _alert("videoloss", "inactive", n=3),
+        _alert("duration", n=4),
+        _alert("duration", n=5),
+        _alert("linedetection", n=6),
+        _alert("duration", n=7),
+    ]
+    got, queue = _queue_run(alerts)
+    # The first was being handled; of the rest, each start arrives and only the latest
+    # report of each kind per stretch between starts does -- never ahead of a start.
+    assert [a["n"] for a in got] == [1, 5, 3, 6, 7]
+    assert queue.coalesced == 2 and queue.dropped == 0
+    assert queue.peak_depth == 4
+
+
+def test_alert_queue_over_its_bound_drops_reports_never_starts():
+    alerts = (
+        [_alert("fielddetection", n=0)]
+        + [_alert("duration", n=1), _alert("videoloss", "inactive", n=2)]
+        + [_alert("fielddetection", n=i) for i in range(3, 8)]
+    )
+    got, queue = _queue_run(alerts, maxsize=3)
+    # The reports went to make room; every start came through, over the bound or not.
+    assert [a["n"] for a in got] == [0, 3, 4, 5, 6, 7]
+    assert queue.dropped == 2
+
+
 async def _immediate(value):
     return value
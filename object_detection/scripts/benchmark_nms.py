@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Time Python-side NMS against NMS embedded in the graph, on this machine's CPU.
+
+For each YOLO model it builds the end-to-end variant in a temporary directory (with
+``fetch_models.embed_nms``, so models/ is left alone), then runs both over the same
+frames and reports per-frame latency split into the session run and the Python
+post-processing around it:
+
+    uv run --group dev scripts/benchmark_nms.py frames/ --repeat 20
+
+Run it on the device -- or on another Cortex-A72, the CM4's core -- for the numbers
+that matter. The session is pinned to one intra-op thread exactly as in production
+(see ``common/yolo.py``), so the result is per-core and doesn't depend on how many
+cores the machine has; x86 numbers only show the direction of the change.
+
+It also checks both variants find the same boxes, since a faster graph that answers
+differently isn't a like-for-like swap.
+"""
+
+import argparse
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.yolo import MODEL_DIR, YoloOnnx, letterbox  # noqa: E402
+from fetch_models import PLATE_OUTPUT, PPE_OUTPUT, embed_nms  # noqa: E402
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _cpu_name() -> str:
+    try:
+        for line in Path("/proc/cpuinfo").read_text().splitlines():
+            if line.lower().startswith(("model name", "hardware")):
+                return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def _time(model: YoloOnnx, image, confidence, size, repeat) -> tuple[list, list, list]:
+    """Per-run session and post-processing times (ms), and the last detections."""
+    padded, scale, pad = letterbox(image, model.fixed_size or size)
+    blob = padded[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+
+    run_ms, post_ms, detections = [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = model._frame_output(model._run(blob, confidence, 0.45), 0)
+        ran = time.perf_counter()
+        detections = model._postprocess(
+            output, image, scale, pad, confidence, 0.45, None
+        )
+        done = time.perf_counter()
+        run_ms.append((ran - started) * 1000)
+        post_ms.append((done - ran) * 1000)
+    return run_ms, post_ms, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("frames", type=Path, help="Directory of test frames.")
+    parser.add_argument("--models", type=Path, default=MODEL_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.25,
+        help="Lower means more candidates into NMS, which is where the two differ.",
+    )
+    parser.add_argument("--size", type=int, default=640)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    # The end-to-end graph's overridable thresholds draw a constant-folding warning
+    # per session; expected, and noise in a results table.
+    ort.set_default_logger_severity(3)
+
+    frames = [
+        cv2.imread(str(p))
+        for p in sorted(args.frames.iterdir())
+        if p.suffix.lower() in IMAGE_SUFFIXES
+    ]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        sys.exit(f"No images in {args.frames}.")
+
+    print(f"CPU: {_cpu_name()} ({platform.machine()}), 1 intra-op thread")
+    print(f"{len(frames)} frame(s) x {args.repeat} run(s), confidence {args.confidence}")
+    print()
+    print(
+        f"{'model':<12} {'variant':<10} {'run ms':>8} {'post ms':>8} {'total ms':>9}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in (PPE_OUTPUT, PLATE_OUTPUT):
+            source = args.models / name
+            if not source.exists():
+                print(f"{name:<12} missing from {args.models}, skipped")
+                continue
+            e2e_path = Path(tmp) / name
+            embed_nms(source, e2e_path)
+
+            totals = {}
+            found = {}
+            for variant, path in (("python", source), ("in-graph", e2e_path)):
+                model = YoloOnnx(path)
+                _time(model, frames[0], args.confidence, args.size, 2)  # warm up
+                run_ms, post_ms = [], []
+                found[variant] = []
+                for frame in frames:
+                    r, p, detections = _time(
+                        model, frame, args.confidence, args.size, args.repeat
+                    )
+                    run_ms += r
+                    post_ms += p
+                    found[variant].append(sorted((d.label, d.box) for d in detections))
+                run, post = statistics.median(run_ms), statistics.median(post_ms)
+                totals[variant] = run + post
+                print(
+                    f"{name:<12} {variant:<10} {run:>8.1f} {post:>8.1f} "
+                    f"{run + post:>9.1f}"
+                )
+
+            delta = totals["in-graph"] - totals["python"]
+            same = found["python"] == found["in-graph"]
+            print(
+                f"{'':<12} {'delta':<10} {'':>8} {'':>8} {delta:>+9.1f}  "
+                f"({'same boxes' if same else 'BOXES DIFFER'})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -35,17 +35,29 @@ Weights and licences
   HOME=/tmp, so weights baked into /root/.cache are invisible there and OCR silently
   degrades to detect-but-never-read. Loading by explicit path fixes that.
 
+End-to-end graphs
+-----------------
+``--nms`` rewrites each YOLO model so decode and NMS run inside the graph (see
+``embed_nms``), and ``YoloOnnx`` then skips its own post-processing. It's a rewrite of
+the exported graph rather than an ultralytics re-export, so it works on the plate model
+-- which ships as ONNX and has no .pt to re-export -- and needs only ``onnx``. Compare
+the two on the target CPU with ``scripts/benchmark_nms.py`` before committing either.
+
 NOTE the plate detector is AGPL-3.0 while this repo is Apache-2.0. That is a
 deliberate, reviewable choice mirroring cattle-cam (which ships AGPL YOLO weights) --
 but if this app is ever distributed as a binary to a third party rather than run as
 a service, swap it for a permissively-licensed plate detector.
 """
 
+import argparse
+import ast
 import shutil
 import sys
 import urllib.request
 from pathlib import Path
 
+import numpy as np
+
 MODELS_DIR = Path(__file__).parents[1] / "models"
 
 PPE_REPO = "Hansung-Cho/yolov8-ppe-detection"
@@ -62,6 +74,13 @@ PLATE_OUTPUT = "plate.onnx"
 # fixed input size into the graph, so a mismatch at runtime fails the session.
 IMAGE_SIZE = 640
 
+# Defaults baked into an end-to-end graph. The thresholds are graph inputs, so
+# YoloOnnx overrides them per call from config; these only apply to a caller that
+# doesn't. The detection cap matches ultralytics' own `max_det`.
+NMS_MAX_DETECTIONS = 300
+NMS_IOU_THRESHOLD = 0.45
+NMS_SCORE_THRESHOLD = 0.25
+
 
 def download(url: str, dest: Path):
     print(f"  downloading {url}")
@@ -158,11 +177,146 @@ def fetch_ocr_model():
     print(f"  wrote {dest} ({dest.stat().st_size / 1e6:.1f}MB) and {config_dest.name}")
 
 
+def embed_nms(source: Path, dest: Path, max_detections: int = NMS_MAX_DETECTIONS):
+    """Rewrite a raw YOLO export so its output is already-suppressed detections.
+
+    Appends to the graph what ``YoloOnnx._decode`` and ``cv2.dnn.NMSBoxes`` do in
+    Python: centre-form boxes to corners, best class per anchor, then one
+    class-agnostic ``NonMaxSuppression`` -- class-agnostic because NMSBoxes is, and a
+    model that emits ``hardhat`` and ``no-hardhat`` over the same head relies on that.
+    The output becomes an ``(N, 7)`` table of ``batch_index, x1, y1, x2, y2, score,
+    class_id`` in letterboxed pixels, which is what ``YoloOnnx`` recognises.
+
+    ``score_threshold``, ``iou_threshold`` and ``max_detections`` become optional
+    graph inputs, defaulting to the constants above.
+    """
+    try:
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+    except ImportError:
+        # ultralytics installs it for its own ONNX export, so a dev environment that
+        # has exported the PPE model already has it.
+        sys.exit("onnx is needed to embed NMS: uv pip install onnx")
+
+    model = onnx.load(source)
+    graph = model.graph
+    (raw,) = graph.output
+    dims = [d.dim_value or d.dim_param for d in raw.type.tensor_type.shape.dim]
+    if len(dims) == 2:
+        print(f"  {source.name} already has NMS in its graph, skipping.")
+        if source != dest:
+            shutil.copy2(source, dest)
+        return
+
+    names = {p.key: p.value for p in model.metadata_props}.get("names")
+    num_classes = len(ast.literal_eval(names)) if names else None
+    opset = next(o.version for o in model.opset_import if o.domain in ("", "ai.onnx"))
+    if opset < 11:
+        sys.exit(f"{source.name} is opset {opset}; GatherND needs 11 or later.")
+
+    nodes, inits = [], []
+
+    def const(name, value, dtype=np.int64):
+        inits.append(numpy_helper.from_array(np.array(value, dtype=dtype), name))
+        return name
+
+    def node(op, inputs, **attrs):
+        output = f"nms/{op.lower()}_{len(nodes)}"
+        nodes.append(helper.make_node(op, inputs, [output], **attrs))
+        return output
+
+    def sliced(tensor, start, end, axis):
+        return node(
+            "Slice",
+            [
+                tensor,
+                const(f"nms/start_{len(nodes)}", [start]),
+                const(f"nms/end_{len(nodes)}", [end]),
+                const(f"nms/axis_{len(nodes)}", [axis]),
+            ],
+        )
+
+    pred = raw.name
+    # The same orientation rule as _decode: (batch, 4 + classes, anchors) is what
+    # ultralytics emits; the transpose is turned back into it.
+    if num_classes is not None and dims[-1] == 4 + num_classes:
+        pred = node("Transpose", [pred], perm=[0, 2, 1])
+
+    centres = node("Transpose", [sliced(pred, 0, 4, 1)], perm=[0, 2, 1])
+    xy = sliced(centres, 0, 2, 2)
+    half = node("Mul", [sliced(centres, 2, 4, 2), const("nms/half", 0.5, np.float32)])
+    boxes = node("Concat", [node("Sub", [xy, half]), node("Add", [xy, half])], axis=2)
+
+    classes = sliced(pred, 4, 2**31 - 1, 1)
+    if opset >= 18:
+        scores = node("ReduceMax", [classes, const("nms/class_axis", [1])], keepdims=1)
+    else:
+        scores = node("ReduceMax", [classes], axes=[1], keepdims=1)
+    class_ids = node(
+        "Cast", [node("ArgMax", [classes], axis=1, keepdims=1)], to=TensorProto.FLOAT
+    )
+
+    # Optional inputs: an initializer of the same name supplies the default.
+    optional = [
+        ("max_detections", [max_detections], np.int64, TensorProto.INT64),
+        ("iou_threshold", [NMS_IOU_THRESHOLD], np.float32, TensorProto.FLOAT),
+        ("score_threshold", [NMS_SCORE_THRESHOLD], np.float32, TensorProto.FLOAT),
+    ]
+    for name, value, dtype, proto in optional:
+        const(name, value, dtype)
+        graph.input.append(helper.make_tensor_value_info(name, proto, [1]))
+
+    # (N, 3) of [batch, class, anchor]; class is always 0 -- there's one score row.
+    selected = node(
+        "NonMaxSuppression",
+        [boxes, scores, "max_detections", "iou_threshold", "score_threshold"],
+    )
+    batch_anchor = node("Gather", [selected, const("nms/ba", [0, 2])], axis=1)
+    column = const("nms/column", [-1, 1])
+    table = node(
+        "Concat",
+        [
+            node(
+                "Cast",
+                [node("Gather", [selected, const("nms/b", [0])], axis=1)],
+                to=TensorProto.FLOAT,
+            ),
+            node("GatherND", [boxes, batch_anchor]),
+            node("Reshape", [node("GatherND", [scores, selected]), column]),
+            node("Reshape", [node("GatherND", [class_ids, selected]), column]),
+        ],
+        axis=1,
+    )
+    nodes.append(helper.make_node("Identity", [table], ["detections"]))
+
+    graph.node.extend(nodes)
+    graph.initializer.extend(inits)
+    del graph.output[:]
+    graph.output.append(
+        helper.make_tensor_value_info("detections", TensorProto.FLOAT, ["kept", 7])
+    )
+    onnx.checker.check_model(model)
+    onnx.save(model, dest)
+    print(f"  wrote {dest} with NMS in the graph")
+
+
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--nms",
+        action="store_true",
+        help="Embed decode + NMS in the YOLO graphs (see 'End-to-end graphs').",
+    )
+    args = parser.parse_args()
+
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     fetch_ppe_model()
     fetch_plate_model()
     fetch_ocr_model()
+    if args.nms:
+        for name in (PPE_OUTPUT, PLATE_OUTPUT):
+            print(f"Embedding NMS in {name}")
+            embed_nms(MODELS_DIR / name, MODELS_DIR / name)
     print("\nDone. Commit the .onnx files in models/ so the image build is offline.")
 
 
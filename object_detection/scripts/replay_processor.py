@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Replay snapshots through the cloud processor locally, and time it.
+
+Drives ``ObjectDetectionProcessor.on_message_create`` exactly as the Lambda handler
+does -- a fresh processor per invocation, module-level detector pool and result cache
+surviving between them like a warm container -- but with ``self.api`` swapped for a
+stand-in that serves attachments from a directory and records what the processor
+sends back. No doover credentials, no network, no Lambda.
+
+    uv run scripts/replay_processor.py path/to/frames --reason person --repeat 3
+
+Each image in the directory becomes one snapshot message. The first invocation pays
+the cold start (building the onnxruntime sessions); every later one is warm. Reported:
+
+* per-invocation wall time, split into cold and warm;
+* how many ``update_message`` calls and notifications each produced;
+* peak RSS of the whole run, which is what a Lambda memory setting has to cover.
+
+``--batch N`` hands N snapshots at a time to ``on_message_batch`` instead, so their
+frames share batched model calls; each row is then one batch.
+
+``--out`` writes what would have been published -- each message's payload as JSON and
+the annotated images -- so a change in the findings shows up as a diff, not just a
+change in the timings.
+
+``--rate R`` paces the invocations at R per second, sleeping between them, so the
+warm numbers reflect a container that idles between deliveries the way a real one does
+rather than one run back to back.
+
+``--max-warm-ms`` makes the run a check: it exits non-zero if the median warm
+invocation took longer than that, so a CI job can fail on a latency regression.
+
+The result cache is pointed at a fresh temporary directory unless ``--keep-cache`` is
+given, so a rerun measures inference rather than cache hits.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from object_detection_processor import ObjectDetectionProcessor  # noqa: E402
+from object_detection_processor import result_cache  # noqa: E402
+from pydoover.models import (  # noqa: E402
+    Attachment,
+    ChannelID,
+    Message,
+    MessageCreateEvent,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+CHANNEL = "doover_camera_replay"
+APP_KEY = "object_detection_replay"
+
+# The processor schema marks these required, and a real deployment config always
+# carries them. Anything given with --config is layered on top.
+BASE_CONFIG = {
+    "analyse_snapshots_because_of": [],
+    "dv_proc_subscriptions": [],
+}
+
+
+class ReplayApi:
+    """Just enough of ``ProcessorDataClient`` for the processor to run against.
+
+    Attachment URLs are local paths. ``update_message`` and ``create_message`` (which
+    is how ``send_notification`` reaches the API) are recorded, not sent.
+    """
+
+    def __init__(self):
+        self.updates = []
+        self.created = []
+
+    async def fetch_message_attachment(self, attachment):
+        return await asyncio.to_thread(Path(attachment.url).read_bytes)
+
+    async def update_message(self, **kwargs):
+        self.updates.append(kwargs)
+        return SimpleNamespace(id=kwargs.get("message_id"))
+
+    async def create_message(self, channel_name, data, agent_id=None, **kwargs):
+        self.created.append((channel_name, data))
+        return SimpleNamespace(id=len(self.created))
+
+
+def _message(path: Path, message_id: int, reason: str | None) -> Message:
+    payload = {
+        "reason": reason,
+        "camera_name": "Replay",
+        "media": [{"name": path.stem, "file": path.name}],
+    }
+    return Message(
+        id=message_id,
+        author_id=0,
+        channel=ChannelID(agent_id=0, name=CHANNEL),
+        data=payload,
+        attachments=[
+            Attachment(
+                filename=path.name,
+                content_type="image/jpeg",
+                size=path.stat().st_size,
+                url=str(path),
+            )
+        ],
+    )
+
+
+async def _invoke(config: dict, messages: list[Message]) -> tuple[float, ReplayApi]:
+    """One invocation, the way the handler builds it: a fresh processor each time."""
+    app = ObjectDetectionProcessor()
+    app.config._inject_deployment_config(config)
+    app.api = ReplayApi()
+    app.app_key = APP_KEY
+
+    events = [MessageCreateEvent(channel=m.channel, message=m) for m in messages]
+    started = time.perf_counter()
+    if len(events) == 1:
+        await app.on_message_create(events[0])
+    else:
+        await app.on_message_batch(events)
+    return time.perf_counter() - started, app.api
+
+
+def _save(out: Path, index: int, api: ReplayApi):
+    for update in api.updates:
+        stem = f"{index:04d}-{update['message_id']}"
+        (out / f"{stem}.json").write_text(json.dumps(update["data"], indent=2))
+        for file in update.get("files") or []:
+            (out / f"{stem}-{file.filename}").write_bytes(file.data)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("frames", type=Path, help="Directory of snapshot images.")
+    parser.add_argument(
+        "--config",
+        type=Path,
+        help="Deployment config JSON (x-name keys, as in doover_config.json).",
+    )
+    parser.add_argument(
+        "--reason", default="schedule", help="Snapshot reason to replay them as."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Replay the whole directory N times."
+    )
+    parser.add_argument(
+        "--batch", type=int, default=1, help="Snapshots per invocation."
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Invocations per second; sleep between them to hold this pace.",
+    )
+    parser.add_argument(
+        "--max-warm-ms",
+        type=float,
+        help="Exit non-zero if the median warm invocation is slower than this.",
+    )
+    parser.add_argument("--out", type=Path, help="Write published payloads here.")
+    parser.add_argument(
+        "--keep-cache",
+        action="store_true",
+        help="Use the real result cache instead of an empty temporary one.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+
+    frames = sorted(
+        p for p in args.frames.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+    )
+    if not frames:
+        sys.exit(f"No images in {args.frames}.")
+    if args.rate is not None and args.rate <= 0:
+        sys.exit("--rate must be above zero.")
+
+    config = dict(BASE_CONFIG)
+    if args.config:
+        config.update(json.loads(args.config.read_text()))
+
+    if not args.keep_cache:
+        result_cache.set_store(result_cache.DirectoryStore(Path(tempfile.mkdtemp())))
+    if args.out:
+        args.out.mkdir(parents=True, exist_ok=True)
+
+    timings = []
+    print(f"{'#':>4}  {'frame':<32} {'ms':>8}  updates  notifications")
+    total = len(frames) * args.repeat
+    batch = max(1, args.batch)
+    interval = 1 / args.rate if args.rate else 0
+    next_start = time.monotonic()
+    for index, first in enumerate(range(0, total, batch)):
+        # Paced from when each invocation was due, not from when the last one ended,
+        # so a slow invocation shortens the idle after it instead of the rate drifting.
+        time.sleep(max(0.0, next_start - time.monotonic()))
+        next_start += interval
+        paths = [frames[i % len(frames)] for i in range(first, min(first + batch, total))]
+        messages = [
+            _message(path, first + offset + 1, args.reason)
+            for offset, path in enumerate(paths)
+        ]
+        elapsed, api = asyncio.run(_invoke(config, messages))
+        label = paths[0].name
+        if len(paths) > 1:
+            label = f"{label[:26]} +{len(paths) - 1}"
+        timings.append(elapsed)
+        notifications = sum(1 for channel, _ in api.created if channel == "notifications")
+        print(
+            f"{index + 1:>4}  {label[:32]:<32} {elapsed * 1000:>8.0f}  "
+            f"{len(api.updates):>7}  {notifications:>13}"
+        )
+        if args.out:
+            _save(args.out, index + 1, api)
+
+    cold, warm = timings[0], timings[1:]
+    print()
+    print(f"cold (first invocation): {cold * 1000:.0f} ms")
+    if warm:
+        print(
+            f"warm: median {statistics.median(warm) * 1000:.0f} ms, "
+            f"min {min(warm) * 1000:.0f} ms, max {max(warm) * 1000:.0f} ms "
+            f"over {len(warm)} invocation(s)"
+        )
+    print(f"peak RSS: {_peak_rss_mb():.0f} MB")
+
+    if args.max_warm_ms is not None:
+        if not warm:
+            sys.exit("--max-warm-ms needs more than one invocation to have warm ones.")
+        median_ms = statistics.median(warm) * 1000
+        if median_ms > args.max_warm_ms:
+            sys.exit(
+                f"warm median {median_ms:.0f} ms is over the "
+                f"{args.max_warm_ms:.0f} ms limit."
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Analysing a video clip as a handful of its frames.
+
+The camera app's intruder events upload a clip (``event.mp4``) rather than a still, and
+a clip is where the person or vehicle actually is -- the still was taken when the event
+fired, often before they were in frame. Running the models over every frame is out of
+the question on a CM4 (a PPE run is over a second; a minute of 25 fps video is 1500
+frames), and it would be wasted: a person doesn't change between consecutive frames.
+
+So a clip is **sampled** -- a few frames a second, decoded one at a time as the file is
+read, never the whole clip in memory -- and the findings from the sampled frames are
+folded into one answer for the clip:
+
+* **People** are followed across the samples with the same tracker the live views use,
+  and each *person* is reported once, by their best (most confident) sighting.
+* **Plates** are reported once per distinct text, again by their best read.
+* One **key frame** -- the sample with the most worth showing -- is kept for the
+  annotated still the timeline gets.
+
+What's held while a clip is analysed is one batch of sampled frames, the key frame and
+a few numbers per person and plate, so a multi-minute clip costs no more memory than a
+short one.
+
+Deliberately free of doover coupling, like the rest of ``common``.
+"""
+
+import itertools
+import logging
+
+import cv2
+
+from .tracking import PersonTracker
+
+log = logging.getLogger(__name__)
+
+# Video containers the camera apps upload.
+CLIP_SUFFIXES = (".mp4", ".mkv", ".mov", ".avi")
+
+# A person unseen for this much *clip* time is taken to have left; coming back later in
+# the clip makes them a new person. Clip time, not wall time, since a clip is analysed
+# far slower (or faster) than it was recorded.
+TRACK_GAP_SEC = 5.0
+
+# Caps on what a clip can accumulate, for the pathological clip -- a crowd, or a
+# flickering detection that never matches its own track. Beyond them new people and
+# plates are counted but not kept.
+MAX_PEOPLE = 64
+MAX_PLATES = 32
+
+
+def sample_frames(path, fps: float, max_frames: int):
+    """Yield ``(seconds, frame)`` for ``fps`` frames per second of clip at most.
+
+    Streams from the file: each frame is decoded as it's reached and dropped unless it's
+    a sample, so memory doesn't grow with the clip. ``grab`` still decodes the skipped
+    frames -- inter-frame video can't be entered part way through a GOP -- but skips
+    converting them to BGR, which is most of the per-frame cost at this resolution.
+    Stops after ``max_frames`` samples.
+    """
+    capture = cv2.VideoCapture(str(path), cv2.CAP_FFMPEG)
+    try:
+        if not capture.isOpened():
+            return
+        source_fps = capture.get(cv2.CAP_PROP_FPS)
+        if not source_fps or source_fps != source_fps:
+            # Some muxers leave the rate out; a camera clip is near enough always 25.
+            source_fps = 25.0
+        step = max(1, round(source_fps / fps))
+
+        sampled = 0
+        for index in itertools.count():
+            if sampled >= max_frames or not capture.grab():
+                return
+            if index % step:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                return
+            sampled += 1
+            yield index / source_fps, frame
+    finally:
+        capture.release()
+
+
+def take(frames, count: int) -> list:
+    """The next ``count`` items of a ``sample_frames`` iterator (fewer at the end)."""
+    return list(itertools.islice(frames, count))
+
+
+class ClipFindings:
+    """The findings of one clip, folded together as its sampled frames are analysed.
+
+    ``add`` takes each sample's results along with the findings worth reporting from it
+    -- already narrowed by zones, as ``(item, zone)`` pairs -- and keeps only the best
+    sighting of each person and plate, plus the best frame to show.
+    """
+
+    def __init__(self, track_gap: float = TRACK_GAP_SEC):
+        self._tracker = PersonTracker(track_gap)
+        # track id -> (confidence, seconds, person, zone): best sighting while violating.
+        self._violators: dict[int, tuple] = {}
+        # plate text -> (confidence, seconds, plate, zone): best read of that text.
+        self._plates: dict[str, tuple] = {}
+        self._people: set[int] = set()
+        self._key_score = None
+        self.key_frame = None
+        self.key_seconds = None
+        self.key_ppe = None
+        self.key_anpr = None
+        self.frames = 0
+        self.duration = 0.0
+
+    def add(self, seconds, image, ppe_result, anpr_result, violator_pairs, plate_pairs):
+        self.frames += 1
+        self.duration = max(self.duration, seconds)
+
+        if ppe_result is not None and ppe_result.people:
+            zone_of = {id(v): z for v, z in violator_pairs}
+            people = ppe_result.people
+            ids, _report = self._tracker.update(
+                [p.detection.box for p in people],
+                [id(p) in zone_of for p in people],
+                image.shape,
+                now=seconds,
+            )
+            for person, track in zip(people, ids.tolist()):
+                if len(self._people) < MAX_PEOPLE:
+                    self._people.add(track)
+                if id(person) not in zone_of or track not in self._people:
+                    continue
+                best = self._violators.get(track)
+                if best is None or person.detection.confidence > best[0]:
+                    self._violators[track] = (
+                        person.detection.confidence,
+                        seconds,
+                        person,
+                        zone_of[id(person)],
+                    )
+
+        for plate, zone in plate_pairs:
+            best = self._plates.get(plate.text)
+            if best is None and len(self._plates) >= MAX_PLATES:
+                continue
+            if best is None or plate.detection.confidence > best[0]:
+                self._plates[plate.text] = (
+                    plate.detection.confidence,
+                    seconds,
+                    plate,
+                    zone,
+                )
+
+        # The frame to show: the most violators and plates, then the most people, then
+        # the most confident. Kept by reference -- the caller's sample is not reused.
+        people = ppe_result.people if ppe_result else []
+        score = (
+            len(violator_pairs) + len(plate_pairs),
+            len(people),
+            sum(p.detection.confidence for p in people)
+            + sum(p.detection.confidence for p, _z in plate_pairs),
+        )
+        if self._key_score is None or score > self._key_score:
+            self._key_score = score
+            self.key_frame = image
+            self.key_seconds = seconds
+            self.key_ppe = ppe_result
+            self.key_anpr = anpr_result
+
+    @property
+    def people(self) -> int:
+        """How many distinct people were seen in the clip."""
+        return len(self._people)
+
+    @property
+    def violators(self) -> list:
+        """The best sighting of each person who violated, in order of appearance."""
+        return [v[2] for v in sorted(self._violators.values(), key=lambda v: v[1])]
+
+    @property
+    def plates(self) -> list:
+        """The best read of each distinct plate, in order of appearance."""
+        return [p[2] for p in sorted(self._plates.values(), key=lambda p: p[1])]
+
+    @property
+    def zones(self) -> list:
+        """The zone each reported violator and plate fell in, None where none did."""
+        return [v[3] for v in self._violators.values()] + [
+            p[3] for p in self._plates.values()
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "frames_sampled": self.frames,
+            "duration": round(self.duration, 1),
+            "key_frame_at": None
+            if self.key_seconds is None
+            else round(self.key_seconds, 1),
+            "people": self.people,
+            "violations": [
+                {
+                    "at": round(seconds, 1),
+                    "box": list(person.detection.box),
+                    "missing": person.missing,
+                }
+                for _c, seconds, person, _z in sorted(
+                    self._violators.values(), key=lambda v: v[1]
+                )
+            ],
+            "plates": [
+                {
+                    "at": round(seconds, 1),
+                    "plate": plate.text,
+                    "confidence": round(confidence, 3),
+                }
+                for confidence, seconds, plate, _z in sorted(
+                    self._plates.values(), key=lambda p: p[1]
+                )
+            ],
+        }
@@ -86,11 +86,17 @@ class ANPRResult:
         return {"plates": [p.to_dict() for p in self.plates]}
 
 
+# Marks "not supplied" for ANPRDetector's `ocr`, where None already means "OCR failed to
+# load" and must be shareable as such.
+_LOAD = object()
+
+
 class ANPRDetector:
-    def __init__(self, config):
+    def __init__(self, config, model: YoloOnnx | None = None, ocr=_LOAD):
+        """``model`` and ``ocr`` share already-loaded sessions, as in ``PPEDetector``."""
         self.config = config
-        self.model = YoloOnnx(PLATE_MODEL_PATH)
-        self.ocr = self._load_ocr()
+        self.model = model if model is not None else YoloOnnx(PLATE_MODEL_PATH)
+        self.ocr = self._load_ocr() if ocr is _LOAD else ocr
 
     @staticmethod
     def _load_ocr():
@@ -130,17 +136,28 @@ class ANPRDetector:
 
     def analyse(self, image, size: int) -> ANPRResult:
         """Detect plates and read them. CPU-bound; call in a thread."""
-        detections = self.model.detect(
-            image,
+        return self.analyse_batch([image], size)[0]
+
+    def analyse_batch(self, images, size: int) -> list[ANPRResult]:
+        """``analyse`` over several frames, sharing one detector run where possible.
+
+        Only the plate detector is batched; OCR still reads one crop at a time, since
+        the number of plates per frame varies and is usually zero or one.
+        """
+        batches = self.model.detect_batch(
+            images,
             confidence=self.config.confidence.value / 100,
             size=size,
         )
 
-        plates = []
-        for detection in detections:
-            text, conf = self._read(image, detection)
-            plates.append(Plate(detection, text, conf))
-        return ANPRResult(plates)
+        results = []
+        for image, detections in zip(images, batches):
+            plates = []
+            for detection in detections:
+                text, conf = self._read(image, detection)
+                plates.append(Plate(detection, text, conf))
+            results.append(ANPRResult(plates))
+        return results
 
     def _read(self, image, detection: Detection):
         if self.ocr is None:
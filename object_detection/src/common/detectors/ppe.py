@@ -121,9 +121,11 @@ class PPEResult:
 
 
 class PPEDetector:
-    def __init__(self, config):
+    def __init__(self, config, model: YoloOnnx | None = None):
+        """``model`` shares an already-loaded session; the thresholds live in ``config``
+        and are applied per call, so one session can serve any number of configs."""
         self.config = config
-        self.model = YoloOnnx(PPE_MODEL_PATH)
+        self.model = model if model is not None else YoloOnnx(PPE_MODEL_PATH)
 
         available = set(self.model.class_names.values())
         # Fail loudly at startup rather than silently reporting "nobody in shot"
@@ -150,6 +152,10 @@ class PPEDetector:
 
     def analyse(self, image, size: int) -> PPEResult:
         """Detect people and attribute PPE to them. CPU-bound; call in a thread."""
+        return self.analyse_batch([image], size)[0]
+
+    def analyse_batch(self, images, size: int) -> list[PPEResult]:
+        """``analyse`` over several frames, sharing one model run where possible."""
         wanted = (
             PERSON
             | HARD_HAT_PRESENT
@@ -157,13 +163,18 @@ class PPEDetector:
             | HIGH_VIS_PRESENT
             | HIGH_VIS_MISSING
         )
-        detections = self.model.detect(
-            image,
+        batches = self.model.detect_batch(
+            images,
             confidence=self.config.confidence.value / 100,
             size=size,
             wanted=wanted,
         )
+        return [
+            self._attribute(detections, image.shape[:2])
+            for image, detections in zip(images, batches)
+        ]
 
+    def _attribute(self, detections: list[Detection], shape) -> PPEResult:
         people = [Person(d) for d in detections if d.label in PERSON]
         equipment = [d for d in detections if d.label not in PERSON]
 
@@ -176,7 +187,7 @@ class PPEDetector:
         # detected still needs flagging -- that's exactly the case we care about.
         for item in unclaimed:
             if item.label in HARD_HAT_MISSING or item.label in HIGH_VIS_MISSING:
-                person = self._imply_person(item, image.shape[:2])
+                person = self._imply_person(item, shape)
                 if item.label in HARD_HAT_MISSING:
                     person.hard_hat = False
                 else:
@@ -0,0 +1,52 @@
+"""Perceptual fingerprints for spotting a frame that hasn't changed.
+
+A camera re-reports a parked vehicle or someone standing still, and a scheduled
+snapshot of a quiet yard is the same picture as the last one. Running the models again
+over those costs seconds of CPU to reproduce an answer we already have. A fingerprint
+makes "is this the same scene?" a comparison of a few dozen bytes.
+
+The fingerprint is a difference hash: the frame shrunk to a small grayscale grid, one
+bit per cell saying whether it is brighter than its right-hand neighbour. It survives
+JPEG re-encoding, sensor noise and small exposure drift -- all of which change every
+raw pixel -- while a subject entering or leaving changes the gradients it covers.
+
+The grid is 16x16 (256 bits) rather than the classic 8x8. At 8x8 one cell of a 4K
+frame is ~480x270 px, large enough for a person on the far side of a yard to vanish
+inside it; that would be a violation reused away as "nothing changed", which is the one
+mistake this must not make. 16 cells across halves that, and the comparison stays a
+single ``count_nonzero``.
+
+Deliberately free of doover coupling, like the rest of ``common``.
+"""
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def frame_hash(image: np.ndarray) -> np.ndarray:
+    """The difference hash of a BGR (or grayscale) frame, as ``HASH_BITS`` bools."""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # INTER_AREA averages every source pixel into its cell, so the hash describes the
+    # whole frame rather than a sparse sample of it that noise could flip.
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).flatten()
+
+
+def distance(a: np.ndarray, b: np.ndarray) -> int:
+    """How many bits differ between two hashes (0 = identical)."""
+    return int(np.count_nonzero(a != b))
+
+
+def is_near_duplicate(a: np.ndarray | None, b: np.ndarray | None, threshold: int) -> bool:
+    """Whether two hashes are within ``threshold`` bits of each other.
+
+    A threshold of 0 or below means "never": the check is off, not "identical only" --
+    two captures of a static scene are never bit-identical anyway, so an exact match
+    would just be a slower way of never matching.
+    """
+    if threshold <= 0 or a is None or b is None or a.shape != b.shape:
+        return False
+    return distance(a, b) <= threshold
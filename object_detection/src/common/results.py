@@ -0,0 +1,77 @@
+"""A flat, plain-data form of the detectors' results.
+
+``PPEResult`` / ``ANPRResult`` are object graphs -- people holding detections holding
+boxes -- which is right for the code that reasons over them and wrong for anything that
+has to move them: the on-device inference worker sends them across a pipe, and the
+processor's result cache writes them to disk. Both use this form instead.
+
+It is nested tuples of numbers, bools and short strings only, so it pickles to a few
+hundred bytes and round-trips through JSON unchanged (tuples come back as lists, which
+``unpack`` reads the same way). What a result *means* -- each person's ``missing`` list
+included -- survives the trip, so nothing downstream has to recompute it.
+
+Deliberately free of doover coupling, like the rest of ``common``.
+"""
+
+from .detectors.anpr import ANPRResult, Plate
+from .detectors.ppe import Person, PPEResult
+from .yolo import Detection
+
+
+def _pack_detection(d: Detection) -> tuple:
+    return (d.label, d.confidence, *d.box)
+
+
+def _unpack_detection(packed) -> Detection:
+    label, confidence, x1, y1, x2, y2 = packed
+    return Detection(label, confidence, (x1, y1, x2, y2))
+
+
+def pack(ppe_result: PPEResult | None, anpr_result: ANPRResult | None) -> tuple:
+    """Flatten a ``(ppe_result, anpr_result)`` pair. Either may be None."""
+    ppe_packed = anpr_packed = None
+    if ppe_result is not None:
+        ppe_packed = (
+            tuple(
+                (
+                    _pack_detection(p.detection),
+                    p.hard_hat,
+                    p.high_vis,
+                    p.implied,
+                    tuple(getattr(p, "missing", ())),
+                )
+                for p in ppe_result.people
+            ),
+            tuple(_pack_detection(d) for d in ppe_result.raw),
+        )
+    if anpr_result is not None:
+        anpr_packed = tuple(
+            (_pack_detection(p.detection), p.text, p.ocr_confidence)
+            for p in anpr_result.plates
+        )
+    return ppe_packed, anpr_packed
+
+
+def unpack(packed) -> tuple[PPEResult | None, ANPRResult | None]:
+    """Rebuild the ``(ppe_result, anpr_result)`` pair ``pack`` flattened."""
+    ppe_packed, anpr_packed = packed
+    ppe_result = anpr_result = None
+    if ppe_packed is not None:
+        people_packed, raw_packed = ppe_packed
+        people = []
+        for detection, hard_hat, high_vis, implied, missing in people_packed:
+            person = Person(_unpack_detection(detection), implied=implied)
+            person.hard_hat = hard_hat
+            person.high_vis = high_vis
+            person.missing = list(missing)
+            people.append(person)
+        ppe_result = PPEResult(people, [_unpack_detection(d) for d in raw_packed])
+        ppe_result.violators = [p for p in people if p.missing]
+    if anpr_packed is not None:
+        anpr_result = ANPRResult(
+            [
+                Plate(_unpack_detection(detection), text, ocr_confidence)
+                for detection, text, ocr_confidence in anpr_packed
+            ]
+        )
+    return ppe_result, anpr_result
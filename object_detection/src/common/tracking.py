@@ -0,0 +1,181 @@
+"""Following people across a camera's frames, so one person is one report.
+
+Every frame is analysed on its own. Without this, a worker standing in a yard without a
+vest is a fresh violation in every snapshot of that yard -- a ``ppe_violation`` event and
+a notification each time, and a ``violation_count`` that measures how often the camera
+looked rather than how many people broke the rule.
+
+A track is a person seen in successive frames. Each frame's people are matched onto the
+live tracks in two passes:
+
+1. **Overlap.** Pairs are taken greedily, best IoU first, down to ``MATCH_IOU``. This is
+   the case that matters: someone working in one spot between snapshots.
+2. **Centroid.** What's left is matched on how far the box centre moved, relative to the
+   track's own size. Between sampled frames a walking person can move further than their
+   own width, which leaves no overlap at all; a centre within ``MAX_CENTROID_SHIFT``
+   box diagonals is still plausibly them.
+
+Boxes are held normalised to the frame (0..1), so a track survives a change of
+resolution -- the camera app's snapshot and a sub-stream frame of the same view differ
+in pixels, not in where the person stands.
+
+State is a handful of parallel numpy arrays rather than an object per track: an update
+is a few vectorised comparisons, and a camera's whole history is a few dozen bytes per
+person. Tracks not seen for ``max_age`` seconds are dropped on the next update.
+
+Deliberately free of doover coupling, like the rest of ``common``.
+"""
+
+import time
+
+import numpy as np
+
+# Overlap at which a person is taken to be the same one as a track. Loose on purpose:
+# re-reporting someone is the failure this exists to avoid, and two different people
+# overlapping this much in one camera's view are rare.
+MATCH_IOU = 0.3
+# How far a box centre may move between frames and still be the same person, in
+# multiples of the track's box diagonal.
+MAX_CENTROID_SHIFT = 1.0
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of every box in ``a`` (N,4) against every box in ``b`` (M,4): shape (N,M)."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _greedy(score: np.ndarray, threshold: float, higher_is_better: bool = True):
+    """Pair rows with columns, best score first, while the score passes ``threshold``."""
+    if not score.size:
+        return []
+    order = np.argsort(-score if higher_is_better else score, axis=None)
+    rows, cols = np.unravel_index(order, score.shape)
+    used_rows, used_cols, pairs = set(), set(), []
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        value = score[r, c]
+        if (value < threshold) if higher_is_better else (value > threshold):
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+class PersonTracker:
+    """Stable ids for the people in one camera view, and which violations are news.
+
+    ``update`` takes one frame's people and returns, for each, its track id and whether
+    it should be reported: it is violating and its track hasn't been reported yet -- or,
+    with ``repeat_after`` set, hasn't been for that many seconds.
+    """
+
+    def __init__(
+        self,
+        max_age: float,
+        repeat_after: float | None = None,
+        match_iou: float = MATCH_IOU,
+        max_centroid_shift: float = MAX_CENTROID_SHIFT,
+    ):
+        self.max_age = max_age
+        self.repeat_after = repeat_after
+        self.match_iou = match_iou
+        self.max_centroid_shift = max_centroid_shift
+
+        # One row per live track.
+        self._boxes = np.empty((0, 4), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._last_seen = np.empty(0, dtype=np.float64)
+        # When the track's violation was last reported; NaN if it never has been.
+        self._reported_at = np.empty(0, dtype=np.float64)
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def update(self, boxes, violating, shape, now: float | None = None):
+        """Match one frame's people onto the tracks.
+
+        ``boxes`` are ``(x1, y1, x2, y2)`` in pixels of a frame of ``shape``;
+        ``violating`` says, per box, whether that person is a reportable violation.
+        Returns ``(ids, report)``: the track id of each box, and a bool per box that is
+        True for a violation to report now.
+        """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        height, width = shape[:2]
+        frame = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) / np.float32(
+            [width, height, width, height]
+        )
+        violating = np.asarray(violating, dtype=bool).reshape(-1)
+
+        track_of = self._match(frame)
+
+        new = track_of < 0
+        if new.any():
+            count = int(new.sum())
+            track_of[new] = np.arange(len(self._ids), len(self._ids) + count)
+            self._boxes = np.concatenate([self._boxes, frame[new]])
+            self._ids = np.concatenate(
+                [self._ids, np.arange(self._next_id, self._next_id + count)]
+            )
+            self._last_seen = np.concatenate([self._last_seen, np.full(count, now)])
+            self._reported_at = np.concatenate(
+                [self._reported_at, np.full(count, np.nan)]
+            )
+            self._next_id += count
+
+        self._boxes[track_of] = frame
+        self._last_seen[track_of] = now
+
+        reported_at = self._reported_at[track_of]
+        due = np.isnan(reported_at)
+        if self.repeat_after is not None:
+            due |= now - reported_at >= self.repeat_after
+        report = violating & due
+        self._reported_at[track_of[report]] = now
+        return self._ids[track_of].copy(), report
+
+    def _match(self, frame: np.ndarray) -> np.ndarray:
+        """The track row each box continues, or -1 for a new person."""
+        track_of = np.full(len(frame), -1, dtype=np.int64)
+        if not len(frame) or not len(self._ids):
+            return track_of
+
+        for r, c in _greedy(_iou_matrix(frame, self._boxes), self.match_iou):
+            track_of[r] = c
+
+        free_boxes = np.flatnonzero(track_of < 0)
+        free_tracks = np.setdiff1d(np.arange(len(self._ids)), track_of[track_of >= 0])
+        if not len(free_boxes) or not len(free_tracks):
+            return track_of
+
+        tracks = self._boxes[free_tracks]
+        centres = (frame[free_boxes, :2] + frame[free_boxes, 2:]) / 2
+        track_centres = (tracks[:, :2] + tracks[:, 2:]) / 2
+        diagonals = np.hypot(tracks[:, 2] - tracks[:, 0], tracks[:, 3] - tracks[:, 1])
+        shift = np.linalg.norm(
+            centres[:, None, :] - track_centres[None, :, :], axis=2
+        ) / np.maximum(diagonals[None, :], 1e-6)
+        for r, c in _greedy(shift, self.max_centroid_shift, higher_is_better=False):
+            track_of[free_boxes[r]] = free_tracks[c]
+        return track_of
+
+    def _expire(self, now: float):
+        keep = now - self._last_seen < self.max_age
+        if keep.all():
+            return
+        self._boxes = self._boxes[keep]
+        self._ids = self._ids[keep]
+        self._last_seen = self._last_seen[keep]
+        self._reported_at = self._reported_at[keep]
@@ -23,6 +23,18 @@ log = logging.getLogger(__name__)
 
 MODEL_DIR = Path(os.environ.get("OBJECT_DETECTION_MODEL_DIR", "models"))
 
+# Bounds on how much a cluttered frame can cost. At a low confidence a busy frame puts
+# thousands of overlapping anchors above threshold, and NMS is quadratic-ish in that
+# count -- so latency depended on what was in shot. Only the best PRE_NMS_TOP_K
+# candidates *per class* go into NMS, and at most MAX_DETECTIONS come out. Both are far
+# above anything a real site frame produces (a few dozen people at most), so they only
+# bite on the pathological frame. 0 disables either.
+PRE_NMS_TOP_K = int(os.environ.get("OBJECT_DETECTION_PRE_NMS_TOP_K", "100"))
+MAX_DETECTIONS = int(os.environ.get("OBJECT_DETECTION_MAX_DETECTIONS", "100"))
+
+# Columns of an end-to-end model's output: batch index, x1, y1, x2, y2, score, class.
+END_TO_END_COLUMNS = 7
+
 
 @dataclass
 class Detection:
@@ -73,7 +85,13 @@ def letterbox(
 class YoloOnnx:
     """A YOLOv8/v11 detection model loaded from an ONNX file."""
 
-    def __init__(self, path: Path, class_names: dict[int, str] | None = None):
+    def __init__(
+        self,
+        path: Path,
+        class_names: dict[int, str] | None = None,
+        top_k: int = PRE_NMS_TOP_K,
+        max_detections: int = MAX_DETECTIONS,
+    ):
         if not path.exists():
             raise ModelUnavailable(f"model weights not found at {path}")
 
@@ -85,17 +103,30 @@ class YoloOnnx:
         opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
 
         self.path = path
+        self.top_k = top_k
+        self.max_detections = max_detections
         self.session = ort.InferenceSession(
             str(path), sess_options=opts, providers=["CPUExecutionProvider"]
         )
         model_input = self.session.get_inputs()[0]
         self.input_name = model_input.name
         self.fixed_size = self._fixed_input_size(model_input.shape)
+        # An ultralytics export with `dynamic=True` leaves the batch axis symbolic too,
+        # and then several frames can share one session.run. A static export accepts
+        # exactly one, so detect_batch falls back to a run per frame.
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        # Weights run through `fetch_models.py --nms` decode and suppress inside the
+        # graph, and take their thresholds as optional inputs.
+        self.end_to_end = self._is_end_to_end(self.session.get_outputs()[0].shape)
+        self.optional_inputs = {
+            i.name for i in self.session.get_overridable_initializers()
+        }
         self.class_names = class_names or self._names_from_metadata()
         log.info(
             f"Loaded {path.name} with {len(self.class_names)} classes: "
             f"{sorted(self.class_names.values())}"
             + (f", fixed {self.fixed_size}px input" if self.fixed_size else "")
+            + (", NMS in graph" if self.end_to_end else "")
         )
 
     @staticmethod
@@ -115,6 +146,17 @@ class YoloOnnx:
             return height
         return None
 
+    @staticmethod
+    def _is_end_to_end(shape) -> bool:
+        """Whether the model's output is already-suppressed detections.
+
+        A raw YOLO export is always rank 3, ``(batch, 4 + classes, anchors)`` or its
+        transpose. The end-to-end graph emits one ``(N, 7)`` table for the whole batch
+        -- ``batch_index, x1, y1, x2, y2, score, class_id`` per kept box, in letterboxed
+        pixels -- so the rank alone tells them apart.
+        """
+        return len(shape) == 2 and shape[-1] == END_TO_END_COLUMNS
+
     def _names_from_metadata(self) -> dict[int, str]:
         """Read the class map ultralytics embeds in the ONNX metadata.
 
@@ -154,6 +196,25 @@ class YoloOnnx:
         it larger only for weights exported with dynamic axes (see
         ``scripts/fetch_models.py``).
         """
+        return self.detect_batch([image], confidence, iou, size, wanted)[0]
+
+    def detect_batch(
+        self,
+        images: list[np.ndarray],
+        confidence: float = 0.4,
+        iou: float = 0.45,
+        size: int = 640,
+        wanted: set[str] | None = None,
+    ) -> list[list[Detection]]:
+        """``detect`` over several frames, in one ``session.run`` where the model allows.
+
+        Every frame is letterboxed to the same square, so frames of any resolution
+        batch together. One run over N frames saves N-1 rounds of session overhead and
+        lets onnxruntime keep its kernels hot; the per-frame decode and NMS are
+        unchanged. Models with a fixed batch axis get one run per frame instead.
+        """
+        if not images:
+            return []
         if self.fixed_size and size != self.fixed_size:
             log.debug(
                 f"{self.path.name} has a fixed {self.fixed_size}px input; ignoring the "
@@ -161,46 +222,112 @@ class YoloOnnx:
             )
             size = self.fixed_size
 
-        padded, scale, (pad_x, pad_y) = letterbox(image, size)
+        prepared = [letterbox(image, size) for image in images]
         # BGR->RGB, HWC->CHW, 0-1
-        blob = padded[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
-
-        outputs = self.session.run(None, {self.input_name: blob})[0]
-        boxes, scores, class_ids = self._decode(outputs, confidence)
-        if not boxes:
-            return []
-
-        keep = cv2.dnn.NMSBoxes(boxes, scores, confidence, iou)
-        if len(keep) == 0:
-            return []
+        blobs = [
+            padded[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            for padded, _scale, _pad in prepared
+        ]
+        if self.dynamic_batch and len(blobs) > 1:
+            batched = self._run(np.concatenate(blobs), confidence, iou)
+            outputs = [self._frame_output(batched, i) for i in range(len(blobs))]
+        else:
+            outputs = [
+                self._frame_output(self._run(blob, confidence, iou), 0)
+                for blob in blobs
+            ]
+
+        return [
+            self._postprocess(output, image, scale, pad, confidence, iou, wanted)
+            for output, image, (_padded, scale, pad) in zip(outputs, images, prepared)
+        ]
+
+    def _run(self, blob: np.ndarray, confidence: float, iou: float) -> np.ndarray:
+        feeds = {self.input_name: blob}
+        if "score_threshold" in self.optional_inputs:
+            feeds["score_threshold"] = np.array([confidence], dtype=np.float32)
+        if "iou_threshold" in self.optional_inputs:
+            feeds["iou_threshold"] = np.array([iou], dtype=np.float32)
+        if self.max_detections and "max_detections" in self.optional_inputs:
+            feeds["max_detections"] = np.array([self.max_detections], dtype=np.int64)
+        return self.session.run(None, feeds)[0]
+
+    def _frame_output(self, outputs: np.ndarray, index: int) -> np.ndarray:
+        """Frame ``index``'s share of a run's output."""
+        if self.end_to_end:
+            return outputs[outputs[:, 0] == index]
+        return outputs[index : index + 1]
+
+    def _postprocess(
+        self, outputs, image, scale, pad, confidence, iou, wanted
+    ) -> list[Detection]:
+        """Decode, NMS and un-letterbox one frame's model output."""
+        pad_x, pad_y = pad
+        if self.end_to_end:
+            kept = self._from_end_to_end(outputs, confidence)
+        else:
+            kept = self._suppress(outputs, confidence, iou)
+        if self.max_detections:
+            # Both paths come back best-first, so this keeps the strongest.
+            kept = kept[: self.max_detections]
 
         h, w = image.shape[:2]
         detections = []
-        for i in np.asarray(keep).flatten():
-            bx, by, bw, bh = boxes[i]
+        for bx1, by1, bx2, by2, score, cid in kept:
             # Undo the letterbox: remove padding, then the resize.
-            x1 = round((bx - pad_x) / scale)
-            y1 = round((by - pad_y) / scale)
-            x2 = round((bx + bw - pad_x) / scale)
-            y2 = round((by + bh - pad_y) / scale)
+            x1 = round((bx1 - pad_x) / scale)
+            y1 = round((by1 - pad_y) / scale)
+            x2 = round((bx2 - pad_x) / scale)
+            y2 = round((by2 - pad_y) / scale)
             # A box can legitimately extend past the frame edge (a person half out
             # of shot); clamp rather than drop so the subject is still reported.
             box = (max(0, x1), max(0, y1), min(w, x2), min(h, y2))
 
-            cid = int(class_ids[i])
             label = self.class_names.get(cid, str(cid))
             if wanted and label not in wanted:
                 continue
-            detections.append(Detection(label, float(scores[i]), box))
+            detections.append(Detection(label, score, box))
         return detections
 
+    def _suppress(self, outputs, confidence, iou) -> list[tuple]:
+        """Decode a raw output and run NMS over it, in letterboxed pixels."""
+        boxes, scores, class_ids = self._decode(outputs, confidence, self.top_k)
+        if not boxes:
+            return []
+
+        # Indices come back sorted by descending score.
+        keep = cv2.dnn.NMSBoxes(boxes, scores, confidence, iou)
+        kept = []
+        for i in np.asarray(keep).flatten():
+            bx, by, bw, bh = boxes[i]
+            kept.append((bx, by, bx + bw, by + bh, float(scores[i]), int(class_ids[i])))
+        return kept
+
+    @staticmethod
+    def _from_end_to_end(rows: np.ndarray, confidence: float) -> list[tuple]:
+        """Read an end-to-end graph's rows for one frame; the graph already did NMS.
+
+        Filtered on confidence again here because the graph's own threshold is strict
+        (``>``) where ``_decode``'s is inclusive, and because weights exported with a
+        baked-in threshold may not expose it as an input at all.
+        """
+        return [
+            (float(x1), float(y1), float(x2), float(y2), float(score), int(cid))
+            for _b, x1, y1, x2, y2, score, cid in rows.tolist()
+            if score >= confidence
+        ]
+
     @staticmethod
-    def _decode(outputs: np.ndarray, confidence: float):
+    def _decode(outputs: np.ndarray, confidence: float, top_k: int = 0):
         """Pull boxes/scores/class ids out of the raw model output.
 
         YOLOv8/v11 emit ``(1, 4 + num_classes, num_anchors)``; some exporters
         transpose that to ``(1, num_anchors, 4 + num_classes)``. Anchors always
         vastly outnumber ``4 + num_classes``, so the longer axis is the anchor axis.
+
+        ``top_k`` keeps only that many of the highest-scoring candidates per class
+        (0 keeps all). Survivors stay in anchor order, so NMS breaks ties exactly as
+        it would have without the cap.
         """
         pred = np.squeeze(outputs, axis=0)
         if pred.shape[0] > pred.shape[1]:
@@ -214,6 +341,8 @@ class YoloOnnx:
         mask = scores >= confidence
         if not mask.any():
             return [], [], []
+        if top_k and np.count_nonzero(mask) > top_k:
+            mask = _top_k_per_class(mask, scores, class_ids, top_k)
 
         # The model emits centre-form boxes, but cv2.dnn.NMSBoxes reads its input as
         # top-left (x, y, w, h). Feeding it centres shifts every box by half its own
@@ -227,3 +356,20 @@ class YoloOnnx:
             scores[mask].astype(float).tolist(),
             class_ids[mask],
         )
+
+
+def _top_k_per_class(mask, scores, class_ids, top_k: int) -> np.ndarray:
+    """Narrow ``mask`` to the ``top_k`` best-scoring candidates of each class.
+
+    ``np.argpartition`` rather than a sort: it only has to split each class at its
+    k-th score, which is linear, and the order within the top k doesn't matter here.
+    """
+    candidates = np.flatnonzero(mask)
+    candidate_ids = class_ids[candidates]
+    narrowed = np.zeros_like(mask)
+    for cid in np.unique(candidate_ids):
+        members = candidates[candidate_ids == cid]
+        if len(members) > top_k:
+            members = members[np.argpartition(scores[members], -top_k)[-top_k:]]
+        narrowed[members] = True
+    return narrowed
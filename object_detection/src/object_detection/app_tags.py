@@ -7,8 +7,18 @@ class ObjectDetectionTags(Tags):
     config: ObjectDetectionConfig
 
     analysed_count = Tag("number", 0)
+    # Frames whose findings were reused from the camera's previous, near-identical
+    # frame rather than re-run through the models. Counted within analysed_count.
+    duplicate_skip_count = Tag("number", 0)
+    # Frames whose thumbnail came back empty, so the full-size frame was never
+    # downloaded or decoded (Pre-Screen On Thumbnails). Counted within analysed_count.
+    thumbnail_screen_count = Tag("number", 0)
     violation_count = Tag("number", 0)
     last_plate = Tag("string", "")
     # Epoch milliseconds, matching the camera app's tag of the same name so a
     # dashboard can read either interchangeably.
     last_ppe_violation = Tag("number", 0)
+    # Continuous monitoring (``stream.py``): sub-stream frames analysed, and frames
+    # that came due but were skipped because snapshots or the camera apps had the CPU.
+    stream_frame_count = Tag("number", 0)
+    stream_skip_count = Tag("number", 0)
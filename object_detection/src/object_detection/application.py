@@ -16,9 +16,14 @@ variant (``object_detection_processor``) so the two can't drift apart.
 
 import asyncio
 import logging
+import tempfile
 from datetime import datetime, timezone
+from pathlib import Path
 
 from common import annotate as annotate_mod
+from common import clips as clips_mod
+from common import fingerprint as fingerprint_mod
+from common import tracking as tracking_mod
 from common import zones as zones_mod
 from common.detectors import anpr as anpr_mod
 from common.detectors import ppe as ppe_mod
@@ -32,6 +37,8 @@ from pydoover.models import (
 
 from .app_config import ObjectDetectionConfig
 from .app_tags import ObjectDetectionTags
+from .inference_worker import InferenceWorker, WorkerFailed
+from .stream import PPEStream, over_load
 
 log = logging.getLogger()
 
@@ -47,9 +54,15 @@ CAMERA_EVENT_CHANNEL = "camera_event"
 ANALYSED_BY_KEY = "analysed_by"
 
 # Extensions we can decode. Video snapshots (the camera app's "Video" mode) land on
-# the same channel and can't be run through an image decoder.
+# the same channel and can't be run through an image decoder; they're sampled as clips
+# instead when Analyse Event Clips is on (see ``common.clips``).
 IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
 
+# Sampled clip frames handed to the models at once. Each is a full decoded frame (~6MB
+# at 1080p), so this is most of what a clip costs in memory; four is enough for the
+# batched model call to pay off without holding the inference lock for long.
+CLIP_BATCH = 4
+
 ANNOTATED_SUFFIX = "-detected"
 # Matches the camera app's convention (`<name>-thumbnail.jpg`), so its gallery treats our
 # previews the same way as its own.
@@ -65,6 +78,11 @@ DETECTED_VIEW_SUFFIX = " (detected)"
 # frame rather than block the event stream waiting for it.
 ATTACHMENT_WAIT_SEC = 1
 
+# The view name a camera's sub-stream is tracked under, beside its snapshot views. Its
+# own tracker rather than the snapshots': the stream has its own reporting cadence
+# (Repeat Violation After), and sharing tracks would let one hold back the other.
+STREAM_VIEW = "stream"
+
 
 class ObjectDetectionApplication(Application):
     config: ObjectDetectionConfig
@@ -76,13 +94,17 @@ class ObjectDetectionApplication(Application):
     async def setup(self):
         self.ppe = None
         self.anpr = None
+        self._worker = None
 
-        if self.config.ppe.enabled.value:
-            self.ppe = ppe_mod.load(self.config.ppe)
-        if self.config.anpr.enabled.value:
-            self.anpr = anpr_mod.load(self.config.anpr)
+        if self.config.inference_worker.value:
+            await self._start_worker()
+        else:
+            if self.config.ppe.enabled.value:
+                self.ppe = ppe_mod.load(self.config.ppe)
+            if self.config.anpr.enabled.value:
+                self.anpr = anpr_mod.load(self.config.anpr)
 
-        if not (self.ppe or self.anpr):
+        if not self._can_analyse:
             log.warning(
                 "No detectors are enabled (or none could load their weights) -- "
                 "snapshots will be ignored."
@@ -93,6 +115,23 @@ class ObjectDetectionApplication(Application):
         # to snapshot together, which is exactly when they all fire (the schedule).
         self._inference_lock = asyncio.Lock()
 
+        # (app key, view name) -> (fingerprint, shape, ppe_result, anpr_result) of the last
+        # frame the models actually ran on. Per view, not per camera: a PTZ camera's
+        # presets are different scenes published on the same channel.
+        self._last_analysed: dict[tuple[str, str], tuple] = {}
+
+        # app key -> the detection zones that camera's latest snapshot carried. A
+        # stream frame arrives with no payload of its own, so it is narrowed by the
+        # zones the camera last sent -- None (the whole frame) until it sends any.
+        self._camera_zones: dict[str, list | None] = {}
+        # (app key, view name) -> the people being followed in that view, so a person
+        # standing in shot is reported once rather than once per frame. Per view for
+        # the same reason as _last_analysed.
+        self._trackers: dict[tuple[str, str], tracking_mod.PersonTracker] = {}
+        self._streams: list[PPEStream] = []
+        if self.config.streaming.active:
+            self._start_streams()
+
         keys = self.config.watched_app_keys
         if not keys:
             log.warning("No camera apps configured; nothing to subscribe to.")
@@ -102,9 +141,86 @@ class ObjectDetectionApplication(Application):
                 key, self.on_camera_message, EventSubscription.message_create
             )
 
+    async def _start_worker(self):
+        """Load the models into a worker process instead of this one.
+
+        See ``inference_worker``. The worker reports which detectors actually loaded,
+        so a missing weights file is handled the same as in-process: that detector is
+        off, and if neither loaded the worker is shut down again rather than idling.
+        """
+        worker = InferenceWorker(
+            self.config.ppe if self.config.ppe.enabled.value else None,
+            self.config.anpr if self.config.anpr.enabled.value else None,
+            self.config.worker_memory_limit_mb.value,
+        )
+        try:
+            loaded = await asyncio.to_thread(worker.start)
+        except WorkerFailed as e:
+            log.error(f"Couldn't start the inference worker: {e}")
+            worker.close()
+            return
+        if not loaded:
+            worker.close()
+            return
+        self._worker = worker
+
+    @property
+    def _can_analyse(self) -> bool:
+        return bool(self.ppe or self.anpr or self._worker)
+
+    @property
+    def _has_ppe(self) -> bool:
+        return bool(self.ppe or (self._worker and self._worker.has_ppe))
+
+    @property
+    def _has_anpr(self) -> bool:
+        return bool(self.anpr or (self._worker and self._worker.has_anpr))
+
+    def _start_streams(self):
+        if not self._has_ppe:
+            log.warning(
+                "Continuous PPE monitoring is enabled but PPE detection isn't (or its "
+                "model didn't load) -- not starting any streams."
+            )
+            return
+
+        streaming = self.config.streaming
+        for app_key, url in streaming.streams:
+            log.info(
+                f"Monitoring '{app_key}' continuously at {streaming.fps.value} fps."
+            )
+            self._trackers[(app_key, STREAM_VIEW)] = tracking_mod.PersonTracker(
+                self.config.ppe.forget_after.value,
+                repeat_after=streaming.repeat_after.value,
+            )
+            stream = PPEStream(
+                app_key,
+                url,
+                streaming.fps.value,
+                self._analyse_stream_frame,
+                self._stream_busy,
+            )
+            stream.start()
+            self._streams.append(stream)
+
+    async def close(self):
+        for stream in getattr(self, "_streams", []):
+            await stream.stop()
+        worker = getattr(self, "_worker", None)
+        if worker is not None:
+            await asyncio.to_thread(worker.close)
+        await super().close()
+
     async def main_loop(self):
-        # Everything happens in the subscription callbacks; the loop only exists to
-        # surface that the app is alive and what it has done.
+        # Everything happens in the subscription callbacks and stream tasks; the loop
+        # only exists to surface that the app is alive and what it has done.
+        if self._streams:
+            await self.tags.stream_frame_count.set(
+                sum(s.frames for s in self._streams)
+            )
+            await self.tags.stream_skip_count.set(
+                sum(s.skipped for s in self._streams)
+            )
         log.info(
             f"Watching {len(self.config.watched_app_keys)} camera app(s). "
             f"Analysed {self.tags.analysed_count.value} snapshot(s), "
@@ -131,6 +247,8 @@ class ObjectDetectionApplication(Application):
             return
 
         reason = payload.get("reason")
+        if "detection_zones" in payload:
+            self._camera_zones[app_key] = payload["detection_zones"]
 
         # The camera app sets this on its motion snapshots to say whether it wants them
         # analysed (its "Motion Snapshot Config > Object Detection" setting). It's
@@ -148,12 +266,15 @@ class ObjectDetectionApplication(Application):
             log.debug(f"Ignoring '{app_key}' snapshot (reason={reason}).")
             return
 
-        if not (self.ppe or self.anpr):
+        if not self._can_analyse:
             return
 
         message = await self._await_attachments(app_key, message)
         targets = self._image_attachments(payload, message.attachments)
-        if not targets:
+        clips = []
+        if self.config.analyse_clips.value:
+            clips = self._clip_attachments(payload, message.attachments)
+        if not targets and not clips:
             # Say so rather than returning quietly. A snapshot message whose payload
             # names media but carries no attachments used to look identical to "no
             # snapshots are arriving", which is how this went unnoticed.
@@ -171,12 +292,21 @@ class ObjectDetectionApplication(Application):
         zones = payload.get("detection_zones")
 
         log.info(
-            f"Analysing {len(targets)} image(s) from '{app_key}' (reason={reason})."
+            f"Analysing {len(targets)} image(s) and {len(clips)} clip(s) from "
+            f"'{app_key}' (reason={reason})."
         )
+        prescreen = self.config.thumbnail_prescreen.value
         for name, attachment in targets:
+            thumbnail = None
+            if prescreen:
+                thumbnail = self._thumbnail_attachment(
+                    payload, message.attachments, attachment.filename
+                )
             await self._analyse_attachment(
-                app_key, message, name, attachment, reason, zones
+                app_key, message, name, attachment, reason, zones, thumbnail
             )
+        for name, attachment in clips:
+            await self._analyse_clip(app_key, message, name, attachment, reason, zones)
 
     async def _await_attachments(self, app_key: str, message):
         """Re-read the message so it carries its attachments.
@@ -216,13 +346,20 @@ class ObjectDetectionApplication(Application):
         produce a worse answer. Where there's no ``media`` list (an older camera app,
         or another publisher) every image attachment is analysed.
         """
+        return cls._media_attachments(payload, attachments, cls._is_image)
+
+    @classmethod
+    def _clip_attachments(cls, payload: dict, attachments: list) -> list:
+        """Pick the video clips out of a snapshot message, as for images."""
+        return cls._media_attachments(payload, attachments, cls._is_clip)
+
+    @staticmethod
+    def _media_attachments(payload: dict, attachments: list, wanted) -> list:
         by_filename = {a.filename: a for a in attachments or []}
 
         media = payload.get("media")
         if not isinstance(media, list):
-            return [
-                (a.filename, a) for a in attachments or [] if cls._is_image(a.filename)
-            ]
+            return [(a.filename, a) for a in attachments or [] if wanted(a.filename)]
 
         targets = []
         for entry in media:
@@ -230,18 +367,67 @@ class ObjectDetectionApplication(Application):
                 continue
             filename = entry.get("file")
             attachment = by_filename.get(filename)
-            if attachment is None or not cls._is_image(filename):
+            if attachment is None or not wanted(filename):
                 continue
             targets.append((entry.get("name") or filename, attachment))
         return targets
 
+    @classmethod
+    def _thumbnail_attachment(cls, payload: dict, attachments: list, filename: str):
+        """The thumbnail the camera app published beside ``filename``, or None.
+
+        Only ever from the ``media`` list: guessing at a ``-thumbnail`` name could pick
+        up an annotated preview of ours instead.
+        """
+        media = payload.get("media")
+        if not isinstance(media, list):
+            return None
+        for entry in media:
+            if isinstance(entry, dict) and entry.get("file") == filename:
+                thumb = entry.get("thumbnail")
+                break
+        else:
+            return None
+        if not cls._is_image(thumb):
+            return None
+        return next((a for a in attachments or [] if a.filename == thumb), None)
+
     @staticmethod
     def _is_image(filename: str) -> bool:
         return bool(filename) and filename.lower().endswith(IMAGE_SUFFIXES)
 
+    @staticmethod
+    def _is_clip(filename: str) -> bool:
+        return bool(filename) and filename.lower().endswith(clips_mod.CLIP_SUFFIXES)
+
     async def _analyse_attachment(
-        self, app_key, message, name, attachment, reason, zones=None
+        self, app_key, message, name, attachment, reason, zones=None, thumbnail=None
     ):
+        if thumbnail is not None:
+            screened = await self._screen_thumbnail(app_key, thumbnail)
+            if screened is not None:
+                image, ppe_result, anpr_result = screened
+                log.info(
+                    f"Nothing in the thumbnail of '{attachment.filename}' from "
+                    f"'{app_key}'; skipping the full-size frame."
+                )
+                await self.tags.thumbnail_screen_count.set(
+                    self.tags.thumbnail_screen_count.value + 1
+                )
+                await self._publish_result(
+                    app_key,
+                    message,
+                    name,
+                    attachment,
+                    reason,
+                    image,
+                    ppe_result,
+                    anpr_result,
+                    zones,
+                    screened=True,
+                )
+                return
+
         try:
             file = await self.device_agent.fetch_message_attachment(attachment)
         except Exception as e:
@@ -256,8 +442,31 @@ class ObjectDetectionApplication(Application):
             log.warning(f"Couldn't decode '{attachment.filename}' as an image.")
             return
 
-        async with self._inference_lock:
-            ppe_result, anpr_result = await asyncio.to_thread(self._run_models, image)
+        fingerprint = None
+        if self.config.duplicate_frame_threshold.value:
+            # A resize to 17x16 is nothing next to a model run, but it still reads the
+            # whole frame -- on a 4K frame the grayscale conversion alone is measurable --
+            # so it stays off the event loop like the inference does.
+            fingerprint = await asyncio.to_thread(fingerprint_mod.frame_hash, image)
+
+        reused = self._reusable_findings(app_key, name, fingerprint, image.shape)
+        if reused is not None:
+            ppe_result, anpr_result = reused
+            log.info(
+                f"'{attachment.filename}' from '{app_key}' is unchanged since the last "
+                f"analysed frame; reusing its findings."
+            )
+            await self.tags.duplicate_skip_count.set(
+                self.tags.duplicate_skip_count.value + 1
+            )
+        else:
+            async with self._inference_lock:
+                ppe_result, anpr_result = await asyncio.to_thread(
+                    self._run_models, image
+                )
+            self._remember(
+                app_key, name, fingerprint, image.shape, ppe_result, anpr_result
+            )
 
         await self._publish_result(
             app_key,
@@ -269,27 +478,275 @@ class ObjectDetectionApplication(Application):
             ppe_result,
             anpr_result,
             zones,
+            reused=reused is not None,
+        )
+
+    async def _screen_thumbnail(self, app_key, thumbnail):
+        """Run the models on a thumbnail; its ``(image, ppe, anpr)`` if it's empty.
+
+        None means the full-size frame is needed: the thumbnail showed a person (PPE
+        attribution needs the detail) or a plate (so does OCR), or it couldn't be
+        fetched, decoded or analysed -- a screen that fails must fail open.
+        """
+        try:
+            file = await self.device_agent.fetch_message_attachment(thumbnail)
+        except Exception as e:
+            log.warning(
+                f"Couldn't fetch thumbnail '{thumbnail.filename}' from '{app_key}': "
+                f"{e}; analysing the full-size frame.",
+                exc_info=e,
+            )
+            return None
+
+        image = annotate_mod.decode(file.data)
+        if image is None:
+            return None
+
+        async with self._inference_lock:
+            ppe_result, anpr_result = await asyncio.to_thread(self._run_models, image)
+
+        # Any PPE detection at all, not just a person: a hard hat with no person under
+        # it is someone the thumbnail was too small to find.
+        if self._has_ppe and (ppe_result is None or ppe_result.raw):
+            return None
+        if self._has_anpr and (anpr_result is None or anpr_result.plates):
+            return None
+        return image, ppe_result, anpr_result
+
+    def _reusable_findings(self, app_key, name, fingerprint, shape):
+        """The previous findings for this view, if this frame is a near-duplicate.
+
+        Compared against the last frame the models *ran* on, not the last one seen: a
+        scene that drifts a bit per snapshot (a shadow moving across the yard) would
+        otherwise keep matching its predecessor forever and never be looked at again.
+        A change of resolution never matches, since the boxes are in pixels of the
+        frame they were found on. Returns ``(ppe_result, anpr_result)`` or None.
+        """
+        previous = self._last_analysed.get((app_key, name))
+        if previous is None:
+            return None
+
+        last_fingerprint, last_shape, ppe_result, anpr_result = previous
+        if last_shape != shape or not fingerprint_mod.is_near_duplicate(
+            last_fingerprint, fingerprint, self.config.duplicate_frame_threshold.value
+        ):
+            return None
+        return ppe_result, anpr_result
+
+    def _remember(self, app_key, name, fingerprint, shape, ppe_result, anpr_result):
+        if fingerprint is None:
+            return
+        if ppe_result is None and anpr_result is None:
+            # Inference failed; there is nothing worth reusing, and remembering the
+            # frame would make the next identical one skip the models and fail quietly.
+            self._last_analysed.pop((app_key, name), None)
+            return
+        self._last_analysed[(app_key, name)] = (
+            fingerprint,
+            shape,
+            ppe_result,
+            anpr_result,
         )
 
     def _run_models(self, image):
         """Run every enabled detector. Blocking -- executed in a worker thread."""
+        return self._run_models_batch([image])[0]
+
+    def _run_models_batch(self, images) -> list[tuple]:
+        """``_run_models`` over several frames, one batched model call per detector.
+
+        The worker process takes one frame at a time, so with it they go in turn.
+        """
         size = self.config.inference_size.value
 
-        ppe_result = anpr_result = None
+        if self._worker is not None:
+            return [self._worker.run(image, size) for image in images]
+
+        ppe_results = anpr_results = [None] * len(images)
         if self.ppe:
             try:
-                ppe_result = self.ppe.analyse(image, size)
+                ppe_results = self.ppe.analyse_batch(images, size)
             except Exception as e:
                 log.error(f"PPE inference failed: {e}", exc_info=e)
         if self.anpr:
             try:
-                anpr_result = self.anpr.analyse(image, size)
+                anpr_results = self.anpr.analyse_batch(images, size)
             except Exception as e:
                 log.error(f"Plate inference failed: {e}", exc_info=e)
-        return ppe_result, anpr_result
+        return list(zip(ppe_results, anpr_results))
+
+    # -- clips ----------------------------------------------------------------
+
+    async def _analyse_clip(
+        self, app_key, message, name, attachment, reason, zones=None
+    ):
+        """Sample a clip, fold its frames' findings together and publish them once.
+
+        The clip goes through a temporary file because the decoder reads from a path;
+        the downloaded bytes are dropped as soon as it's written, so they aren't held
+        for the minutes the analysis can take.
+        """
+        try:
+            file = await self.device_agent.fetch_message_attachment(attachment)
+        except Exception as e:
+            log.warning(
+                f"Couldn't fetch '{attachment.filename}' from '{app_key}': {e}",
+                exc_info=e,
+            )
+            return
+
+        suffix = Path(attachment.filename).suffix
+        with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+            await asyncio.to_thread(tmp.write, file.data)
+            await asyncio.to_thread(tmp.flush)
+            del file
+            clip = await self._sample_clip(tmp.name, zones)
+
+        if clip.key_frame is None:
+            log.warning(f"Couldn't decode any frames from '{attachment.filename}'.")
+            return
+        log.info(
+            f"Sampled {clip.frames} frame(s) over {clip.duration:.0f}s of "
+            f"'{attachment.filename}' from '{app_key}'."
+        )
+
+        await self._publish_result(
+            app_key,
+            message,
+            name,
+            attachment,
+            reason,
+            clip.key_frame,
+            clip.key_ppe,
+            clip.key_anpr,
+            zones,
+            clip=clip,
+        )
+
+    async def _sample_clip(self, path, zones) -> clips_mod.ClipFindings:
+        """Decode and analyse a clip a batch of samples at a time.
+
+        The inference lock is taken per batch rather than for the whole clip, so a
+        snapshot arriving mid-clip waits for one batch, not for the rest of the clip.
+        """
+        findings = clips_mod.ClipFindings()
+        frames = clips_mod.sample_frames(
+            path,
+            self.config.clip_sample_fps.value,
+            self.config.clip_max_frames.value,
+        )
+        try:
+            while batch := await asyncio.to_thread(clips_mod.take, frames, CLIP_BATCH):
+                async with self._inference_lock:
+                    results = await asyncio.to_thread(
+                        self._run_models_batch, [image for _s, image in batch]
+                    )
+                for (seconds, image), (ppe_result, anpr_result) in zip(batch, results):
+                    violator_pairs, plate_pairs = self._apply_zones(
+                        zones, ppe_result, anpr_result, image
+                    )
+                    findings.add(
+                        seconds,
+                        image,
+                        ppe_result,
+                        anpr_result,
+                        violator_pairs,
+                        plate_pairs,
+                    )
+        finally:
+            await asyncio.to_thread(frames.close)
+        return findings
+
+    # -- streams --------------------------------------------------------------
+
+    def _stream_busy(self) -> bool:
+        """Whether to skip the stream frame that has come due.
+
+        Snapshots always win: they were captured because something happened, where a
+        stream frame is only a look in case something did. So a frame is dropped while
+        a snapshot holds the models, and while the device is loaded past the
+        configured threshold -- the camera apps' own recording and uploads share these
+        cores.
+        """
+        return self._inference_lock.locked() or over_load(
+            self.config.streaming.max_load.value
+        )
+
+    async def _analyse_stream_frame(self, app_key: str, image):
+        """Check one stream frame for PPE and publish any violator not reported lately.
+
+        Nothing is published for a clean frame, and no annotated copy is made: a
+        stream has no message to attach it to, and the point is the event. Each
+        person's violation goes out through the same ``_publish_events`` path as a
+        snapshot's, so automations and ``violation_count`` treat it the same.
+        """
+        async with self._inference_lock:
+            ppe_result = await asyncio.to_thread(self._run_ppe, image)
+        if ppe_result is None:
+            return
+
+        violator_pairs, _plates = self._apply_zones(
+            self._camera_zones.get(app_key), ppe_result, None, image
+        )
+        violators = self._new_violations(
+            (app_key, STREAM_VIEW),
+            ppe_result,
+            [v for v, _zone in violator_pairs],
+            image.shape,
+        )
+        if not violators:
+            return
+
+        reported = {id(v) for v in violators}
+        matched_zones = [z for v, z in violator_pairs if id(v) in reported]
+        log.info(f"Stream from '{app_key}': {self._summarise(violators, [])}.")
+        await self._publish_events(app_key, violators, [])
+        await self._notify(app_key, violators, [], matched_zones)
+
+    def _run_ppe(self, image):
+        """PPE alone, for a stream frame. Blocking -- executed in a worker thread.
+
+        The worker process runs every detector it holds, so with it enabled plates are
+        read as well and dropped; streams are PPE-only by design, and reading plates
+        off a moving sub-stream at 640x360 wouldn't give usable text anyway.
+        """
+        size = self.config.inference_size.value
+        if self._worker is not None:
+            ppe_result, _anpr_result = self._worker.run(image, size)
+            return ppe_result
+        try:
+            return self.ppe.analyse(image, size)
+        except Exception as e:
+            log.error(f"PPE inference failed: {e}", exc_info=e)
+            return None
 
     # -- publish --------------------------------------------------------------
 
+    def _new_violations(self, view, ppe_result, violators, shape) -> list:
+        """The violators worth reporting: people whose track hasn't been reported yet.
+
+        Every person in the frame is tracked, not just the violators, so someone who
+        was compliant and then takes their hard hat off keeps the same track and is
+        reported at that point. ``violators`` is the zone-filtered subset.
+        """
+        if ppe_result is None or not ppe_result.people:
+            return []
+
+        tracker = self._trackers.get(view)
+        if tracker is None:
+            tracker = self._trackers[view] = tracking_mod.PersonTracker(
+                self.config.ppe.forget_after.value
+            )
+
+        wanted = {id(v) for v in violators}
+        people = ppe_result.people
+        _ids, report = tracker.update(
+            [p.detection.box for p in people],
+            [id(p) in wanted for p in people],
+            shape,
+        )
+        return [p for p, new in zip(people, report) if new]
+
     def _apply_zones(self, zones, ppe_result, anpr_result, image):
         """Narrow the findings to those inside a matching zone.
 
@@ -347,6 +804,9 @@ class ObjectDetectionApplication(Application):
         ppe_result,
         anpr_result,
         zones=None,
+        reused=False,
+        clip=None,
+        screened=False,
     ):
         findings = {}
         if ppe_result is not None:
@@ -357,17 +817,34 @@ class ObjectDetectionApplication(Application):
         # `findings` above is what the models saw, unfiltered, so the annotated frame and
         # the timeline entry still show the whole picture. What the zones narrow is what
         # gets *reported* — the summary, the events and the notifications below.
-        violator_pairs, plate_pairs = self._apply_zones(
-            zones, ppe_result, anpr_result, image
-        )
-        violators = [v for v, _zone in violator_pairs]
-        plates = [p for p, _zone in plate_pairs]
-        matched_zones = [z for _item, z in (*violator_pairs, *plate_pairs)]
+        if clip is None:
+            violator_pairs, plate_pairs = self._apply_zones(
+                zones, ppe_result, anpr_result, image
+            )
+            violators = [v for v, _zone in violator_pairs]
+            plates = [p for p, _zone in plate_pairs]
+            # Events and notifications are about people, not frames: only a violator
+            # who hasn't already been reported in this view is news. The summary and
+            # findings above still describe everything in the frame.
+            new_violators = self._new_violations(
+                (app_key, name), ppe_result, violators, image.shape
+            )
+            reported = {id(v) for v in new_violators}
+            matched_zones = [z for v, z in violator_pairs if id(v) in reported] + [
+                z for _plate, z in plate_pairs
+            ]
+        else:
+            # A clip was zone-filtered frame by frame as it was sampled, and already
+            # reduced to one sighting per person and plate.
+            violators = new_violators = clip.violators
+            plates = clip.plates
+            matched_zones = clip.zones
         found_anything = bool(
             violators
             or plates
             or (ppe_result and ppe_result.people)
             or (anpr_result and anpr_result.plates)
+            or (clip and clip.people)
         )
 
         await self.tags.analysed_count.set(self.tags.analysed_count.value + 1)
@@ -382,6 +859,17 @@ class ObjectDetectionApplication(Application):
             "findings": {name: findings},
             "summary": self._summarise(violators, plates),
         }
+        if reused:
+            # Said in the payload so a reader of the timeline knows these boxes were
+            # found on an earlier, near-identical frame rather than this one.
+            payload["reused"] = True
+        if screened:
+            # The findings are the thumbnail's: the full-size frame was never fetched.
+            payload["screened_on_thumbnail"] = True
+        if clip is not None:
+            # `findings` and the annotated frame are the clip's key frame; this is the
+            # whole clip, one entry per person and plate.
+            payload["clip"] = clip.to_dict()
 
         files = []
         if self.config.annotate.value:
@@ -445,9 +933,9 @@ class ObjectDetectionApplication(Application):
                 f"Failed to update message {message.id} on '{app_key}': {e}", exc_info=e
             )
 
-        await self._publish_events(app_key, violators, plates)
+        await self._publish_events(app_key, new_violators, plates)
         await self._notify(
-            self._camera_name(message, app_key), violators, plates, matched_zones
+            self._camera_name(message, app_key), new_violators, plates, matched_zones
         )
 
     @staticmethod
@@ -488,7 +976,10 @@ class ObjectDetectionApplication(Application):
         if not violators:
             return
 
-        await self.tags.violation_count.set(self.tags.violation_count.value + 1)
+        # People, not frames: the callers only pass violators who are new to their view.
+        await self.tags.violation_count.set(
+            self.tags.violation_count.value + len(violators)
+        )
         # Epoch milliseconds, matching the camera app's tag of the same name. Its
         # naive `datetime.now()` yields the same epoch value as this, since
         # `timestamp()` reads a naive datetime as local time -- being explicit about
@@ -0,0 +1,312 @@
+"""Run the detectors in a child process instead of the app's own.
+
+In-process, every model run goes through ``asyncio.to_thread``. The ORT session
+itself releases the GIL, but NMS bookkeeping, the OCR post-processing and the
+PPE attribution loops don't, and each of those stalls the event loop that is also
+servicing the DDA subscriptions. A worker process takes all of that off the app's
+interpreter: the app only copies a frame in and reads a handful of numbers back.
+
+Three choices keep that cheap enough to be worth it on a CM4:
+
+* Frames travel through one ``multiprocessing.shared_memory`` segment, not the
+  pipe. A decoded 4K frame is ~25MB; pickling it would cost a copy on each side
+  plus the pipe transfer, where this costs one ``memcpy`` into the segment.
+* Results come back as flat tuples of numbers and short strings (see
+  ``common.results``) rather than pickled result objects, so the reply is a few
+  hundred bytes whatever the frame size.
+* The worker is disposable. It checks its own RSS after every frame and exits
+  once past the configured limit, and a crash or hang is caught by the parent
+  and answered with a fresh worker. Either way the app keeps its subscriptions:
+  they live in the parent, which only ever loses the one frame in flight.
+
+The memory limit is enforced here rather than left to docker because the compose
+template's ``mem_limit`` isn't applied on current Doovits (see the README), so
+nothing else would stop a slow leak in native code taking the camera apps down with
+it.
+"""
+
+import logging
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+import numpy as np
+
+from common import results as results_mod
+from common.detectors import anpr as anpr_mod
+from common.detectors import ppe as ppe_mod
+
+log = logging.getLogger(__name__)
+
+# Loading both models takes ~0.7s on a CM4 and a frame ~2.6s with both detectors on
+# (README, "Performance"). A worker that hasn't answered in many times that has hung
+# in native code, and the only way out of that is to kill it.
+STARTUP_TIMEOUT_SEC = 60
+FRAME_TIMEOUT_SEC = 60
+
+# `spawn`, not the Linux default `fork`: the parent is running an event loop, gRPC
+# channels and their threads, and a forked child inherits all of that in whatever
+# state it was in mid-flight. A spawned child starts clean and only imports what it
+# needs.
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class WorkerFailed(Exception):
+    """The worker crashed, hung or answered with something we can't use."""
+
+
+# The fields each detector reads off its config section. Named here rather than
+# discovered from the section, so the copy doesn't depend on how pydoover stores a
+# section's elements internally.
+PPE_FIELDS = ("confidence", "require_hard_hat", "require_high_vis")
+ANPR_FIELDS = ("confidence", "min_plate_chars")
+
+
+def _frozen(config_object, fields: tuple) -> SimpleNamespace | None:
+    """Copy a config section's ``fields`` into something picklable.
+
+    pydoover config objects aren't built to cross a process boundary, and the
+    detectors only ever read ``<field>.value`` from them, so a namespace of
+    ``SimpleNamespace(value=...)`` is all the worker needs.
+    """
+    if config_object is None:
+        return None
+    values = {}
+    for attr in fields:
+        try:
+            value = getattr(config_object, attr).value
+        except ValueError:
+            value = None
+        values[attr] = SimpleNamespace(value=value)
+    return SimpleNamespace(**values)
+
+
+# -- child side -------------------------------------------------------------------
+
+
+def _rss_bytes() -> int:
+    """Current (not peak) resident set size of this process.
+
+    ``resource.getrusage`` only reports the high-water mark, which never comes down
+    and would make one large frame look like a leak forever after.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _analyse(ppe, anpr, image, size: int) -> tuple[tuple, dict]:
+    """Run each loaded detector on one frame. Returns ``(packed, errors)``.
+
+    Each detector gets its own try: a PPE model that throws on a frame says nothing
+    about whether ANPR can read the plates in it, so one failing only blanks its own
+    half of the result. ``errors`` maps the name of each detector that failed to
+    its error text.
+    """
+    ppe_result = anpr_result = None
+    errors = {}
+    if ppe:
+        try:
+            ppe_result = ppe.analyse(image, size)
+        except Exception as e:
+            log.error(f"PPE inference failed in the worker: {e}", exc_info=e)
+            errors["ppe"] = str(e)
+    if anpr:
+        try:
+            anpr_result = anpr.analyse(image, size)
+        except Exception as e:
+            log.error(f"ANPR inference failed in the worker: {e}", exc_info=e)
+            errors["anpr"] = str(e)
+    return results_mod.pack(ppe_result, anpr_result), errors
+
+
+def _worker_main(conn, ppe_config, anpr_config, memory_limit: int):
+    """Entry point of the worker process. Loads the models and serves frames."""
+    logging.basicConfig(level=logging.INFO)
+
+    ppe = ppe_mod.load(ppe_config) if ppe_config is not None else None
+    anpr = anpr_mod.load(anpr_config) if anpr_config is not None else None
+    conn.send(("ready", ppe is not None, anpr is not None))
+
+    segment = None
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                # The parent has gone (or closed us). Nothing left to serve.
+                return
+            if request is None:
+                return
+
+            name, shape, size = request
+            if segment is None or segment.name != name:
+                if segment is not None:
+                    segment.close()
+                segment = shared_memory.SharedMemory(name=name)
+
+            image = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+            packed, errors = _analyse(ppe, anpr, image, size)
+            # Nothing may keep a view into the segment past this point, or the parent
+            # can't resize it.
+            del image
+
+            rss = _rss_bytes()
+            over_limit = bool(memory_limit) and rss > memory_limit
+            conn.send(("result", packed, errors, rss, over_limit))
+            if over_limit:
+                log.warning(
+                    f"Inference worker is at {rss // 2**20}MB, over its "
+                    f"{memory_limit // 2**20}MB limit; exiting to be replaced."
+                )
+                return
+    finally:
+        if segment is not None:
+            segment.close()
+
+
+# -- parent side ------------------------------------------------------------------
+
+
+class InferenceWorker:
+    """The app's handle on the worker process.
+
+    Blocking throughout, like the detectors it stands in for: call ``start`` and
+    ``run`` via ``asyncio.to_thread``. Not safe for concurrent ``run`` calls -- the
+    app already serialises inference behind its lock, and the one shared segment
+    relies on that.
+    """
+
+    def __init__(self, ppe_config, anpr_config, memory_limit_mb: int = 0):
+        self._ppe_config = _frozen(ppe_config, PPE_FIELDS)
+        self._anpr_config = _frozen(anpr_config, ANPR_FIELDS)
+        self._memory_limit = memory_limit_mb * 2**20
+
+        self._process = None
+        self._conn = None
+        self._segment: shared_memory.SharedMemory | None = None
+
+        self.has_ppe = False
+        self.has_anpr = False
+        self.restarts = 0
+
+    @property
+    def available(self) -> bool:
+        return self.has_ppe or self.has_anpr
+
+    def start(self) -> bool:
+        """Start the worker and wait for its models. True if any detector loaded."""
+        parent_conn, child_conn = _CONTEXT.Pipe()
+        self._process = _CONTEXT.Process(
+            target=_worker_main,
+            args=(child_conn, self._ppe_config, self._anpr_config, self._memory_limit),
+            name="object-detection-worker",
+            daemon=True,
+        )
+        self._process.start()
+        # Our copy of the child's end has to go, or recv() never sees EOF when the
+        # child dies -- it would wait on a pipe we're holding open ourselves.
+        child_conn.close()
+        self._conn = parent_conn
+
+        if not self._conn.poll(STARTUP_TIMEOUT_SEC):
+            self._stop()
+            raise WorkerFailed(f"worker didn't load its models in {STARTUP_TIMEOUT_SEC}s")
+        try:
+            _ready, self.has_ppe, self.has_anpr = self._conn.recv()
+        except (EOFError, OSError) as e:
+            self._stop()
+            raise WorkerFailed(f"worker died while loading its models: {e}") from e
+
+        log.info(
+            f"Inference worker {self._process.pid} ready "
+            f"(ppe={self.has_ppe}, anpr={self.has_anpr})."
+        )
+        return self.available
+
+    def run(self, image: np.ndarray, size: int):
+        """Analyse one frame in the worker. Returns ``(ppe_result, anpr_result)``.
+
+        A worker that crashes, hangs or runs out of memory costs this frame only:
+        it's logged, ``(None, None)`` is returned exactly as for an in-process
+        inference error, and a replacement is started for the next one. A detector
+        that raises inside a healthy worker only leaves its own result as None.
+        """
+        if self._process is None:
+            try:
+                self.start()
+            except WorkerFailed as e:
+                log.error(f"Inference worker unavailable: {e}")
+                return None, None
+
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        self._ensure_segment(image.nbytes)
+        np.ndarray(image.shape, dtype=np.uint8, buffer=self._segment.buf)[:] = image
+
+        try:
+            self._conn.send((self._segment.name, image.shape, size))
+            if not self._conn.poll(FRAME_TIMEOUT_SEC):
+                raise WorkerFailed(f"no answer in {FRAME_TIMEOUT_SEC}s")
+            _kind, packed, errors, rss, over_limit = self._conn.recv()
+        except (WorkerFailed, EOFError, OSError) as e:
+            log.error(f"Inference worker failed ({e}); restarting it.")
+            self._restart()
+            return None, None
+
+        for detector, error in errors.items():
+            log.error(f"{detector.upper()} inference failed in the worker: {error}")
+        log.debug(f"Inference worker RSS {rss // 2**20}MB.")
+
+        if over_limit:
+            # It has already decided to exit; start its replacement now so the model
+            # load isn't added to the next frame's latency.
+            self._restart()
+        return results_mod.unpack(packed)
+
+    def close(self):
+        self._stop()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+
+    def _ensure_segment(self, nbytes: int):
+        """Make sure the shared segment can hold a frame of ``nbytes``.
+
+        Grown, never shrunk: camera resolutions are fixed per camera, so after the
+        first frame from the largest one this never reallocates again.
+        """
+        if self._segment is not None and self._segment.size >= nbytes:
+            return
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+        self._segment = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    def _restart(self):
+        self._stop()
+        self.restarts += 1
+        try:
+            self.start()
+        except WorkerFailed as e:
+            # Leave it stopped; the next run() tries again rather than the app
+            # giving up on inference for good.
+            log.error(f"Couldn't restart the inference worker: {e}")
+
+    def _stop(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process = None
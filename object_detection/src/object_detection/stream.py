@@ -0,0 +1,222 @@
+"""Continuous, low-rate PPE checking from a camera's RTSP sub-stream.
+
+Snapshots only arrive on motion events and schedules, so someone working without a
+hard hat *between* them is never seen. A stream closes that gap, but the CM4 can't
+afford to treat it as video: a PPE run is ~1.4s of a core (README, "Performance"), so
+the budget is a frame every few seconds per camera, not every frame.
+
+Three things keep it inside that budget:
+
+* **Pull, don't push.** A reader thread keeps the RTSP session drained with
+  ``grab()`` -- which skips the colour conversion and copy -- and only ``retrieve``s a
+  frame when one is due. Anything the model can't get to is dropped at the source
+  instead of queueing behind it, so a slow frame never turns into stale frames later.
+* **One buffer.** The due frame is converted straight into the same array every time;
+  after the first frame a stream allocates nothing per frame.
+* **Snapshots first.** A due frame is skipped, not queued, while snapshot inference
+  holds the lock or the machine is loaded past the configured threshold.
+
+The sub-stream rather than the main stream: the reader decodes every frame it drains,
+and a 640x360 sub-stream costs a fraction of a 4K main stream to decode while still
+being what the model sees after letterboxing anyway.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+log = logging.getLogger(__name__)
+
+# TCP, not OpenCV's default UDP: a dropped UDP packet smears a whole GOP of frames,
+# and a smeared frame is exactly what makes the PPE model invent or lose people.
+# Read once, when a capture opens, and only applies if nobody has set it already.
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+
+# How long to wait for a frame before treating the stream as dead and reconnecting.
+FRAME_TIMEOUT_SEC = 15
+# Reconnect backoff: cameras reboot, and a sub-stream can be briefly refused while
+# another client (the camera app's own snapshot grab) holds it.
+RECONNECT_MIN_SEC = 2
+RECONNECT_MAX_SEC = 60
+
+
+class FrameGrabber:
+    """A reader thread that keeps an RTSP stream drained and hands out one frame on demand.
+
+    ``read`` asks for the next frame and blocks until the thread has converted it
+    into the shared buffer. The thread never touches the buffer again until the next
+    ``read``, so the caller may use the returned array until then -- and must not
+    keep it past that.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._capture = None
+        self._buffer = None
+        self._wanted = threading.Event()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._failed = False
+
+    def open(self) -> bool:
+        """Connect and start draining. Blocking; False if the stream can't be opened."""
+        capture = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        self._capture = capture
+        self._failed = False
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._drain, name="ppe-stream-reader", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _drain(self):
+        try:
+            while not self._stopped.is_set():
+                if not self._capture.grab():
+                    self._failed = True
+                    return
+                if self._wanted.is_set():
+                    ok, frame = self._capture.retrieve(self._buffer)
+                    if not ok:
+                        self._failed = True
+                        return
+                    # retrieve() writes into the buffer it's given when the shape
+                    # matches, and only allocates on the first frame or a resolution
+                    # change.
+                    self._buffer = frame
+                    self._wanted.clear()
+                    self._ready.set()
+        finally:
+            self._ready.set()
+
+    def read(self, timeout: float = FRAME_TIMEOUT_SEC):
+        """The next frame from the stream, or None if it has stopped delivering."""
+        if self._thread is None or self._failed:
+            return None
+        self._ready.clear()
+        self._wanted.set()
+        if not self._ready.wait(timeout) or self._failed:
+            self._wanted.clear()
+            return None
+        return self._buffer
+
+    def close(self):
+        self._stopped.set()
+        self._wanted.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=FRAME_TIMEOUT_SEC)
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+class PPEStream:
+    """Sample one camera's sub-stream at ``fps`` and hand frames to ``analyse``.
+
+    ``analyse(app_key, image)`` is awaited for each frame that isn't skipped; the
+    image is the grabber's shared buffer, so it must be finished with by the time the
+    coroutine returns. ``busy()`` says whether to skip the frame that's due.
+    """
+
+    def __init__(self, app_key: str, url: str, fps: float, analyse, busy):
+        self.app_key = app_key
+        self.url = url
+        self.interval = 1 / fps
+        self._analyse = analyse
+        self._busy = busy
+        self._task = None
+        self.frames = 0
+        self.skipped = 0
+
+    def start(self):
+        self._task = asyncio.create_task(
+            self._run(), name=f"ppe-stream-{self.app_key}"
+        )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        backoff = RECONNECT_MIN_SEC
+        while True:
+            grabber = FrameGrabber(self.url)
+            try:
+                if not await asyncio.to_thread(grabber.open):
+                    log.warning(
+                        f"Couldn't open the PPE stream for '{self.app_key}'; retrying "
+                        f"in {backoff}s."
+                    )
+                else:
+                    log.info(f"PPE stream for '{self.app_key}' open.")
+                    backoff = RECONNECT_MIN_SEC
+                    await self._sample(grabber)
+                    log.warning(
+                        f"PPE stream for '{self.app_key}' stopped delivering frames; "
+                        f"reconnecting."
+                    )
+            finally:
+                await asyncio.to_thread(grabber.close)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SEC)
+
+    async def _sample(self, grabber: FrameGrabber):
+        """Take a frame every interval until the stream fails."""
+        due = time.monotonic()
+        while True:
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            now = time.monotonic()
+            # Ticks missed while the last frame was analysed are skipped, not caught
+            # up on: a burst of back-to-back frames is the opposite of low-rate.
+            missed = int((now - due) // self.interval)
+            self.skipped += missed
+            due += (missed + 1) * self.interval
+
+            if self._busy():
+                self.skipped += 1
+                continue
+
+            image = await asyncio.to_thread(grabber.read)
+            if image is None:
+                return
+            self.frames += 1
+            try:
+                await self._analyse(self.app_key, image)
+            except Exception as e:
+                # One bad frame mustn't end the stream.
+                log.error(
+                    f"PPE stream frame from '{self.app_key}' failed: {e}", exc_info=e
+                )
+
+
+def over_load(max_load: float) -> bool:
+    """Whether the 1-minute load average per core is above ``max_load``."""
+    if max_load <= 0:
+        return False
+    try:
+        load = os.getloadavg()[0]
+    except OSError:
+        return False
+    return load / (os.cpu_count() or 1) > max_load
+
+
+__all__ = (
+    "FrameGrabber",
+    "PPEStream",
+    "over_load",
+)
@@ -1,3 +1,7 @@
+import json
+import logging
+
+from pydoover.models import MessageCreateEvent
 from pydoover.processor import run_app
 
 from .app_config import ObjectDetectionProcessorConfig
@@ -6,9 +10,12 @@ from .application import ObjectDetectionProcessor
 __all__ = (
     "ObjectDetectionProcessor",
     "ObjectDetectionProcessorConfig",
+    "batch_handler",
     "handler",
 )
 
+log = logging.getLogger(__name__)
+
 
 def handler(event, context):
     """AWS Lambda entrypoint.
@@ -18,3 +25,103 @@ def handler(event, context):
     ``application`` and so survive a warm container.
     """
     return run_app(ObjectDetectionProcessor(), event, context)
+
+
+def batch_handler(event, context):
+    """AWS Lambda entrypoint, for a delivery of one record or several.
+
+    ``run_app`` only reads ``Records[0]``, so a batched delivery through ``handler``
+    would silently analyse the first snapshot and drop the rest.
+
+    Snapshot messages that share a subscription, a token and an install go through one
+    processor run, whichever camera channel each came from: pydoover dispatches the
+    first, and the rest ride along as its ``batched_events``, so their frames share
+    batched model calls. Any other record gets a processor of its own.
+
+    pydoover logs and swallows a handler's exceptions, so a batch's failure can't be
+    seen from here. Instead the processor keeps track of the messages it hasn't
+    published (``unpublished``), and only those are retried, each on its own: a
+    message already reported is never reported, or notified about, twice.
+
+    Returns the per-record results in order.
+    """
+    records = event.get("Records") or []
+    if len(records) <= 1:
+        return handler(event, context)
+
+    groups = {}
+    for index, record in enumerate(records):
+        key = _batch_key(record)
+        groups.setdefault(index if key is None else key, []).append(index)
+
+    results = [None] * len(records)
+    for indices in groups.values():
+        retry = indices
+        if len(indices) > 1:
+            result, retry = _run_batch(event, records, indices, context)
+            for index in indices:
+                results[index] = result
+            if retry:
+                log.warning(
+                    f"{len(retry)} of {len(indices)} batched messages weren't "
+                    f"published; running each on its own."
+                )
+        for index in retry:
+            try:
+                single = {**event, "Records": [records[index]]}
+                results[index] = handler(single, context)
+            except Exception as e:
+                log.error(f"Record {index} of {len(records)} failed: {e}", exc_info=e)
+    return results
+
+
+def _message(record) -> dict:
+    return json.loads(record["Sns"]["Message"])
+
+
+def _batch_key(record) -> tuple | None:
+    """What records must share to be analysed in one run, or None if this one can't
+    share: anything that isn't a new message, or that can't be read.
+
+    Not the channel: the processor's config is per install, so messages from every
+    camera of an install are analysed alike. ``tag_values`` messages stay apart, since
+    pydoover rejects those by the dispatched message's channel alone.
+    """
+    try:
+        message = _message(record)
+        if message["op"] != "on_message_create":
+            return None
+        if MessageCreateEvent.from_dict(message["d"]).channel.name == "tag_values":
+            return None
+        return (
+            record.get("EventSubscriptionArn"),
+            message["token"],
+            message.get("agent_id"),
+            message["d"].get("organisation_id"),
+        )
+    except Exception:
+        return None
+
+
+def _run_batch(event, records, indices, context) -> tuple:
+    """Run ``records[indices]`` through one processor.
+
+    Returns its result, and the indices of the records whose message it didn't
+    publish.
+    """
+    events = [MessageCreateEvent.from_dict(_message(records[i])["d"]) for i in indices]
+    app = ObjectDetectionProcessor()
+    app.batched_events = tuple(events[1:])
+    result = None
+    try:
+        result = run_app(app, {**event, "Records": [records[indices[0]]]}, context)
+    except Exception as e:
+        log.error(f"Batch of {len(indices)} records failed: {e}", exc_info=e)
+    if app.unpublished is None:
+        # It never reached on_message_batch, so nothing was published.
+        return result, list(indices)
+    return result, [
+        index
+        for index, message in zip(indices, events)
+        if message.message.id in app.unpublished
+    ]
@@ -116,6 +116,14 @@ class ObjectDetectionProcessorConfig(config.Schema):
         default=True,
         advanced=True,
     )
+    cache_results = config.Boolean(
+        "Cache Results",
+        description="Remember each frame's findings by its content, so a replay, retry "
+        "or duplicate delivery of the same image skips inference. Keyed on the detector "
+        "settings too, so changing them never serves an old answer.",
+        default=True,
+        advanced=True,
+    )
     inference_size = config.Integer(
         "Inference Size",
         description="Square size (px) frames are letterboxed to before inference. "
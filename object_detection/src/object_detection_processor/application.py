@@ -22,16 +22,21 @@ heavier *weights* become possible when we have some), attachments that resolve w
 waiting on an upload, and one timeline entry per snapshot.
 """
 
+import asyncio
 import logging
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from pathlib import Path
 
 from common import annotate as annotate_mod
+from common import yolo as yolo_mod
 from common import zones as zones_mod
-from common.detectors import anpr as anpr_mod
-from common.detectors import ppe as ppe_mod
 from pydoover.models import File, MessageCreateEvent, NotificationSeverity
 from pydoover.processor import Application
 
+from . import result_cache
+from .detector_pool import DetectorPool
 from .app_config import ObjectDetectionProcessorConfig
 
 log = logging.getLogger()
@@ -68,169 +73,439 @@ THUMBNAIL_SUFFIX = "-thumbnail"
 # replacing the source entry, so the unannotated frame stays browsable.
 DETECTED_VIEW_SUFFIX = " (detected)"
 
+# How many attachments to download at once. A PTZ camera publishes one frame per preset
+# on the same message; fetching them one after another put every download's latency
+# ahead of the first inference. A handful in flight covers any real camera without
+# opening an unbounded number of connections to the API.
+DOWNLOAD_CONCURRENCY = 4
+
+# Most frames handed to one batched model call. Every frame in a batch is letterboxed
+# to the same square and held as float32 at once -- ~4.9MB each at 640px -- so this
+# bounds the input tensor at ~40MB whatever the size of the batch of messages. Past a
+# handful of frames a bigger batch buys little more than a bigger tensor.
+MAX_BATCH = 8
+
 # Loaded once per *container*, not per invocation.
 #
 # Lambda reuses a warm container across invocations but calls the handler (and so
 # `setup`) each time, and building an onnxruntime session costs ~700ms per model. Held
 # at module scope so only a cold start pays for it; the detectors are stateless between
-# frames, so sharing them is safe.
-_DETECTORS: dict = {}
+# frames, so sharing them is safe. See `detector_pool` for how installs with different
+# settings share the sessions.
+_POOL = DetectorPool()
+
+
+@dataclass
+class _Snapshot:
+    """One message's share of a batch: what to analyse and where to report it."""
+
+    channel: str
+    message: object
+    payload: dict
+    needed: frozenset
+    targets: list
+    zones: list | None = None
+    downloads: list = field(default_factory=list)
+    ppe: object = None
+    anpr: object = None
+
+
+@dataclass
+class _Frame:
+    """One downloaded frame and, once inferred, its results."""
+
+    snapshot: _Snapshot
+    name: str
+    attachment: object
+    data: bytes
+    image: object
+    cache_key: str | None = None
+    ppe_result: object = None
+    anpr_result: object = None
 
 
 class ObjectDetectionProcessor(Application):
     config: ObjectDetectionProcessorConfig
     config_cls = ObjectDetectionProcessorConfig
-
-    def _detectors(self):
-        """The PPE / ANPR detectors, built once per warm container."""
-        ppe_wanted = self.config.ppe.enabled.value
-        anpr_wanted = self.config.anpr.enabled.value
-
-        # Key on the settings that shape a model's construction, so a config change
-        # rebuilds rather than silently reusing a detector built for the old value.
-        key = (
-            ppe_wanted,
-            anpr_wanted,
+    # More snapshot messages for this install, delivered in the same SNS event as the
+    # one pydoover dispatches, and analysed in one batch with it. Set by
+    # ``batch_handler``; empty for an invocation carrying a single message.
+    batched_events: tuple = ()
+    # Ids of this invocation's messages not yet dealt with, i.e. neither updated nor
+    # found to need nothing. None until on_message_batch starts. Whatever is left
+    # once the run ends, through a failed update or a crash part way, is what
+    # ``batch_handler`` retries; nothing already published is sent twice.
+    unpublished: set | None = None
+
+    def _detectors(self, needed: set):
+        """The ``needed`` detectors for this install's settings, from the shared pool.
+
+        Blocking on a cold container (it builds the sessions); run it in a thread.
+        """
+        _POOL.reset_stats()
+        ppe, anpr = _POOL.detectors(
+            (self._config_key(), frozenset(needed)),
+            self.config.ppe if "ppe" in needed else None,
+            self.config.anpr if "anpr" in needed else None,
+        )
+        log.info(f"Detector pool: {_POOL.stats()}.")
+        return ppe, anpr
+
+    def _config_key(self) -> tuple:
+        """The detector settings that can change a result, as plain values."""
+        return (
+            self.config.ppe.enabled.value,
+            self.config.anpr.enabled.value,
             self.config.ppe.confidence.value,
             self.config.ppe.require_hard_hat.value,
             self.config.ppe.require_high_vis.value,
             self.config.anpr.confidence.value,
             self.config.anpr.min_plate_chars.value,
         )
-        if _DETECTORS.get("key") != key:
-            _DETECTORS.clear()
-            _DETECTORS["key"] = key
-            _DETECTORS["ppe"] = ppe_mod.load(self.config.ppe) if ppe_wanted else None
-            _DETECTORS["anpr"] = (
-                anpr_mod.load(self.config.anpr) if anpr_wanted else None
-            )
-            log.info(
-                f"Built detectors (cold start): ppe={_DETECTORS['ppe'] is not None} "
-                f"anpr={_DETECTORS['anpr'] is not None}"
-            )
-        return _DETECTORS["ppe"], _DETECTORS["anpr"]
+
+    def _result_key(self, data: bytes, ppe, anpr) -> str:
+        """The result cache key for this frame under this invocation's detectors.
+
+        Beyond the config: which detectors actually run (``match_detectors_to_event``
+        can drop one per event), the inference size and candidate caps, and the weights
+        files themselves -- a rebuilt image with new weights must not be served the old
+        model's answer from a cache that outlived it.
+        """
+        return result_cache.make_key(
+            data,
+            (
+                self._config_key(),
+                ppe is not None,
+                anpr is not None,
+                self.config.inference_size.value,
+                yolo_mod.PRE_NMS_TOP_K,
+                yolo_mod.MAX_DETECTIONS,
+                _weights_identity(ppe),
+                _weights_identity(anpr),
+            ),
+        )
 
     async def on_message_create(self, event: MessageCreateEvent):
+        await self.on_message_batch([event, *self.batched_events])
+
+    async def on_message_batch(self, events: list[MessageCreateEvent]):
+        """Analyse several snapshot messages for this install in one pass.
+
+        Every message's frames are downloaded together and their inference grouped into
+        batched model calls (see MAX_BATCH), but each message is still reported on its
+        own: one ``update_message`` per message, and a message that fails to publish
+        costs only itself. ``on_message_create`` hands over its own message plus any
+        ``batched_events`` that arrived with it.
+        """
+        self.unpublished = {event.message.id for event in events}
+        enabled = {
+            name
+            for name, section in (("ppe", self.config.ppe), ("anpr", self.config.anpr))
+            if section.enabled.value
+        }
+        if not enabled:
+            log.warning("No detectors enabled.")
+            self.unpublished.clear()
+            return
+
+        snapshots = []
+        for event in events:
+            snapshot = self._plan(event, enabled)
+            if snapshot is None:
+                # Nothing to analyse: as dealt with as a message gets.
+                self.unpublished.discard(event.message.id)
+            else:
+                snapshots.append(snapshot)
+        if not snapshots:
+            return
+
+        # Downloads start before the models load, so on a cold start the two overlap
+        # instead of one waiting on the other. One cap across the whole batch: it's
+        # there to bound connections to the API, not per message.
+        limit = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        for snapshot in snapshots:
+            snapshot.downloads = [
+                asyncio.create_task(self._download(attachment, limit))
+                for _name, attachment in snapshot.targets
+            ]
+
+        needed = set().union(*(snapshot.needed for snapshot in snapshots))
+        ppe, anpr = await asyncio.to_thread(self._detectors, needed)
+        if not (ppe or anpr):
+            log.warning("The detectors these snapshots need failed to load.")
+            # A retry in this container would find them no more loadable.
+            self.unpublished.clear()
+            for snapshot in snapshots:
+                for download in snapshot.downloads:
+                    download.cancel()
+            return
+
+        frames = []
+        for snapshot in snapshots:
+            # Each message only runs what its own event called for, even when another
+            # message in the batch needed more.
+            snapshot.ppe = ppe if "ppe" in snapshot.needed else None
+            snapshot.anpr = anpr if "anpr" in snapshot.needed else None
+            for (name, attachment), download in zip(
+                snapshot.targets, snapshot.downloads
+            ):
+                fetched = await download
+                if fetched is None:
+                    continue
+                data, image = fetched
+                frames.append(_Frame(snapshot, name, attachment, data, image))
+
+        await self._infer(frames, ppe, anpr)
+
+        for snapshot in snapshots:
+            try:
+                await self._report_snapshot(
+                    snapshot, [f for f in frames if f.snapshot is snapshot]
+                )
+            except Exception as e:
+                log.error(
+                    f"Failed to report on message {snapshot.message.id}: {e}",
+                    exc_info=e,
+                )
+
+        # With the results already out, load whatever these events skipped, so the next
+        # event that needs it finds it warm. Lambda freezes the container the moment the
+        # handler returns, so a fire-and-forget task would never run -- this is awaited,
+        # but only after the part anyone is waiting for.
+        skipped = enabled - needed
+        if skipped:
+            await asyncio.to_thread(
+                _POOL.warm,
+                self.config.ppe if "ppe" in skipped else None,
+                self.config.anpr if "anpr" in skipped else None,
+            )
+
+    def _plan(self, event: MessageCreateEvent, enabled: set):
+        """Decide what, if anything, to analyse on one message. None to skip it."""
         message = event.message
         payload = message.data or {}
         channel = event.channel.name
 
         if ANALYSED_BY_KEY in payload:
-            return
+            return None
 
         reason = payload.get("reason")
         wanted_by_camera = payload.get("object_detection")
         if wanted_by_camera is False:
             log.info(f"'{channel}' snapshot not marked for object detection.")
-            return
+            return None
 
         wanted = self.config.wanted_reasons
         if wanted_by_camera is not True and wanted and reason not in wanted:
             log.info(f"Ignoring '{channel}' snapshot (reason={reason}).")
-            return
-
-        ppe, anpr = self._detectors()
-        if not (ppe or anpr):
-            log.warning("No detectors enabled or their weights failed to load.")
-            return
+            return None
 
-        # Checked *after* the "nothing loaded at all" guard, so the two situations don't
-        # produce the same log line -- "no detectors enabled" would be a lie when the
-        # detectors are fine and this event simply doesn't call for them.
-        if self.config.match_detectors_to_event.value:
-            allowed = DETECTORS_FOR_REASON.get(reason)
-            if allowed is not None:
-                skipped = sorted(
-                    n
-                    for n, d in (("ppe", ppe), ("anpr", anpr))
-                    if d and n not in allowed
-                )
-                ppe = ppe if "ppe" in allowed else None
-                anpr = anpr if "anpr" in allowed else None
-                if not (ppe or anpr):
-                    log.info(
-                        f"reason={reason} calls for {sorted(allowed)}, which is not "
-                        f"enabled on this install — nothing to do for this snapshot."
-                    )
-                    return
-                if skipped:
-                    log.info(
-                        f"reason={reason}: running {sorted(allowed)} only, skipping "
-                        f"{skipped}."
-                    )
+        # Decided *before* anything is loaded: on a cold container each model costs
+        # ~700ms to build, and building one this event doesn't call for is that much
+        # billed time spent before the first useful inference.
+        needed = self._detectors_for(reason, enabled)
+        if not needed:
+            log.info(
+                f"reason={reason} calls for {sorted(DETECTORS_FOR_REASON[reason])}, "
+                f"which is not enabled on this install — nothing to do for this "
+                f"snapshot."
+            )
+            return None
+        if needed != enabled:
+            log.info(
+                f"reason={reason}: running {sorted(needed)} only, skipping "
+                f"{sorted(enabled - needed)}."
+            )
 
         targets = self._image_attachments(payload, message.attachments)
         if not targets:
             log.info(f"No analysable image on '{channel}' message {message.id}.")
-            return
+            return None
 
         # The camera app sends the zones that concern us with the frame itself. Absent
         # means "analyse the whole frame", which is every camera that has never had zones
         # drawn on it.
-        zones = payload.get("detection_zones")
-
-        # One frame per message in practice; a PTZ camera contributing several presets
-        # is analysed in order and the findings merged under their view names.
-        findings, files, media, summaries = {}, [], [], []
-        violators, plates, matched_zones = [], [], []
-        for name, attachment in targets:
-            result = await self._analyse(attachment, ppe, anpr, name, zones)
-            if result is None:
-                continue
-            findings[name] = result["findings"]
-            summaries.append(result["summary"])
-            files.extend(result["files"])
-            if result["media"]:
-                media.append(result["media"])
-            violators.extend(result["violators"])
-            plates.extend(result["plates"])
-            matched_zones.extend(result["zones"])
-
-        if not findings:
-            return
-
-        await self._publish(
-            channel,
-            message,
-            payload,
-            findings,
-            files,
-            media,
-            summaries,
-            violators,
-            plates,
-            matched_zones,
+        return _Snapshot(
+            channel=channel,
+            message=message,
+            payload=payload,
+            needed=frozenset(needed),
+            targets=targets,
+            zones=payload.get("detection_zones"),
         )
 
-    async def _analyse(self, attachment, ppe, anpr, name, zones=None):
+    def _detectors_for(self, reason, enabled: set) -> set:
+        """Which of the enabled detectors this event calls for.
+
+        Everything enabled, unless ``match_detectors_to_event`` is on and the camera's
+        own classification narrows it (see DETECTORS_FOR_REASON). Empty when the event
+        calls only for a detector this install hasn't enabled.
+        """
+        if not self.config.match_detectors_to_event.value:
+            return set(enabled)
+        allowed = DETECTORS_FOR_REASON.get(reason)
+        if allowed is None:
+            return set(enabled)
+        return enabled & allowed
+
+    async def _download(self, attachment, limit: asyncio.Semaphore):
+        """Fetch and decode one attachment. Returns ``(data, image)``, or None.
+
+        A failure is logged and skipped, so one missing preset never costs the others.
+        The decode happens here, as each download lands, rather than waiting for the
+        whole set.
+        """
         try:
-            data = await self.api.fetch_message_attachment(attachment)
+            async with limit:
+                # Timed from when it's actually allowed to start, so a queued download
+                # doesn't look like a slow one.
+                started = time.perf_counter()
+                data = await self.api.fetch_message_attachment(attachment)
         except Exception as e:
             log.warning(f"Couldn't download '{attachment.filename}': {e}", exc_info=e)
             return None
+        log.info(
+            f"Downloaded '{attachment.filename}' ({len(data) // 1024} KB) in "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms."
+        )
 
-        image = annotate_mod.decode(data)
+        image = await asyncio.to_thread(annotate_mod.decode, data)
         if image is None:
             log.warning(f"Couldn't decode '{attachment.filename}' as an image.")
             return None
+        return data, image
 
-        size = self.config.inference_size.value
-        ppe_result = anpr_result = None
-        if ppe:
-            try:
-                ppe_result = ppe.analyse(image, size)
-                for person in ppe_result.people:
-                    person.missing = person.violations(
-                        self.config.ppe.require_hard_hat.value,
-                        self.config.ppe.require_high_vis.value,
+    async def _infer(self, frames: list, ppe, anpr):
+        """Fill in every frame's results, from the result cache or the models.
+
+        Frames the cache can't answer are grouped per detector -- only those whose
+        message called for it -- and run batched, both detectors side by side.
+        """
+        pending = []
+        for frame in frames:
+            snapshot = frame.snapshot
+            if self.config.cache_results.value:
+                frame.cache_key = self._result_key(
+                    frame.data, snapshot.ppe, snapshot.anpr
+                )
+                cached = result_cache.get(frame.cache_key)
+                if cached is not None:
+                    frame.ppe_result, frame.anpr_result = cached
+                    log.info(
+                        f"'{frame.attachment.filename}' matches a cached result; "
+                        f"skipping inference."
                     )
-            except Exception as e:
-                log.error(f"PPE inference failed: {e}", exc_info=e)
-        if anpr:
-            try:
-                anpr_result = anpr.analyse(image, size)
-            except Exception as e:
-                log.error(f"Plate inference failed: {e}", exc_info=e)
+                    continue
+            pending.append(frame)
+        if not pending:
+            return
+
+        ppe_frames = [f for f in pending if f.snapshot.ppe is not None]
+        anpr_frames = [f for f in pending if f.snapshot.anpr is not None]
+        ppe_results, anpr_results = await self._run_models(
+            ppe,
+            [f.image for f in ppe_frames],
+            anpr,
+            [f.image for f in anpr_frames],
+        )
+        for frame, result in zip(ppe_frames, ppe_results):
+            frame.ppe_result = result
+        for frame, result in zip(anpr_frames, anpr_results):
+            frame.anpr_result = result
+
+        for frame in pending:
+            # Only a complete answer is worth keeping: caching a result with a failed
+            # detector's half missing would serve that gap to every retry.
+            complete = (
+                frame.snapshot.ppe is None or frame.ppe_result is not None
+            ) and (frame.snapshot.anpr is None or frame.anpr_result is not None)
+            if frame.cache_key is not None and complete:
+                result_cache.put(frame.cache_key, frame.ppe_result, frame.anpr_result)
+
+    async def _run_models(self, ppe, ppe_images, anpr, anpr_images):
+        """Run each detector over its frames, the two side by side in worker threads.
+
+        The two are independent onnxruntime sessions over read-only frames, and each
+        session is pinned to one intra-op thread (see ``common/yolo.py``), so on a
+        multi-vCPU function they genuinely run in parallel: a batch with both enabled
+        costs roughly the slower model rather than the sum. Returns one result (or None
+        where inference failed) per image.
+        """
+        size = self.config.inference_size.value
+
+        def run(label, detector, images):
+            results = []
+            for start in range(0, len(images), MAX_BATCH):
+                chunk = images[start : start + MAX_BATCH]
+                try:
+                    results.extend(detector.analyse_batch(chunk, size))
+                    continue
+                except Exception as e:
+                    log.error(f"{label} inference failed: {e}", exc_info=e)
+                if len(chunk) == 1:
+                    results.append(None)
+                    continue
+                # One bad frame mustn't cost the rest of its batch: retry them singly,
+                # so only the frame that actually fails comes back empty.
+                for image in chunk:
+                    try:
+                        results.append(detector.analyse(image, size))
+                    except Exception as e:
+                        log.error(f"{label} inference failed: {e}", exc_info=e)
+                        results.append(None)
+            return results
+
+        ppe_results, anpr_results = await asyncio.gather(
+            asyncio.to_thread(run, "PPE", ppe, ppe_images),
+            asyncio.to_thread(run, "Plate", anpr, anpr_images),
+        )
+        for result in ppe_results:
+            if result is None:
+                continue
+            for person in result.people:
+                person.missing = person.violations(
+                    self.config.ppe.require_hard_hat.value,
+                    self.config.ppe.require_high_vis.value,
+                )
+        return ppe_results, anpr_results
+
+    async def _report_snapshot(self, snapshot, frames: list):
+        """Merge one message's frames and publish them as that message's update.
+
+        One frame per message in practice; a PTZ camera contributing several presets
+        has the findings merged under their view names.
+        """
+        findings, files, media, summaries = {}, [], [], []
+        violators, plates, matched_zones = [], [], []
+        for frame in frames:
+            result = await self._report(frame, snapshot.zones)
+            findings[frame.name] = result["findings"]
+            summaries.append(result["summary"])
+            files.extend(result["files"])
+            if result["media"]:
+                media.append(result["media"])
+            violators.extend(result["violators"])
+            plates.extend(result["plates"])
+            matched_zones.extend(result["zones"])
+
+        if findings:
+            await self._publish(
+                snapshot.channel,
+                snapshot.message,
+                snapshot.payload,
+                findings,
+                files,
+                media,
+                summaries,
+                violators,
+                plates,
+                matched_zones,
+            )
+
+    async def _report(self, frame, zones=None):
+        """Annotate one analysed frame and apply the zones to its findings."""
+        attachment, image, name = frame.attachment, frame.image, frame.name
+        ppe_result, anpr_result = frame.ppe_result, frame.anpr_result
 
         view = {}
         if ppe_result is not None:
@@ -241,15 +516,19 @@ class ObjectDetectionProcessor(Application):
         files, media_entry = [], None
         if self.config.annotate.value:
             try:
-                drawn = annotate_mod.annotate(image, ppe_result, anpr_result)
                 filename = self._annotated_filename(attachment.filename)
                 thumb_name = f"{filename.rsplit('.', 1)[0]}{THUMBNAIL_SUFFIX}.jpg"
+                # Drawing and two JPEG encodes of a 4K frame are a few hundred ms of
+                # CPU; off the loop with the rest.
+                full, thumb = await asyncio.to_thread(
+                    self._render, image, ppe_result, anpr_result
+                )
                 files.append(
                     File(
                         filename=filename,
                         content_type="image/jpeg",
                         size=0,
-                        data=annotate_mod.encode_jpeg(drawn),
+                        data=full,
                     )
                 )
                 files.append(
@@ -257,7 +536,7 @@ class ObjectDetectionProcessor(Application):
                         filename=thumb_name,
                         content_type="image/jpeg",
                         size=0,
-                        data=annotate_mod.encode_thumbnail_jpeg(drawn),
+                        data=thumb,
                     )
                 )
                 # Same shape as the camera app's own media entries, so a gallery renders
@@ -310,6 +589,12 @@ class ObjectDetectionProcessor(Application):
             "zones": [z for _i, z in (*violator_pairs, *plate_pairs)],
         }
 
+    @staticmethod
+    def _render(image, ppe_result, anpr_result) -> tuple[bytes, bytes]:
+        """The annotated frame and its thumbnail as JPEG bytes. Blocking."""
+        drawn = annotate_mod.annotate(image, ppe_result, anpr_result)
+        return annotate_mod.encode_jpeg(drawn), annotate_mod.encode_thumbnail_jpeg(drawn)
+
     async def _publish(
         self,
         channel,
@@ -353,6 +638,10 @@ class ObjectDetectionProcessor(Application):
         except Exception as e:
             log.error(f"Failed to update message {message.id}: {e}", exc_info=e)
             return
+        # Only now: _report_snapshot returning is no sign the update went out, since a
+        # failed one is logged above rather than raised.
+        if self.unpublished is not None:
+            self.unpublished.discard(message.id)
 
         log.info(f"Updated message {message.id} on '{channel}': {detail['summary']}")
         # The camera's display name where there is one, for text a person reads. The
@@ -469,3 +758,15 @@ class ObjectDetectionProcessor(Application):
         if plates:
             parts.append(f"plate(s) {', '.join(p.text for p in plates)}")
         return "; ".join(parts)
+
+
+def _weights_identity(detector) -> tuple | None:
+    """Name, size and mtime of a detector's weights file -- enough to notice a swap."""
+    path = getattr(getattr(detector, "model", None), "path", None)
+    if path is None:
+        return None
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return (str(path),)
+    return (Path(path).name, stat.st_size, stat.st_mtime_ns)
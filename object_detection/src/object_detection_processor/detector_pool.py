@@ -0,0 +1,174 @@
+"""Detectors shared across invocations -- and across installs -- in a warm container.
+
+Lambda reuses a warm container for any install whose subscription routes to this
+function, and those installs don't share a config. The old cache held exactly one
+detector pair keyed on the whole config, so two installs with different confidence
+thresholds alternating through one container threw away and rebuilt ~700ms of
+onnxruntime sessions on every switch.
+
+None of the thresholds affect the session, though: confidence, ``min_plate_chars`` and
+the PPE requirements are all applied per call. So the expensive part is keyed on the
+weights file alone, and each config gets a thin ``PPEDetector`` / ``ANPRDetector`` on
+top of the shared session -- building one of those costs nothing.
+
+Sessions are evicted least-recently-used once their estimated footprint passes the
+budget. With today's three small weights files that never happens; it's there for the
+heavier PPE weights the processor exists to make room for (see the Dockerfile), where
+two variants resident at once could exceed the function's memory.
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from common.detectors import anpr as anpr_mod
+from common.detectors import ppe as ppe_mod
+from common.yolo import ModelUnavailable, YoloOnnx
+
+log = logging.getLogger(__name__)
+
+# Resident memory of an onnxruntime CPU session relative to its weights file: the
+# weights themselves plus the optimised graph's copies and the arena. An estimate, not
+# a measurement -- deliberately generous, so the budget errs towards evicting rather
+# than towards an out-of-memory kill.
+SESSION_MEMORY_FACTOR = 3
+
+SESSION_BUDGET_BYTES = (
+    int(os.environ.get("OBJECT_DETECTION_SESSION_BUDGET_MB", "768")) * 2**20
+)
+
+# Per-config wrappers are nearly free, but an unbounded dict of them keyed on config
+# would grow for the life of the container. More installs than this through one
+# container is unusual; the oldest wrapper is simply rebuilt if it comes back.
+MAX_CONFIGS = 16
+
+OCR_KEY = "plate_ocr"
+
+
+class DetectorPool:
+    def __init__(self, budget_bytes: int = SESSION_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        # weights key -> (loaded model, estimated bytes). Most recently used last.
+        self._sessions: OrderedDict = OrderedDict()
+        # config key -> (ppe, anpr, weights keys they hold). Most recently used last.
+        self._wrappers: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _model, size in self._sessions.values())
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    def stats(self) -> str:
+        return (
+            f"{self.hits} hit(s), {self.misses} miss(es), {len(self._sessions)} "
+            f"session(s) resident (~{self.resident_bytes // 2**20}MB of "
+            f"{self.budget_bytes // 2**20}MB)"
+        )
+
+    def detectors(self, key, ppe_config=None, anpr_config=None):
+        """The ``(ppe, anpr)`` detectors for one config, either None if not wanted/loadable.
+
+        ``key`` identifies the config (the processor's ``_config_key``); a ``None``
+        section means that detector isn't wanted.
+        """
+        cached = self._wrappers.get(key)
+        if cached is not None and all(k in self._sessions for k in cached[2]):
+            self._wrappers.move_to_end(key)
+            for k in cached[2]:
+                self._touch(k)
+            self.hits += 1
+            return cached[0], cached[1]
+
+        held = []
+        ppe = anpr = None
+        if ppe_config is not None:
+            model = self._model(ppe_mod.PPE_MODEL_PATH)
+            if model is not None:
+                held.append(str(ppe_mod.PPE_MODEL_PATH))
+                ppe = ppe_mod.PPEDetector(ppe_config, model=model)
+        if anpr_config is not None:
+            model = self._model(anpr_mod.PLATE_MODEL_PATH)
+            if model is not None:
+                held.extend((str(anpr_mod.PLATE_MODEL_PATH), OCR_KEY))
+                anpr = anpr_mod.ANPRDetector(anpr_config, model=model, ocr=self._ocr())
+
+        self._wrappers[key] = (ppe, anpr, tuple(held))
+        self._wrappers.move_to_end(key)
+        while len(self._wrappers) > MAX_CONFIGS:
+            self._wrappers.popitem(last=False)
+        return ppe, anpr
+
+    def warm(self, ppe_config=None, anpr_config=None):
+        """Load the sessions for these detectors without building wrappers.
+
+        For sessions an invocation skipped: the next config to ask for them then only
+        pays for a wrapper. Failures are logged by the loaders and otherwise ignored.
+        """
+        if ppe_config is not None:
+            self._model(ppe_mod.PPE_MODEL_PATH)
+        if anpr_config is not None and self._model(anpr_mod.PLATE_MODEL_PATH):
+            self._ocr()
+
+    def _model(self, path: Path) -> YoloOnnx | None:
+        def load():
+            model = YoloOnnx(path)
+            return model, path.stat().st_size * SESSION_MEMORY_FACTOR
+
+        try:
+            return self._shared(str(path), load)
+        except ModelUnavailable as e:
+            log.error(
+                f"Detector is enabled but the model can't be loaded: {e}. Run "
+                f"scripts/fetch_models.py and rebuild the image."
+            )
+            return None
+
+    def _ocr(self):
+        def load():
+            ocr = anpr_mod.ANPRDetector._load_ocr()
+            try:
+                size = anpr_mod.OCR_MODEL_PATH.stat().st_size * SESSION_MEMORY_FACTOR
+            except OSError:
+                size = 0
+            return ocr, size
+
+        return self._shared(OCR_KEY, load)
+
+    def _shared(self, key: str, load):
+        entry = self._sessions.get(key)
+        if entry is not None:
+            self._touch(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        model, size = load()
+        self._sessions[key] = (model, size)
+        self._evict(keep=key)
+        return model
+
+    def _touch(self, key: str):
+        self._sessions.move_to_end(key)
+
+    def _evict(self, keep: str):
+        """Drop least-recently-used sessions until back under budget.
+
+        Never the one just loaded, even if it alone is over budget -- the invocation
+        needs it. Wrappers built on an evicted session go with it, or they would keep
+        it alive and the memory would never actually be released.
+        """
+        while self.resident_bytes > self.budget_bytes and len(self._sessions) > 1:
+            key = next(iter(self._sessions))
+            if key == keep:
+                break
+            self._sessions.pop(key)
+            for config_key in [
+                k for k, (_p, _a, held) in self._wrappers.items() if key in held
+            ]:
+                del self._wrappers[config_key]
+            log.info(f"Evicted {key} from the detector pool to stay under budget.")
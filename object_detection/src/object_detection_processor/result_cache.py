@@ -0,0 +1,171 @@
+"""Content-addressed cache of inference results.
+
+``ANALYSED_BY_KEY`` only stops a re-run once our ``update_message`` has landed. An
+invocation that died between inference and the update (a timeout, a throttled API
+call), a duplicate delivery, or a replay of a backlog all arrive looking unanalysed,
+and each downloads the frame and pays for the models again -- seconds of Lambda time
+to reproduce an answer we already had.
+
+The cache key is the SHA-256 of the attachment's *bytes* plus everything that can
+change the answer: which detectors run, their thresholds, the inference size and the
+identity of the weights files. So it is safe to share between installs in one warm
+container, and a config change simply misses rather than returning a stale verdict.
+
+What's stored is the flat form from ``common.results`` as JSON -- a few hundred bytes
+per frame, never the frame itself -- so even a small budget holds thousands of entries.
+
+Storage is pluggable. The default is a size-capped directory under ``/tmp``, which
+lives exactly as long as the warm container does. Any ``ResultStore`` subclass can
+stand in for it -- a directory on a shared mount, or an adapter over an object store
+-- via :func:`set_store`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from common import results as results_mod
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = Path(
+    os.environ.get("OBJECT_DETECTION_RESULT_CACHE_DIR", "/tmp/object-detection-results")
+)
+# Lambda's /tmp is 512MB by default and shared with everything else the function
+# writes. An entry is well under 1KB, so 16MB is tens of thousands of frames -- far
+# more than a warm container ever sees -- while staying a rounding error of /tmp.
+CACHE_MAX_BYTES = int(os.environ.get("OBJECT_DETECTION_RESULT_CACHE_MB", "16")) * 2**20
+
+
+class ResultStore(ABC):
+    """Where cached results live. Keys are hex digests; values are bytes.
+
+    Both methods must swallow their own storage errors and behave as a miss / a no-op:
+    a cache that can fail the invocation is worse than no cache.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        """The value stored under ``key``, or None if there isn't one."""
+
+    @abstractmethod
+    def put(self, key: str, value: bytes) -> None:
+        """Store ``value`` under ``key``, replacing anything already there."""
+
+
+class DirectoryStore(ResultStore):
+    """One file per entry, least-recently-used evicted past ``max_bytes``.
+
+    Recency is the file's mtime, bumped on every hit, so the LRU order survives across
+    invocations without an index file that a crashed invocation could leave stale.
+
+    The entries' total size is kept as a running count, seeded by one scan when the
+    store is made, so a put costs a stat of its own entry rather than of every entry.
+    The directory is only walked once the count goes over the cap, and that walk
+    resets the count to what's really there (another process sharing the directory
+    can make it drift, never for long).
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._total = sum(size for _mtime, size, _path in self._entries())
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def _entries(self) -> list:
+        entries = []
+        try:
+            paths = list(self.root.glob("*.json"))
+        except OSError:
+            return entries
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            value = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            # Write-then-rename, so a concurrent reader (or an invocation killed
+            # mid-write) never sees half an entry.
+            tmp = self.root / f".{key}.{os.getpid()}.tmp"
+            tmp.write_bytes(value)
+            os.replace(tmp, path)
+            self._total += len(value) - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+        except OSError as e:
+            log.warning(f"Couldn't write to the result cache: {e}")
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _mtime, size, _path in entries)
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._total = total
+
+
+_STORE: ResultStore = DirectoryStore()
+
+
+def set_store(store: ResultStore) -> None:
+    """Swap the backing store, e.g. for an object-store adapter or in tests."""
+    global _STORE
+    _STORE = store
+
+
+def make_key(data: bytes, detector_key) -> str:
+    """The cache key for a frame's bytes under a given detector configuration.
+
+    ``detector_key`` must capture everything that can change the result; it's hashed
+    by its ``repr``, so keep it to plain values (tuples, numbers, strings).
+    """
+    digest = hashlib.sha256(data)
+    digest.update(repr(detector_key).encode())
+    return digest.hexdigest()
+
+
+def get(key: str):
+    """The cached ``(ppe_result, anpr_result)`` for ``key``, or None on a miss."""
+    raw = _STORE.get(key)
+    if raw is None:
+        return None
+    try:
+        return results_mod.unpack(json.loads(raw))
+    except (ValueError, TypeError) as e:
+        # A corrupt or outdated entry is a miss; the fresh result overwrites it.
+        log.warning(f"Ignoring unreadable result cache entry {key[:12]}: {e}")
+        return None
+
+
+def put(key: str, ppe_result, anpr_result) -> None:
+    _STORE.put(key, json.dumps(results_mod.pack(ppe_result, anpr_result)).encode())
@@ -5,8 +5,12 @@ output (which would loop forever), not analysing thumbnails or videos, and
 respecting the reason filter.
 """
 
+import asyncio
 from types import SimpleNamespace
 
+import cv2
+import numpy as np
+
 from object_detection.application import (
     ANALYSED_BY_KEY,
     ObjectDetectionApplication,
@@ -70,6 +74,91 @@ class TestImageAttachments:
         assert self.pick(payload, [attachment("a.jpg")]) == []
 
 
+class TestClipAttachments:
+    pick = staticmethod(ObjectDetectionApplication._clip_attachments)
+
+    def test_picks_the_clip_not_the_still(self):
+        payload = {
+            "media": [
+                {"name": "event", "file": "event.mp4"},
+                {"name": "still", "file": "still.jpg"},
+            ]
+        }
+        attachments = [attachment("event.mp4", "video/mp4"), attachment("still.jpg")]
+        assert [name for name, _ in self.pick(payload, attachments)] == ["event"]
+
+    def test_falls_back_to_all_clips_without_media(self):
+        attachments = [attachment("a.mp4", "video/mp4"), attachment("b.jpg")]
+        assert [name for name, _ in self.pick({}, attachments)] == ["a.mp4"]
+
+
+class TestThumbnailAttachment:
+    pick = staticmethod(ObjectDetectionApplication._thumbnail_attachment)
+
+    def test_from_the_media_entry(self):
+        payload = {
+            "media": [
+                {"name": "P1", "file": "P1.jpg", "thumbnail": "P1-thumbnail.jpg"},
+                {"name": "P2", "file": "P2.jpg", "thumbnail": "P2-thumbnail.jpg"},
+            ]
+        }
+        attachments = [attachment(f) for f in ("P1.jpg", "P1-thumbnail.jpg")]
+        assert self.pick(payload, attachments, "P1.jpg").filename == "P1-thumbnail.jpg"
+        # Named but not attached.
+        assert self.pick(payload, attachments, "P2.jpg") is None
+
+    def test_never_guessed_without_media(self):
+        attachments = [attachment("P1.jpg"), attachment("P1-thumbnail.jpg")]
+        assert self.pick({}, attachments, "P1.jpg") is None
+
+
+class TestThumbnailScreen:
+    """The screen may only skip a full-size frame it has positively seen to be empty."""
+
+    screen = staticmethod(ObjectDetectionApplication._screen_thumbnail)
+
+    def app(self, ppe_result, anpr_result=None, data=None):
+        if data is None:
+            data = cv2.imencode(".jpg", np.zeros((36, 64, 3), dtype=np.uint8))[1]
+            data = data.tobytes()
+
+        async def fetch(_attachment):
+            return SimpleNamespace(data=data)
+
+        return SimpleNamespace(
+            device_agent=SimpleNamespace(fetch_message_attachment=fetch),
+            _run_models=lambda image: (ppe_result, anpr_result),
+            _has_ppe=True,
+            _has_anpr=anpr_result is not None,
+        )
+
+    def run(self, app):
+        async def go():
+            app._inference_lock = asyncio.Lock()
+            return await self.screen(app, "cam_1", attachment("t.jpg"))
+
+        return asyncio.run(go())
+
+    def test_empty_thumbnail_is_screened_out(self):
+        empty = SimpleNamespace(raw=[], people=[])
+        screened = self.run(self.app(empty))
+        assert screened is not None and screened[1] is empty
+
+    def test_any_ppe_detection_needs_the_full_frame(self):
+        hat_only = SimpleNamespace(raw=[object()], people=[])
+        assert self.run(self.app(hat_only)) is None
+
+    def test_a_plate_needs_the_full_frame_for_ocr(self):
+        empty = SimpleNamespace(raw=[], people=[])
+        plates = SimpleNamespace(plates=[object()])
+        assert self.run(self.app(empty, plates)) is None
+
+    def test_failures_fail_open(self):
+        assert self.run(self.app(None)) is None
+        empty = SimpleNamespace(raw=[], people=[])
+        assert self.run(self.app(empty, data=b"not a jpeg")) is None
+
+
 class TestIsImage:
     def test_suffixes(self):
         is_image = ObjectDetectionApplication._is_image
@@ -140,3 +229,54 @@ class TestSummarise:
         summary = self.summarise([violator], [plate])
         assert "missing high vis" in summary
         assert "XYZ789" in summary
+
+
+class TestDuplicateFrames:
+    """Reusing the previous findings for an unchanged frame."""
+
+    def app(self, threshold=6):
+        return SimpleNamespace(
+            config=SimpleNamespace(
+                duplicate_frame_threshold=SimpleNamespace(value=threshold)
+            ),
+            _last_analysed={},
+        )
+
+    reusable = staticmethod(ObjectDetectionApplication._reusable_findings)
+    remember = staticmethod(ObjectDetectionApplication._remember)
+
+    def test_reuses_only_for_the_same_view(self):
+        app = self.app()
+        fp = np.zeros(256, dtype=bool)
+        ppe, anpr = object(), object()
+        self.remember(app, "cam_1", "Preset1", fp, (1080, 1920, 3), ppe, anpr)
+
+        assert self.reusable(app, "cam_1", "Preset1", fp, (1080, 1920, 3)) == (ppe, anpr)
+        # Another preset of the same camera is a different scene.
+        assert self.reusable(app, "cam_1", "Preset2", fp, (1080, 1920, 3)) is None
+        assert self.reusable(app, "cam_2", "Preset1", fp, (1080, 1920, 3)) is None
+
+    def test_changed_frame_or_resolution_runs_the_models(self):
+        app = self.app()
+        fp = np.zeros(256, dtype=bool)
+        self.remember(app, "cam_1", "v", fp, (1080, 1920, 3), object(), None)
+
+        changed = fp.copy()
+        changed[:20] = True
+        assert self.reusable(app, "cam_1", "v", changed, (1080, 1920, 3)) is None
+        # Boxes are in the pixels of the frame they came from.
+        assert self.reusable(app, "cam_1", "v", fp, (720, 1280, 3)) is None
+
+    def test_failed_inference_is_not_remembered(self):
+        """Otherwise the next identical frame would skip the models and fail quietly."""
+        app = self.app()
+        fp = np.zeros(256, dtype=bool)
+        self.remember(app, "cam_1", "v", fp, (1, 1, 3), object(), None)
+        self.remember(app, "cam_1", "v", fp, (1, 1, 3), None, None)
+        assert self.reusable(app, "cam_1", "v", fp, (1, 1, 3)) is None
+
+    def test_disabled(self):
+        app = self.app(threshold=0)
+        fp = np.zeros(256, dtype=bool)
+        self.remember(app, "cam_1", "v", fp, (1, 1, 3), object(), None)
+        assert self.reusable(app, "cam_1", "v", fp, (1, 1, 3)) is None
@@ -0,0 +1,123 @@
+"""Tests for clip sampling and folding a clip's frames into one set of findings.
+
+What matters: a clip is decoded a sample at a time at the requested rate and no
+further than the frame limit, and a person or plate seen in many samples is reported
+once, by their best sighting.
+"""
+
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from common import clips as clips_mod
+from common.clips import ClipFindings, sample_frames
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "event.mp4"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV can't write mp4 here")
+    for i in range(100):
+        writer.write(np.full((48, 64, 3), i * 2, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+class TestSampleFrames:
+    def test_samples_at_the_requested_rate(self, clip):
+        samples = list(sample_frames(clip, fps=1, max_frames=100))
+        # 100 frames at 25 fps is 4s of clip.
+        assert [round(s) for s, _frame in samples] == [0, 1, 2, 3]
+        assert samples[0][1].shape == (48, 64, 3)
+
+    def test_stops_at_the_frame_limit(self, clip):
+        assert len(list(sample_frames(clip, fps=5, max_frames=3))) == 3
+
+    def test_unreadable_file_yields_nothing(self, tmp_path):
+        path = tmp_path / "broken.mp4"
+        path.write_bytes(b"not a video")
+        assert list(sample_frames(path, fps=1, max_frames=10)) == []
+
+    def test_take_batches(self, clip):
+        frames = sample_frames(clip, fps=2, max_frames=100)
+        assert len(clips_mod.take(frames, 3)) == 3
+        assert len(clips_mod.take(frames, 100)) == 6
+        assert clips_mod.take(frames, 3) == []
+
+
+SHAPE = (1080, 1920, 3)
+
+
+def person(box, confidence, missing=("hard_hat",)):
+    return SimpleNamespace(
+        detection=SimpleNamespace(box=box, confidence=confidence), missing=list(missing)
+    )
+
+
+def plate(text, confidence):
+    return SimpleNamespace(
+        text=text, detection=SimpleNamespace(box=(0, 0, 10, 10), confidence=confidence)
+    )
+
+
+def add(findings, seconds, people, violators=(), plates=()):
+    image = np.zeros(SHAPE, dtype=np.uint8)
+    ppe_result = SimpleNamespace(people=list(people))
+    findings.add(
+        seconds,
+        image,
+        ppe_result,
+        None,
+        [(v, None) for v in violators],
+        [(p, None) for p in plates],
+    )
+    return image
+
+
+class TestClipFindings:
+    def test_one_person_across_samples_is_one_violator_by_best_sighting(self):
+        findings = ClipFindings()
+        sightings = [
+            person((100, 100, 300, 600), 0.6),
+            person((120, 100, 320, 600), 0.9),
+            person((140, 100, 340, 600), 0.7),
+        ]
+        for seconds, p in enumerate(sightings):
+            add(findings, seconds, [p], [p])
+
+        assert findings.people == 1
+        assert findings.violators == [sightings[1]]
+        assert findings.to_dict()["violations"][0]["at"] == 1
+
+    def test_compliant_person_is_counted_but_not_reported(self):
+        findings = ClipFindings()
+        add(findings, 0, [person((100, 100, 300, 600), 0.8, missing=())])
+        assert findings.people == 1
+        assert findings.violators == []
+
+    def test_plates_by_best_read(self):
+        findings = ClipFindings()
+        weak, strong = plate("ABC123", 0.5), plate("ABC123", 0.9)
+        add(findings, 0, [], plates=[weak])
+        add(findings, 1, [], plates=[strong, plate("XYZ789", 0.7)])
+        assert [p.text for p in findings.plates] == ["ABC123", "XYZ789"]
+        assert findings.plates[0] is strong
+
+    def test_key_frame_is_the_one_with_most_to_show(self):
+        findings = ClipFindings()
+        add(findings, 0, [])
+        p = person((100, 100, 300, 600), 0.8)
+        busiest = add(findings, 1, [p], [p], [plate("ABC123", 0.9)])
+        add(findings, 2, [person((100, 100, 300, 600), 0.8, missing=())])
+        assert findings.key_frame is busiest
+        assert findings.key_seconds == 1
+
+    def test_someone_leaving_and_returning_is_a_new_person(self):
+        findings = ClipFindings(track_gap=5)
+        add(findings, 0, [p := person((100, 100, 300, 600), 0.8)], [p])
+        add(findings, 10, [q := person((100, 100, 300, 600), 0.8)], [q])
+        assert findings.people == 2
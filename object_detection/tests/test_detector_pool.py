@@ -0,0 +1,98 @@
+"""Tests for the processor's shared detector pool.
+
+The sessions are faked: what's under test is the sharing and eviction policy, not
+onnxruntime, and the real weights aren't in the repo.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from common.detectors import anpr as anpr_mod
+from common.detectors import ppe as ppe_mod
+from object_detection_processor import detector_pool
+
+
+def _config(**values):
+    return SimpleNamespace(**{k: SimpleNamespace(value=v) for k, v in values.items()})
+
+
+PPE_A = _config(confidence=55, require_hard_hat=True, require_high_vis=True)
+PPE_B = _config(confidence=40, require_hard_hat=True, require_high_vis=False)
+ANPR = _config(confidence=40, min_plate_chars=4)
+
+
+@pytest.fixture
+def loads(tmp_path, monkeypatch):
+    """Fake weights files and a YoloOnnx that counts its constructions."""
+    built = []
+
+    class FakeModel:
+        def __init__(self, path):
+            if not path.exists():
+                raise detector_pool.ModelUnavailable(f"no {path}")
+            built.append(path.name)
+            self.path = path
+            self.class_names = {0: "person", 1: "hardhat", 2: "safety vest"}
+
+    for name, size in (("ppe.onnx", 1000), ("plate.onnx", 500)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    monkeypatch.setattr(detector_pool, "YoloOnnx", FakeModel)
+    monkeypatch.setattr(ppe_mod, "PPE_MODEL_PATH", tmp_path / "ppe.onnx")
+    monkeypatch.setattr(anpr_mod, "PLATE_MODEL_PATH", tmp_path / "plate.onnx")
+    monkeypatch.setattr(anpr_mod, "OCR_MODEL_PATH", tmp_path / "missing-ocr.onnx")
+    monkeypatch.setattr(
+        anpr_mod.ANPRDetector, "_load_ocr", staticmethod(lambda: "ocr")
+    )
+    return built
+
+
+def test_configs_share_one_session(loads):
+    pool = detector_pool.DetectorPool()
+    ppe_a, _ = pool.detectors("a", PPE_A)
+    ppe_b, _ = pool.detectors("b", PPE_B)
+
+    assert loads == ["ppe.onnx"]
+    assert ppe_a.model is ppe_b.model
+    # Each still applies its own thresholds.
+    assert ppe_a.config is PPE_A and ppe_b.config is PPE_B
+
+
+def test_repeat_config_is_a_hit(loads):
+    pool = detector_pool.DetectorPool()
+    first = pool.detectors("a", PPE_A, ANPR)
+    pool.reset_stats()
+    assert pool.detectors("a", PPE_A, ANPR) == first
+    assert (pool.hits, pool.misses) == (1, 0)
+
+
+def test_missing_weights_disable_only_that_detector(loads, tmp_path):
+    (tmp_path / "plate.onnx").unlink()
+    ppe, anpr = detector_pool.DetectorPool().detectors("a", PPE_A, ANPR)
+    assert ppe is not None
+    assert anpr is None
+
+
+def test_budget_evicts_least_recently_used(loads):
+    factor = detector_pool.SESSION_MEMORY_FACTOR
+    # Room for the PPE session or the plate one, not both.
+    pool = detector_pool.DetectorPool(budget_bytes=1000 * factor)
+    pool.detectors("ppe", PPE_A)
+    pool.detectors("anpr", None, ANPR)
+
+    assert str(ppe_mod.PPE_MODEL_PATH) not in pool._sessions
+    assert pool.resident_bytes <= pool.budget_bytes
+    # The wrapper on the evicted session went with it, so asking again reloads.
+    pool.detectors("ppe", PPE_A)
+    assert loads.count("ppe.onnx") == 2
+
+
+def test_warm_loads_sessions_for_the_next_config(loads):
+    pool = detector_pool.DetectorPool()
+    pool.warm(None, ANPR)
+    assert loads == ["plate.onnx"]
+
+    pool.reset_stats()
+    _, anpr = pool.detectors("a", None, ANPR)
+    assert anpr is not None
+    assert pool.misses == 0
@@ -0,0 +1,66 @@
+"""Tests for the near-duplicate frame check.
+
+The costly mistake is a false match -- a person walking into shot being reused away as
+"nothing changed" -- so that is what most of these pin down.
+"""
+
+import cv2
+import numpy as np
+
+from common import fingerprint
+
+
+def _yard(seed=0):
+    """A textured, static scene, standing in for a quiet yard."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, (18, 32, 3), dtype=np.uint8)
+    return cv2.resize(base, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+
+
+def _reencoded(image, quality=70):
+    ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+def test_hash_is_fixed_size_whatever_the_frame():
+    assert fingerprint.frame_hash(_yard()).shape == (fingerprint.HASH_BITS,)
+    small = np.zeros((360, 640, 3), dtype=np.uint8)
+    assert fingerprint.frame_hash(small).shape == (fingerprint.HASH_BITS,)
+
+
+def test_same_scene_reencoded_is_a_duplicate():
+    """Two captures of a static scene never match pixel for pixel; noise and JPEG
+    re-encoding must not be mistaken for a change."""
+    frame = _yard()
+    noisy = np.clip(
+        frame.astype(np.int16) + np.random.default_rng(1).integers(-6, 7, frame.shape),
+        0,
+        255,
+    ).astype(np.uint8)
+    a = fingerprint.frame_hash(frame)
+    b = fingerprint.frame_hash(_reencoded(noisy))
+    assert fingerprint.is_near_duplicate(a, b, 6)
+
+
+def test_a_subject_entering_is_not_a_duplicate():
+    frame = _yard()
+    entered = frame.copy()
+    # A person-sized dark block, ~5% of the frame width.
+    cv2.rectangle(entered, (900, 500), (1000, 800), (20, 20, 20), -1)
+    a = fingerprint.frame_hash(frame)
+    b = fingerprint.frame_hash(entered)
+    assert not fingerprint.is_near_duplicate(a, b, 6)
+
+
+def test_a_different_scene_is_not_a_duplicate():
+    a = fingerprint.frame_hash(_yard(0))
+    b = fingerprint.frame_hash(_yard(1))
+    assert fingerprint.distance(a, b) > 64
+
+
+def test_zero_threshold_disables_the_check():
+    a = fingerprint.frame_hash(_yard())
+    assert fingerprint.is_near_duplicate(a, a, 1)
+    assert not fingerprint.is_near_duplicate(a, a, 0)
+    assert not fingerprint.is_near_duplicate(None, a, 10)
@@ -0,0 +1,109 @@
+"""Tests for the out-of-process inference worker.
+
+No model weights are needed: the lifecycle is exercised with a worker that has no
+detectors, which still goes through the shared segment, the pipe and the restart paths.
+"""
+
+import numpy as np
+
+from object_detection.app_config import ObjectDetectionConfig
+from object_detection.inference_worker import (
+    ANPR_FIELDS,
+    PPE_FIELDS,
+    InferenceWorker,
+    _analyse,
+    _frozen,
+)
+
+
+def test_frozen_config_carries_what_the_detectors_read():
+    from types import SimpleNamespace
+
+    config = ObjectDetectionConfig()
+    for section, fields in ((config.ppe, PPE_FIELDS), (config.anpr, ANPR_FIELDS)):
+        # Every listed field is one the schema really has.
+        assert all(hasattr(section, field) for field in fields)
+
+    section = SimpleNamespace(
+        confidence=SimpleNamespace(value=40),
+        min_plate_chars=SimpleNamespace(value=4),
+        enabled=SimpleNamespace(value=True),
+    )
+    frozen = _frozen(section, ANPR_FIELDS)
+    assert frozen.confidence.value == 40 and frozen.min_plate_chars.value == 4
+    assert not hasattr(frozen, "enabled")
+    assert _frozen(None, PPE_FIELDS) is None
+
+
+def test_one_detector_failing_leaves_the_other_result():
+    from types import SimpleNamespace
+
+    from common import results as results_mod
+    from common.detectors.anpr import ANPRResult, Plate
+    from common.yolo import Detection
+
+    def broken(image, size):
+        raise RuntimeError("ppe exploded")
+
+    plate = Plate(Detection("plate", 0.9, (1, 2, 30, 12)), "AB12CDE", 0.8)
+    ppe = SimpleNamespace(analyse=broken)
+    anpr = SimpleNamespace(analyse=lambda image, size: ANPRResult([plate]))
+
+    packed, errors = _analyse(ppe, anpr, np.zeros((8, 8, 3), dtype=np.uint8), 640)
+    assert errors == {"ppe": "ppe exploded"}
+    ppe_result, anpr_result = results_mod.unpack(packed)
+    assert ppe_result is None
+    assert [p.text for p in anpr_result.plates] == ["AB12CDE"]
+
+
+class TestLifecycle:
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def test_no_detectors_means_not_available(self):
+        worker = InferenceWorker(None, None)
+        try:
+            assert worker.start() is False
+            assert worker.run(self.frame, 640) == (None, None)
+        finally:
+            worker.close()
+
+    def test_a_dead_worker_is_replaced(self):
+        """A crash costs the frame in flight, not the app's ability to analyse."""
+        worker = InferenceWorker(None, None)
+        try:
+            worker.start()
+            worker._process.kill()
+            worker._process.join()
+
+            assert worker.run(self.frame, 640) == (None, None)
+            assert worker.restarts == 1
+            assert worker._process.is_alive()
+            # And the replacement serves the next frame normally.
+            assert worker.run(self.frame, 640) == (None, None)
+            assert worker.restarts == 1
+        finally:
+            worker.close()
+
+    def test_memory_limit_replaces_the_worker(self):
+        # 1MB is below any Python process, so every frame trips it.
+        worker = InferenceWorker(None, None, memory_limit_mb=1)
+        try:
+            worker.start()
+            first = worker._process.pid
+            worker.run(self.frame, 640)
+            assert worker.restarts == 1
+            assert worker._process.pid != first
+        finally:
+            worker.close()
+
+    def test_segment_grows_for_a_larger_frame(self):
+        worker = InferenceWorker(None, None)
+        try:
+            worker.start()
+            worker.run(self.frame, 640)
+            small = worker._segment.size
+            worker.run(np.zeros((480, 640, 3), dtype=np.uint8), 640)
+            assert worker._segment.size > small
+            assert worker.restarts == 0
+        finally:
+            worker.close()
@@ -0,0 +1,381 @@
+"""Tests for the cloud processor's download, batching and threading sides.
+
+What matters here is that a multi-preset message doesn't serialise its downloads, that
+one failed download doesn't cost the others, that a batch of messages shares its
+model calls without one message's failure reaching the rest, and that the blocking
+work runs off the event loop.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from common.detectors.ppe import PPEResult
+from object_detection_processor import application as proc_mod
+from object_detection_processor.application import ObjectDetectionProcessor
+from pydoover.models import (
+    Attachment,
+    ChannelID,
+    Message,
+    MessageCreateEvent,
+)
+
+JPEG = cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+
+
+def attachment(filename):
+    return SimpleNamespace(filename=filename, content_type="image/jpeg", size=1, url="")
+
+
+class FakeApi:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def fetch_message_attachment(self, attachment):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if attachment.filename in self.fail:
+                raise RuntimeError("404")
+            return JPEG
+        finally:
+            self.in_flight -= 1
+
+
+def _download_all(api, names, limit=proc_mod.DOWNLOAD_CONCURRENCY):
+    fake = SimpleNamespace(api=api)
+
+    async def run():
+        sem = asyncio.Semaphore(limit)
+        return await asyncio.gather(
+            *(
+                ObjectDetectionProcessor._download(fake, attachment(n), sem)
+                for n in names
+            )
+        )
+
+    return asyncio.run(run())
+
+
+def test_downloads_run_concurrently_up_to_the_cap():
+    api = FakeApi()
+    got = _download_all(api, [f"Preset{i}.jpg" for i in range(6)], limit=3)
+    assert api.peak == 3
+    assert all(g is not None for g in got)
+
+
+def test_download_is_decoded():
+    (got,) = _download_all(FakeApi(), ["a.jpg"])
+    data, image = got
+    assert data == JPEG
+    assert image.shape == (8, 8, 3)
+
+
+def test_a_failed_download_is_skipped_not_fatal():
+    got = _download_all(FakeApi(fail={"b.jpg"}), ["a.jpg", "b.jpg", "c.jpg"])
+    assert [g is not None for g in got] == [True, False, True]
+
+
+class TestDetectorsFor:
+    """Which detectors an event calls for -- decided before any model is loaded."""
+
+    def pick(self, reason, enabled, match=True):
+        fake = SimpleNamespace(
+            config=SimpleNamespace(
+                match_detectors_to_event=SimpleNamespace(value=match)
+            )
+        )
+        return ObjectDetectionProcessor._detectors_for(fake, reason, set(enabled))
+
+    def test_classified_event_narrows(self):
+        assert self.pick("person", {"ppe", "anpr"}) == {"ppe"}
+        assert self.pick("vehicle", {"ppe", "anpr"}) == {"anpr"}
+
+    def test_unclassified_event_runs_everything_enabled(self):
+        assert self.pick("schedule", {"ppe", "anpr"}) == {"ppe", "anpr"}
+        assert self.pick(None, {"ppe"}) == {"ppe"}
+
+    def test_event_calling_for_a_disabled_detector_needs_nothing(self):
+        assert self.pick("vehicle", {"ppe"}) == set()
+
+    def test_matching_off_runs_everything_enabled(self):
+        assert self.pick("vehicle", {"ppe", "anpr"}, match=False) == {"ppe", "anpr"}
+
+
+class FakePPE:
+    """Stands in for PPEDetector; records how frames reached it."""
+
+    model = None
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def analyse_batch(self, images, size):
+        self.batches.append(len(images))
+        if self.fail_on is not None and len(images) > 1:
+            raise RuntimeError("bad frame in batch")
+        return [self.analyse(image, size) for image in images]
+
+    def analyse(self, image, size):
+        if self.fail_on is not None and image.mean() == self.fail_on:
+            raise RuntimeError("bad frame")
+        return PPEResult([], [])
+
+
+class BatchApi(FakeApi):
+    def __init__(self, frames, fail_update=()):
+        super().__init__()
+        self.frames = frames
+        self.fail_update = set(fail_update)
+        self.updated = []
+        self.findings = {}
+
+    async def fetch_message_attachment(self, attachment):
+        return self.frames[attachment.filename]
+
+    async def update_message(self, **kwargs):
+        if kwargs["message_id"] in self.fail_update:
+            raise RuntimeError("throttled")
+        self.updated.append(kwargs["message_id"])
+        self.findings[kwargs["message_id"]] = kwargs["data"]["findings"]
+
+
+def _event(message_id, filename):
+    channel = ChannelID(agent_id=0, name="camera")
+    message = Message(
+        id=message_id,
+        author_id=0,
+        channel=channel,
+        data={"reason": "person", "media": [{"name": "View", "file": filename}]},
+        attachments=[
+            Attachment(filename=filename, content_type="image/jpeg", size=1, url="")
+        ],
+    )
+    return MessageCreateEvent(channel=channel, message=message)
+
+
+def _processor(api, annotate=False):
+    app = ObjectDetectionProcessor()
+    app.config._inject_deployment_config(
+        {
+            "ppe_detection": {"enabled": True},
+            "number_plate_recognition": {"enabled": False},
+            "analyse_snapshots_because_of": [],
+            "annotate_images": annotate,
+            "cache_results": False,
+            "dv_proc_subscriptions": [],
+        }
+    )
+    app.api = api
+    app.app_key = "object_detection"
+    return app
+
+
+def _run_batch(monkeypatch, ppe, api, events):
+    app = _processor(api)
+    monkeypatch.setattr(app, "_detectors", lambda needed: (ppe, None))
+    asyncio.run(app.on_message_batch(events))
+    return app
+
+
+def _frame(value):
+    image = np.full((8, 8, 3), value, dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+class TestMessageBatch:
+    def test_frames_share_one_model_call(self, monkeypatch):
+        ppe = FakePPE()
+        api = BatchApi({f"{i}.png": _frame(i) for i in range(3)})
+        _run_batch(monkeypatch, ppe, api, [_event(i, f"{i}.png") for i in range(3)])
+        assert ppe.batches == [3]
+        assert sorted(api.updated) == [0, 1, 2]
+
+    def test_batches_are_capped(self, monkeypatch):
+        ppe = FakePPE()
+        count = proc_mod.MAX_BATCH + 2
+        api = BatchApi({f"{i}.png": _frame(i) for i in range(count)})
+        _run_batch(
+            monkeypatch, ppe, api, [_event(i, f"{i}.png") for i in range(count)]
+        )
+        assert ppe.batches == [proc_mod.MAX_BATCH, 2]
+
+    def test_a_failed_update_costs_only_its_message(self, monkeypatch):
+        api = BatchApi({f"{i}.png": _frame(i) for i in range(3)}, fail_update={1})
+        app = _run_batch(
+            monkeypatch, FakePPE(), api, [_event(i, f"{i}.png") for i in range(3)]
+        )
+        assert sorted(api.updated) == [0, 2]
+        # ...and it's the one left for batch_handler to retry.
+        assert app.unpublished == {1}
+
+    def test_a_bad_frame_costs_only_its_message(self, monkeypatch):
+        """A batch that fails is retried frame by frame, so only the bad one is lost."""
+        ppe = FakePPE(fail_on=1)
+        api = BatchApi({f"{i}.png": _frame(i) for i in range(3)})
+        _run_batch(monkeypatch, ppe, api, [_event(i, f"{i}.png") for i in range(3)])
+        assert ppe.batches == [3]
+        assert "ppe" in api.findings[0]["View"]
+        assert api.findings[1]["View"] == {}
+        assert "ppe" in api.findings[2]["View"]
+
+
+class SlowDetector:
+    """Blocks for ``seconds`` per batch, the way an onnxruntime call holds a thread."""
+
+    def __init__(self, seconds, result):
+        self.seconds = seconds
+        self.result = result
+
+    def analyse_batch(self, images, size):
+        time.sleep(self.seconds)
+        return [self.result for _image in images]
+
+
+class TestOffTheLoop:
+    def test_the_two_detectors_overlap(self):
+        app = _processor(FakeApi())
+        ppe = SlowDetector(0.2, PPEResult([], []))
+        anpr = SlowDetector(0.3, None)
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+        started = time.perf_counter()
+        ppe_results, _ = asyncio.run(app._run_models(ppe, [image], anpr, [image]))
+        elapsed = time.perf_counter() - started
+
+        assert len(ppe_results) == 1
+        # Side by side costs about the slower model (0.3s), not the sum (0.5s).
+        assert elapsed < 0.45
+
+    def test_annotation_leaves_the_loop_responsive(self, monkeypatch):
+        def slow_annotate(image, ppe_result, anpr_result):
+            time.sleep(0.2)
+            return image
+
+        monkeypatch.setattr(proc_mod.annotate_mod, "annotate", slow_annotate)
+        monkeypatch.setattr(proc_mod.annotate_mod, "encode_jpeg", lambda i: b"full")
+        monkeypatch.setattr(
+            proc_mod.annotate_mod, "encode_thumbnail_jpeg", lambda i: b"thumb"
+        )
+        app = _processor(FakeApi(), annotate=True)
+        frame = SimpleNamespace(
+            attachment=attachment("0.jpg"),
+            image=np.zeros((8, 8, 3), dtype=np.uint8),
+            name="View",
+            ppe_result=PPEResult([], []),
+            anpr_result=None,
+        )
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            task = asyncio.create_task(ticker())
+            try:
+                return await app._report(frame)
+            finally:
+                task.cancel()
+
+        result = asyncio.run(run())
+        assert [f.data for f in result["files"]] == [b"full", b"thumb"]
+        # Annotating blocked a thread for 0.2s; the loop kept ticking throughout.
+        assert len(ticks) >= 10
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+
+def test_batch_handler_runs_every_record(monkeypatch):
+    """pydoover's run_app only reads Records[0]; the batch entry point mustn't."""
+    import object_detection_processor as package
+
+    seen = []
+
+    def handler(event, context):
+        (record,) = event["Records"]
+        if record["n"] == 1:
+            raise RuntimeError("bad token")
+        seen.append(record["n"])
+        return record["n"]
+
+    monkeypatch.setattr(package, "handler", handler)
+    results = package.batch_handler({"Records": [{"n": 0}, {"n": 1}, {"n": 2}]}, None)
+    assert seen == [0, 2]
+    assert results == [0, None, 2]
+
+
+def _sns_record(message_id, token="t1", channel="camera", op="on_message_create"):
+    import json
+
+    message = _event(message_id, f"{message_id}.png").message
+    message.channel = ChannelID(agent_id=0, name=channel)
+    body = {"op": op, "token": token, "d": message.to_dict()}
+    return {"EventSource": "aws:sns", "Sns": {"Message": json.dumps(body)}}
+
+
+def _dispatched(event) -> int:
+    import json
+
+    (record,) = event["Records"]
+    return json.loads(record["Sns"]["Message"])["d"]["id"]
+
+
+def test_batch_handler_runs_one_processor_per_install(monkeypatch):
+    """Every camera channel of an install shares a run; other installs don't."""
+    import object_detection_processor as package
+
+    runs = []
+
+    def run_app(app, event, context):
+        ids = [_dispatched(event)] + [e.message.id for e in app.batched_events]
+        runs.append(ids)
+        app.unpublished = set()
+        return len(runs)
+
+    monkeypatch.setattr(package, "run_app", run_app)
+    records = [
+        _sns_record(0, channel="camera_1"),
+        _sns_record(1, token="t2"),
+        _sns_record(2, channel="camera_2"),
+        _sns_record(3, channel="camera_3"),
+        _sns_record(4, channel="tag_values"),
+        _sns_record(5, op="on_schedule"),
+    ]
+    results = package.batch_handler({"Records": records}, None)
+    assert runs == [[0, 2, 3], [1], [4], [5]]
+    assert results == [1, 2, 1, 1, 3, 4]
+
+
+def test_batch_handler_retries_only_what_the_batch_did_not_publish(monkeypatch):
+    """pydoover swallows a handler's exceptions, so the batch says what it didn't
+    publish; a message it did publish is never sent again."""
+    import object_detection_processor as package
+
+    runs = []
+
+    def run_app(app, event, context):
+        ids = [_dispatched(event)] + [e.message.id for e in app.batched_events]
+        runs.append(ids)
+        if len(ids) > 1:
+            # 0 and 2 were published before the run went wrong.
+            app.unpublished = {1, 3}
+
+    monkeypatch.setattr(package, "run_app", run_app)
+    package.batch_handler({"Records": [_sns_record(i) for i in range(4)]}, None)
+    assert runs == [[0, 1, 2, 3], [1], [3]]
+
+    # A batch that never reached on_message_batch published nothing: all retried.
+    runs.clear()
+    monkeypatch.setattr(package, "run_app", lambda app, event, context: runs.append(
+        [_dispatched(event)] + [e.message.id for e in app.batched_events]
+    ))
+    package.batch_handler({"Records": [_sns_record(i) for i in range(2)]}, None)
+    assert runs == [[0, 1], [0], [1]]
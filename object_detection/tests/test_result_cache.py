@@ -0,0 +1,186 @@
+"""Tests for the processor's content-addressed result cache."""
+
+import asyncio
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from common.detectors.anpr import ANPRResult, Plate
+from common.detectors.ppe import PPEResult
+from common.yolo import Detection
+from object_detection_processor import result_cache
+from object_detection_processor.application import ObjectDetectionProcessor
+from pydoover.models import Attachment, ChannelID, Message, MessageCreateEvent
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = result_cache.DirectoryStore(tmp_path, max_bytes=10_000)
+    previous = result_cache._STORE
+    result_cache.set_store(store)
+    yield store
+    result_cache.set_store(previous)
+
+
+def test_key_covers_bytes_and_config():
+    """Same frame under different thresholds must not share an answer."""
+    key = result_cache.make_key(b"frame", (55, True))
+    assert key == result_cache.make_key(b"frame", (55, True))
+    assert key != result_cache.make_key(b"frame", (40, True))
+    assert key != result_cache.make_key(b"other", (55, True))
+
+
+def test_a_store_must_implement_both_methods():
+    class GetOnly(result_cache.ResultStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_round_trip(store):
+    anpr = ANPRResult([Plate(Detection("plate", 0.8, (1, 2, 3, 4)), "ABC123", 0.9)])
+    key = result_cache.make_key(b"frame", ())
+
+    assert result_cache.get(key) is None
+    result_cache.put(key, None, anpr)
+    ppe, got = result_cache.get(key)
+    assert ppe is None
+    assert got.to_dict() == anpr.to_dict()
+
+
+def test_corrupt_entry_is_a_miss(store):
+    key = result_cache.make_key(b"frame", ())
+    store.put(key, b"not json")
+    assert result_cache.get(key) is None
+
+
+def test_evicts_least_recently_used(store, tmp_path):
+    store.max_bytes = 350
+    for i, key in enumerate(("a", "b", "c")):
+        store.put(key, b"x" * 100)
+        # mtime resolution can be coarse; make the order unambiguous.
+        os.utime(tmp_path / f"{key}.json", (i, i))
+
+    # Reading "a" makes it the most recent, so "b" is the one to go.
+    assert store.get("a") is not None
+    store.put("d", b"x" * 100)
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("d") is not None
+
+
+def test_puts_under_the_cap_never_walk_the_directory(tmp_path):
+    (tmp_path / "old.json").write_bytes(b"x" * 100)
+    store = result_cache.DirectoryStore(tmp_path, max_bytes=350)
+    walks = []
+    entries = store._entries
+    store._entries = lambda: walks.append(1) or entries()
+
+    store.put("a", b"x" * 100)
+    store.put("a", b"x" * 150)  # replacing an entry counts only the difference
+    assert walks == [] and store._total == 250
+
+    store.put("b", b"x" * 150)
+    assert walks == [1] and store._total <= 350
+    assert store.get("old") is None and store.get("b") is not None
+
+
+def test_unwritable_store_is_harmless(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    store = result_cache.DirectoryStore(blocker / "cache")
+    store.put("a", b"x")
+    assert store.get("a") is None
+
+
+class ObjectStore(result_cache.ResultStore):
+    """An in-memory stand-in for an object-store adapter, counting its calls."""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.objects.get(key)
+
+    def put(self, key, value):
+        self.objects[key] = value
+
+
+class CountingPPE:
+    model = None
+
+    def __init__(self):
+        self.frames = 0
+
+    def analyse(self, image, size):
+        self.frames += 1
+        return PPEResult([], [])
+
+    def analyse_batch(self, images, size):
+        return [self.analyse(image, size) for image in images]
+
+
+class FrameApi:
+    def __init__(self, frame):
+        self.frame = frame
+        self.updated = []
+
+    async def fetch_message_attachment(self, attachment):
+        return self.frame
+
+    async def update_message(self, **kwargs):
+        self.updated.append(kwargs["message_id"])
+
+
+def _invoke(monkeypatch, ppe, api):
+    app = ObjectDetectionProcessor()
+    app.config._inject_deployment_config(
+        {
+            "ppe_detection": {"enabled": True},
+            "number_plate_recognition": {"enabled": False},
+            "analyse_snapshots_because_of": [],
+            "annotate_images": False,
+            "cache_results": True,
+            "dv_proc_subscriptions": [],
+        }
+    )
+    app.api = api
+    app.app_key = "object_detection"
+    monkeypatch.setattr(app, "_detectors", lambda *needed: (ppe, None))
+    channel = ChannelID(agent_id=0, name="camera")
+    message = Message(
+        id=1,
+        author_id=0,
+        channel=channel,
+        data={"reason": "person", "media": [{"name": "View", "file": "0.png"}]},
+        attachments=[
+            Attachment(filename="0.png", content_type="image/png", size=1, url="")
+        ],
+    )
+    event = MessageCreateEvent(channel=channel, message=message)
+    asyncio.run(app.on_message_create(event))
+
+
+def test_set_store_routes_the_processor_cache(monkeypatch):
+    monkeypatch.setattr(result_cache, "_STORE", result_cache._STORE)
+    store = ObjectStore()
+    result_cache.set_store(store)
+    frame = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+    api = FrameApi(frame)
+
+    ppe = CountingPPE()
+    _invoke(monkeypatch, ppe, api)
+    assert ppe.frames == 1 and len(store.objects) == 1
+
+    # A second invocation over the same frame is answered from the store alone.
+    ppe = CountingPPE()
+    _invoke(monkeypatch, ppe, api)
+    assert ppe.frames == 0 and store.gets == 2
+    assert api.updated == [1, 1]
@@ -0,0 +1,60 @@
+"""Tests for the flat result form shared by the inference worker and the result cache."""
+
+import json
+
+from common import results
+from common.detectors.anpr import ANPRResult, Plate
+from common.detectors.ppe import Person, PPEResult
+from common.yolo import Detection
+
+
+def _round_trip(ppe_result, anpr_result):
+    return results.unpack(results.pack(ppe_result, anpr_result))
+
+
+class TestRoundTrip:
+    def test_ppe_result_survives(self):
+        compliant = Person(Detection("person", 0.9, (0, 0, 10, 20)))
+        compliant.hard_hat, compliant.high_vis, compliant.missing = True, True, []
+        violator = Person(Detection("person", 0.7, (5, 5, 15, 25)), implied=True)
+        violator.hard_hat, violator.missing = False, ["hard_hat", "high_vis"]
+        result = PPEResult([compliant, violator], [Detection("hardhat", 0.8, (1, 1, 4, 4))])
+        result.violators = [violator]
+
+        got, anpr = _round_trip(result, None)
+
+        assert anpr is None
+        assert got.to_dict() == result.to_dict()
+        assert [p.implied for p in got.people] == [False, True]
+        assert got.violators[0].missing == ["hard_hat", "high_vis"]
+        assert got.raw[0].label == "hardhat"
+
+    def test_anpr_result_survives(self):
+        result = ANPRResult(
+            [
+                Plate(Detection("plate", 0.8, (1, 2, 3, 4)), "ABC123", 0.95),
+                Plate(Detection("plate", 0.5, (5, 6, 7, 8))),
+            ]
+        )
+        ppe, got = _round_trip(None, result)
+
+        assert ppe is None
+        assert got.to_dict() == result.to_dict()
+        assert [p.text for p in got.read_plates] == ["ABC123"]
+
+    def test_nothing_ran(self):
+        assert _round_trip(None, None) == (None, None)
+
+
+    def test_survives_json(self):
+        """The processor's result cache stores this form as JSON."""
+        person = Person(Detection("person", 0.7, (5, 5, 15, 25)))
+        person.missing = ["hard_hat"]
+        ppe = PPEResult([person], [])
+        ppe.violators = [person]
+        anpr = ANPRResult([Plate(Detection("plate", 0.8, (1, 2, 3, 4)), "ABC123", 0.9)])
+
+        packed = json.loads(json.dumps(results.pack(ppe, anpr)))
+        got_ppe, got_anpr = results.unpack(packed)
+        assert got_ppe.to_dict() == ppe.to_dict()
+        assert got_anpr.to_dict() == anpr.to_dict()
@@ -0,0 +1,133 @@
+"""Tests for continuous PPE monitoring.
+
+What matters: a frame is only decoded when it's wanted and always into the same
+buffer, and a busy device skips frames rather than queueing them. Who gets reported
+is the tracker's job; see test_tracking.py.
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+from object_detection import stream as stream_mod
+from object_detection.stream import FrameGrabber, PPEStream
+
+
+class FakeCapture:
+    """Counts grabs and retrieves; retrieve writes into the buffer it's handed.
+
+    ``grab`` paces itself like a live stream does, or the reader would exhaust the
+    frames before the test asks for one.
+    """
+
+    def __init__(self, frames=10_000):
+        self.frames = frames
+        self.grabs = 0
+        self.retrieved_into = []
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        time.sleep(0.001)
+        self.grabs += 1
+        return self.grabs <= self.frames
+
+    def retrieve(self, buffer=None):
+        self.retrieved_into.append(buffer)
+        if buffer is None:
+            buffer = np.zeros((36, 64, 3), dtype=np.uint8)
+        buffer[:] = self.grabs % 256
+        return True, buffer
+
+    def release(self):
+        pass
+
+
+class TestFrameGrabber:
+    def grabber(self, monkeypatch, capture):
+        monkeypatch.setattr(stream_mod.cv2, "VideoCapture", lambda *_: capture)
+        grabber = FrameGrabber("rtsp://camera/102")
+        assert grabber.open()
+        return grabber
+
+    def test_decodes_only_wanted_frames_into_one_buffer(self, monkeypatch):
+        capture = FakeCapture()
+        grabber = self.grabber(monkeypatch, capture)
+        try:
+            first = grabber.read(timeout=1)
+            second = grabber.read(timeout=1)
+        finally:
+            grabber.close()
+
+        assert first is second
+        assert len(capture.retrieved_into) == 2
+        # Only the very first decode allocates.
+        assert capture.retrieved_into[0] is None
+        assert capture.retrieved_into[1] is first
+
+    def test_ended_stream_reads_none(self, monkeypatch):
+        grabber = self.grabber(monkeypatch, FakeCapture(frames=0))
+        try:
+            assert grabber.read(timeout=1) is None
+        finally:
+            grabber.close()
+
+
+class FakeGrabber:
+    def __init__(self):
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def run_sample(busy, ticks=4, fps=100):
+    analysed = []
+
+    async def analyse(app_key, image):
+        analysed.append(app_key)
+
+    stream = PPEStream("cam_1", "rtsp://x", fps, analyse, busy)
+    grabber = FakeGrabber()
+
+    async def go():
+        task = asyncio.create_task(stream._sample(grabber))
+        await asyncio.sleep(ticks / fps)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(go())
+    return stream, grabber, analysed
+
+
+class TestPPEStream:
+    def test_busy_skips_without_reading(self):
+        """Skipped frames aren't even decoded, let alone queued."""
+        stream, grabber, analysed = run_sample(busy=lambda: True)
+        assert grabber.reads == 0
+        assert analysed == []
+        assert stream.skipped > 0
+
+    def test_idle_analyses(self):
+        stream, grabber, analysed = run_sample(busy=lambda: False)
+        assert grabber.reads > 0
+        assert analysed and set(analysed) == {"cam_1"}
+        assert stream.frames == grabber.reads
+
+
+class TestOverLoad:
+    def test_disabled_at_zero(self, monkeypatch):
+        monkeypatch.setattr(stream_mod.os, "getloadavg", lambda: (100.0, 0, 0))
+        assert not stream_mod.over_load(0)
+
+    def test_per_core(self, monkeypatch):
+        monkeypatch.setattr(stream_mod.os, "getloadavg", lambda: (3.0, 0, 0))
+        monkeypatch.setattr(stream_mod.os, "cpu_count", lambda: 4)
+        assert not stream_mod.over_load(0.8)
+        assert stream_mod.over_load(0.5)
@@ -0,0 +1,103 @@
+"""Tests for the cross-frame person tracker.
+
+The behaviour that matters: one person in successive frames is reported once, someone
+else in the same frame still is, and a person gone long enough is news again.
+"""
+
+from types import SimpleNamespace
+
+from common.tracking import PersonTracker
+from object_detection.application import ObjectDetectionApplication
+
+SHAPE = (1080, 1920, 3)
+
+
+def reported(tracker, boxes, violating, now, shape=SHAPE):
+    ids, report = tracker.update(boxes, violating, shape, now=now)
+    return [int(i) for i, r in zip(ids, report) if r]
+
+
+class TestPersonTracker:
+    def test_same_person_keeps_their_id_and_is_reported_once(self):
+        tracker = PersonTracker(max_age=300)
+        first, _ = tracker.update([(100, 100, 300, 600)], [True], SHAPE, now=0)
+        second, report = tracker.update([(110, 100, 310, 600)], [True], SHAPE, now=5)
+        assert first.tolist() == second.tolist()
+        assert not report.any()
+
+    def test_walking_person_is_followed_by_centroid(self):
+        """Between sampled frames someone can move further than their own width."""
+        tracker = PersonTracker(max_age=300)
+        assert reported(tracker, [(100, 100, 200, 400)], [True], now=0) == [1]
+        # No overlap with the previous box, but the centre moved under a diagonal.
+        assert reported(tracker, [(220, 120, 320, 420)], [True], now=2) == []
+        assert len(tracker) == 1
+
+    def test_someone_else_is_reported(self):
+        tracker = PersonTracker(max_age=300)
+        tracker.update([(100, 100, 300, 600)], [True], SHAPE, now=0)
+        ids, report = tracker.update(
+            [(100, 100, 300, 600), (1400, 100, 1600, 600)], [True, True], SHAPE, now=1
+        )
+        assert report.tolist() == [False, True]
+        assert ids[0] != ids[1]
+
+    def test_compliant_person_is_reported_when_they_start_violating(self):
+        tracker = PersonTracker(max_age=300)
+        assert reported(tracker, [(100, 100, 300, 600)], [False], now=0) == []
+        assert reported(tracker, [(100, 100, 300, 600)], [True], now=1) == [1]
+
+    def test_expired_track_is_news_again(self):
+        tracker = PersonTracker(max_age=60)
+        tracker.update([(100, 100, 300, 600)], [True], SHAPE, now=0)
+        assert reported(tracker, [(100, 100, 300, 600)], [True], now=61) == [2]
+
+    def test_repeat_after(self):
+        tracker = PersonTracker(max_age=600, repeat_after=120)
+        tracker.update([(100, 100, 300, 600)], [True], SHAPE, now=0)
+        assert reported(tracker, [(100, 100, 300, 600)], [True], now=60) == []
+        assert reported(tracker, [(100, 100, 300, 600)], [True], now=120) == [1]
+
+    def test_survives_a_change_of_resolution(self):
+        """A sub-stream frame and a 4K snapshot of the same view differ in pixels only."""
+        tracker = PersonTracker(max_age=300)
+        tracker.update([(400, 400, 800, 1600)], [True], (2160, 3840, 3), now=0)
+        substream = (360, 640, 3)
+        assert reported(tracker, [(67, 40, 133, 160)], [True], 1, substream) == []
+
+    def test_empty_frame(self):
+        tracker = PersonTracker(max_age=300)
+        ids, report = tracker.update([], [], SHAPE, now=0)
+        assert len(ids) == 0 and len(report) == 0
+
+
+def person(box, missing=()):
+    return SimpleNamespace(detection=SimpleNamespace(box=box), missing=list(missing))
+
+
+class TestNewViolations:
+    new_violations = staticmethod(ObjectDetectionApplication._new_violations)
+
+    def app(self):
+        return SimpleNamespace(
+            config=SimpleNamespace(
+                ppe=SimpleNamespace(forget_after=SimpleNamespace(value=300))
+            ),
+            _trackers={},
+        )
+
+    def test_only_zone_filtered_violators_are_reported(self):
+        app = self.app()
+        inside = person((100, 100, 300, 600), ["hard_hat"])
+        outside = person((1400, 100, 1600, 600), ["hard_hat"])
+        result = SimpleNamespace(people=[inside, outside])
+        got = self.new_violations(app, ("cam_1", "v"), result, [inside], SHAPE)
+        assert got == [inside]
+
+    def test_views_are_tracked_separately(self):
+        app = self.app()
+        p = person((100, 100, 300, 600), ["hard_hat"])
+        result = SimpleNamespace(people=[p])
+        assert self.new_violations(app, ("cam_1", "Preset1"), result, [p], SHAPE)
+        assert not self.new_violations(app, ("cam_1", "Preset1"), result, [p], SHAPE)
+        assert self.new_violations(app, ("cam_1", "Preset2"), result, [p], SHAPE)
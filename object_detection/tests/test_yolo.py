@@ -4,6 +4,9 @@ This code replaces ultralytics, so the geometry has to be right -- a silent
 half-box offset here would show up only as slightly-wrong annotations.
 """
 
+import sys
+from pathlib import Path
+
 import numpy as np
 import pytest
 from common.yolo import Detection, YoloOnnx, letterbox
@@ -109,6 +112,56 @@ class TestDecode:
         assert a[1] == b[1]
 
 
+class TestTopK:
+    """The pre-NMS cap bounds a cluttered frame without changing an ordinary one."""
+
+    def cluttered(self, per_class=50, num_classes=3):
+        """``per_class`` well-separated candidates of each class, distinct scores."""
+        anchors = per_class * num_classes
+        pred = np.zeros((1, 4 + num_classes, anchors), dtype=np.float32)
+        for i in range(anchors):
+            pred[0, :4, i] = (20 * i + 10, 10, 8, 8)
+            pred[0, 4 + i % num_classes, i] = 0.5 + i / (4 * anchors)
+        return pred
+
+    def test_keeps_the_best_k_of_each_class(self):
+        pred = self.cluttered()
+        _, scores, class_ids = YoloOnnx._decode(pred, 0.4, top_k=5)
+        assert len(scores) == 15
+        for cid in range(3):
+            theirs = sorted(
+                (s for s, c in zip(scores, class_ids) if c == cid), reverse=True
+            )
+            everything = sorted(pred[0, 4 + cid][pred[0, 4 + cid] > 0], reverse=True)
+            assert theirs == pytest.approx(everything[:5])
+
+    def test_survivors_stay_in_anchor_order(self):
+        boxes, _, _ = YoloOnnx._decode(self.cluttered(), 0.4, top_k=5)
+        xs = [b[0] for b in boxes]
+        assert xs == sorted(xs)
+
+    def test_no_change_under_the_cap(self):
+        out = TestDecode._output(
+            [(100, 100, 40, 20), (10, 10, 4, 4)], [(0, 0.9), (1, 0.6)]
+        )
+        assert YoloOnnx._decode(out, 0.5, top_k=100)[:2] == YoloOnnx._decode(out, 0.5)[:2]
+
+    def test_max_detections_keeps_the_strongest(self):
+        model = YoloOnnx.__new__(YoloOnnx)
+        model.end_to_end = False
+        model.top_k = 0
+        model.max_detections = 4
+        model.class_names = {}
+        image = np.zeros((640, 6000, 3), dtype=np.uint8)
+        detections = model._postprocess(
+            self.cluttered(), image, 1.0, (0, 0), 0.4, 0.45, None
+        )
+        assert len(detections) == 4
+        scores = [d.confidence for d in detections]
+        assert scores == sorted(scores, reverse=True)
+        assert min(scores) > 0.74
+
+
 class TestDetection:
     def test_area(self):
         assert Detection("x", 1.0, (0, 0, 10, 20)).area == 200
@@ -119,3 +172,123 @@ class TestDetection:
     def test_to_dict(self):
         d = Detection("person", 0.87654, (1, 2, 3, 4)).to_dict()
         assert d == {"label": "person", "confidence": 0.877, "box": [1, 2, 3, 4]}
+
+
+class TestDetectBatch:
+    """Batched runs must give each frame exactly the boxes a single run would."""
+
+    class FakeSession:
+        def __init__(self):
+            self.batch_sizes = []
+
+        def run(self, _outputs, feeds):
+            (blob,) = feeds.values()
+            self.batch_sizes.append(blob.shape[0])
+            # One box per frame, centred, its width taken from the frame's brightness
+            # so a frame mixed up with its neighbour would show.
+            pred = np.zeros((blob.shape[0], 5, TestDecode.ANCHORS), dtype=np.float32)
+            for i, frame in enumerate(blob):
+                pred[i, :4, 0] = (320, 320, 100 + 100 * frame.max(), 100)
+                pred[i, 4, 0] = 0.9
+            return [pred]
+
+    def model(self, dynamic_batch):
+        model = YoloOnnx.__new__(YoloOnnx)
+        model.session = self.FakeSession()
+        model.input_name = "images"
+        model.fixed_size = None
+        model.dynamic_batch = dynamic_batch
+        model.end_to_end = False
+        model.optional_inputs = set()
+        model.top_k = model.max_detections = 0
+        model.class_names = {0: "person"}
+        return model
+
+    def images(self):
+        return [np.full((640, 640, 3), v, dtype=np.uint8) for v in (0, 255)]
+
+    def test_dynamic_batch_is_one_run(self):
+        model = self.model(dynamic_batch=True)
+        batched = model.detect_batch(self.images())
+        assert model.session.batch_sizes == [2]
+        assert [d.box for d in batched[0]] == [(270, 270, 370, 370)]
+        assert [d.box for d in batched[1]] == [(220, 270, 420, 370)]
+
+    def test_matches_single_frame_detect(self):
+        batched = self.model(dynamic_batch=True).detect_batch(self.images())
+        single = [self.model(dynamic_batch=True).detect(i) for i in self.images()]
+        assert batched == single
+
+    def test_static_batch_runs_per_frame(self):
+        model = self.model(dynamic_batch=False)
+        assert len(model.detect_batch(self.images())) == 2
+        assert model.session.batch_sizes == [1, 1]
+
+    def test_empty(self):
+        assert self.model(dynamic_batch=True).detect_batch([]) == []
+
+
+class TestEndToEnd:
+    """A graph with NMS embedded must find what the Python post-processing finds."""
+
+    @pytest.fixture
+    def models(self, tmp_path):
+        onnx = pytest.importorskip("onnx")
+        from onnx import TensorProto, helper, numpy_helper
+
+        sys.path.insert(0, str(Path(__file__).parents[1] / "scripts"))
+        from fetch_models import embed_nms
+
+        # Two overlapping boxes of *different* classes, which class-agnostic NMS must
+        # collapse to one, plus a separate box and one below any sensible threshold.
+        pred = TestDecode._output(
+            [(100, 100, 40, 40), (102, 101, 40, 40), (300, 300, 20, 60), (500, 80, 9, 9)],
+            [(0, 0.9), (1, 0.8), (2, 0.6), (1, 0.1)],
+        )
+        # output0 = pred + 0 * mean(images): constant, but wired to the input so it's a
+        # valid graph that runs like a real model.
+        graph = helper.make_graph(
+            [
+                helper.make_node("ReduceMean", ["images"], ["mean"], keepdims=0),
+                helper.make_node("Mul", ["mean", "zero"], ["nothing"]),
+                helper.make_node("Add", ["pred", "nothing"], ["output0"]),
+            ],
+            "raw",
+            [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, 640, 640])],
+            [helper.make_tensor_value_info("output0", TensorProto.FLOAT, pred.shape)],
+            [
+                numpy_helper.from_array(pred, "pred"),
+                numpy_helper.from_array(np.array(0, dtype=np.float32), "zero"),
+            ],
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+        model.ir_version = 8
+        names = model.metadata_props.add()
+        names.key, names.value = "names", repr({0: "hardhat", 1: "no-hardhat", 2: "person"})
+
+        raw, e2e = tmp_path / "raw.onnx", tmp_path / "e2e.onnx"
+        onnx.save(model, raw)
+        embed_nms(raw, e2e)
+        return YoloOnnx(raw), YoloOnnx(e2e)
+
+    def test_output_signature_is_detected(self, models):
+        raw, e2e = models
+        assert not raw.end_to_end
+        assert e2e.end_to_end
+        assert {"score_threshold", "iou_threshold"} <= e2e.optional_inputs
+
+    @pytest.mark.parametrize("confidence", [0.05, 0.4, 0.7])
+    def test_same_detections_as_python_nms(self, models, confidence):
+        raw, e2e = models
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+        expected = raw.detect(image, confidence)
+        got = e2e.detect(image, confidence)
+        assert [(d.label, d.box) for d in got] == [(d.label, d.box) for d in expected]
+        assert [d.confidence for d in got] == pytest.approx(
+            [d.confidence for d in expected]
+        )
+
+    def test_nms_is_class_agnostic(self, models):
+        _raw, e2e = models
+        labels = [d.label for d in e2e.detect(np.zeros((640, 640, 3), np.uint8), 0.4)]
+        assert labels == ["hardhat", "person"]